@@ -1,6 +1,12 @@
 
 import streamlit as st
 
+from drift_monitor import observe
+from instrumentation import begin_rerun, render_dev_panel, timed
+from session_memory import track_session
+
+begin_rerun("prediction")
+
 # configure the page 
 st.set_page_config(
     page_title="CO₂ Emissions Prediction",
@@ -25,30 +31,29 @@ st.info("""
 st.markdown("---------------")
 
 
-# load model
-import pickle
-
-loaded_model = pickle.load(open('model_pickle/trained_pipe_co2.sav', 'rb'))
-
-# Inputs for the dropdown boxes:
-fuel_code_options = {
-    "BIT - Bituminous Coal": "BIT", "DFO - Distillate Fuel Oil": "DFO",
-    "GEO - Geothermal": "GEO", "JF - Jet Fuel": "JF",
-    "KER - Kerosene": "KER", "LIG - Lignite": "LIG",
-    "MSW - Municipal Solid Waste": "MSW", "NG - Natural Gas": "NG",
-    "PC - Petroleum Coke": "PC", "PG - Propane Gas": "PG",
-    "RC - Refined Coal": "RC", "RFO - Residual Fuel Oil": "RFO",
-    "SGC - Synthetic Gas from Coal": "SGC", "SUB - Subbituminous Coal": "SUB",
-    "TDF - Tire-derived Fuel": "TDF", "WC - Waste Coal": "WC",
-    "WO - Waste/Used Oil": "WO"
-}
-prime_mover_options = {
-    "CA - Combined Cycle (Multi-Shaft)": "CA", "CE - Compressed Air Energy Storage": "CE",
-    "CS - Compressed Air Storage": "CS", "CT - Combined Cycle (Single Shaft)": "CT",
-    "FC - Fuel Cell": "FC", "GT - Combustion Turbine (Gas Turbine)": "GT",
-    "IC - Internal Combustion Engine": "IC", "OT - Other": "OT",
-    "ST - Steam Turbine": "ST"
-}
+# load model (cached once per process and checked against its manifest, see model_registry.py)
+from data_loader import load_model, get_load_stats
+from model_registry import ModelError, unknown_input_codes
+
+try:
+    loaded_model = load_model()
+except ModelError as e:
+    st.error(f"The prediction model cannot be used: {e}")
+    st.stop()
+
+# Shared prediction cache (invalidated when the model artifact changes)
+from prediction_cache import get_prediction_cache
+
+prediction_cache = get_prediction_cache()
+
+# Conformal prediction intervals (calibrated once per model, see prediction_intervals.py)
+from data_loader import load_intervals
+
+intervals = load_intervals()
+
+# Inputs for the dropdown boxes and model input schema:
+from model_inputs import fuel_code_options, prime_mover_options, make_input_frame, FEATURE_COLUMNS
+from batch_scoring import score_file
 
 
 # Initialize session defaults
@@ -77,21 +82,85 @@ st.session_state.PriMov = PriMov
 
 
 # new plant input DataFrame
-import pandas as pd
-new_plant = pd.DataFrame({
-    'Fuel Consumption for Electric Generation (MMBtu)':[FuComElGen],
-    'Total Fuel Consumption (MMBtu)':[ToFuCom],
-    'Generation (kWh)':[Gen],
-    'Fuel Code':[fuel_code_options[FuCod]],
-    'Prime Mover':[prime_mover_options[PriMov]]
-})
+new_plant = make_input_frame(FuComElGen, ToFuCom, Gen, fuel_code_options[FuCod], prime_mover_options[PriMov])
+
+# Codes offered in the dropdowns that the model never saw contribute nothing to the prediction
+unknown_codes = unknown_input_codes(loaded_model)
+for feature, code in (("Fuel Code", fuel_code_options[FuCod]), ("Prime Mover", prime_mover_options[PriMov])):
+    if code in unknown_codes.get(feature, []):
+        st.warning(f"{feature} {code} did not occur in the model's training data; the prediction ignores it.")
 
 # predictict and store in session_state
 if st.button("Predict CO2 Emissions"):
-    co2_prediction = loaded_model.predict(new_plant)[0] #Extract scalar from array
+    with timed("predict"):
+        co2_prediction = prediction_cache.predict(new_plant)[0] #Extract scalar from array
+        lower, upper = (bound[0] for bound in intervals.bounds([co2_prediction]))
+    # Input/prediction sketches for the drift monitoring page (no request is stored)
+    observe(new_plant, [co2_prediction], source="app")
     st.session_state.co2_prediction = co2_prediction
+    st.session_state.co2_interval = (lower, upper)
+    st.session_state.co2_interval_held_out = intervals.held_out
     st.success(f"The estimated CO2 emission for your plant are: {co2_prediction: .2f} Ton/year")
+    if intervals.held_out:
+        st.info(f"{intervals.level:.0%} prediction interval: **{lower:,.0f} – {upper:,.0f} Ton/year**")
+        st.caption(f"Conformal interval calibrated on {intervals.rows:,} held-out plants ({intervals.source}).")
+    else:
+        st.info(f"Approximate range (in-sample): **{lower:,.0f} – {upper:,.0f} Ton/year**")
+        st.caption(f"Calibrated on the {intervals.rows:,} plants the model was trained on, so it is not a "
+                   f"calibrated {intervals.level:.0%} interval. Run `python train_model.py` or "
+                   "`python prediction_intervals.py --data <held-out file>` for one.")
+
+# Batch scoring: upload a CSV/Parquet file with the five input columns
+st.markdown("---------------")
+with st.expander("Batch scoring (CSV / Parquet)"):
+    st.caption("Columns required: " + ", ".join(f"`{col}`" for col in FEATURE_COLUMNS)
+               + ". Fuel Code and Prime Mover must be given as codes (e.g. `NG`, `GT`). "
+               f"The output includes the {intervals.level:.0%} prediction interval"
+               + ("." if intervals.held_out else " (in-sample calibration, see above)."))
+    uploaded_file = st.file_uploader("Plants to score", type=["csv", "parquet"])
+    output_format = st.radio("Output format", ["CSV", "Parquet"], horizontal=True)
+
+    if uploaded_file is not None and st.button("Score file"):
+        import io
+        output = io.BytesIO()
+        progress = st.progress(0.0, text="Scoring...")
+        try:
+            batch_stats = score_file(
+                loaded_model, uploaded_file, output,
+                parquet_in=uploaded_file.name.lower().endswith(".parquet"),
+                parquet_out=output_format == "Parquet",
+                progress=lambda rows: progress.progress(0.0, text=f"Scored {rows:,} rows"),
+                intervals=intervals,
+            )
+        except ValueError as e:
+            st.error(f"Error scoring file: {e}")
+        else:
+            progress.progress(1.0, text=f"Scored {batch_stats['rows']:,} rows")
+            st.success(f"Scored {batch_stats['rows']:,} rows in {batch_stats['seconds']:.2f} s "
+                       f"({batch_stats['rows_per_second']:,.0f} rows/s)")
+            if batch_stats["invalid_rows"]:
+                st.warning(f"{batch_stats['invalid_rows']:,} rows have an unknown Fuel Code or Prime Mover or a "
+                           "missing numeric input and were left without prediction.")
+            extension = "parquet" if output_format == "Parquet" else "csv"
+            st.download_button("Download predictions", output.getvalue(),
+                               file_name=f"co2_predictions.{extension}")
+
+# Load time and memory footprint of the cached artifacts
+with st.sidebar.expander("Loaded artifacts"):
+    for name, stats in get_load_stats().items():
+        st.markdown(f"- `{name}`: {stats['seconds'] * 1000:,.1f} ms, {stats['bytes'] / 1e6:,.2f} MB")
+
+# Hit/miss counters of the prediction cache
+with st.sidebar.expander("Prediction cache"):
+    cache_stats = prediction_cache.stats()
+    st.markdown(f"- Hits: {cache_stats['hits']:,}  \n- Misses: {cache_stats['misses']:,}  \n"
+                f"- Hit rate: {cache_stats['hit_rate']:.0%}  \n"
+                f"- Entries: {cache_stats['entries']:,} / {cache_stats['maxsize']:,}"
+                + ("  \n- Persisted to disk" if cache_stats["persistent"] else ""))
 
 st.markdown("<div style='text-align: right'><strong> Data source for modelling:</strong> https://www.eia.gov/electricity/data </div>",
             unsafe_allow_html=True
 )
+
+track_session("prediction")
+render_dev_panel()
@@ -0,0 +1,213 @@
+"""Batch scoring of CSV/Parquet files with the trained CO₂ pipeline.
+
+The input file is read in chunks, each chunk is scored with a single vectorized
+``predict`` call and appended to the output, so memory stays bounded by the
+chunk size rather than the file size.
+
+Command line:
+
+    python batch_scoring.py plants.csv predictions.csv --chunksize 50000
+
+With ``--workers N`` the chunks are scored by N processes instead (see
+parallel_scoring.py).
+"""
+
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from drift_monitor import observe
+from model_inputs import (CATEGORICAL_FEATURES, FEATURE_COLUMNS, NUMERIC_FEATURES, PREDICTION_COLUMN,
+                          invalid_code_mask, numeric_inputs)
+
+DEFAULT_CHUNKSIZE = 50_000
+
+
+def _is_parquet(name):
+    return str(name).lower().endswith((".parquet", ".pq"))
+
+
+def iter_chunks(source, chunksize=DEFAULT_CHUNKSIZE, parquet=None):
+    """Yield DataFrames of at most ``chunksize`` rows from a CSV or Parquet file.
+
+    ``source`` is a path or a binary file-like object (e.g. a Streamlit upload);
+    ``parquet`` overrides detection from the file extension.
+    """
+    if parquet is None:
+        parquet = _is_parquet(getattr(source, "name", source))
+
+    if parquet:
+        import pyarrow.parquet as pq
+
+        for batch in pq.ParquetFile(source).iter_batches(batch_size=chunksize):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(source, chunksize=chunksize)
+
+
+def check_feature_columns(chunk):
+    missing = [col for col in FEATURE_COLUMNS if col not in chunk.columns]
+    if missing:
+        raise ValueError(f"Input is missing required columns: {missing}")
+
+
+def score_chunk(model, chunk, intervals=None):
+    """Return ``chunk`` with a prediction column added.
+
+    Rows with an unknown Fuel Code or Prime Mover, or a numeric input that is
+    missing, not a number or infinite, are not sent to the model; they get NaN
+    as prediction so the output stays aligned with the input. Numeric inputs
+    are written back as floats (NaN where they were not numbers).
+    With ``intervals`` (prediction_intervals.ConformalIntervals) the lower and
+    upper bounds are added as well.
+    """
+    check_feature_columns(chunk)
+
+    numeric = numeric_inputs(chunk)
+    invalid = invalid_code_mask(chunk).to_numpy() | ~np.isfinite(numeric).all(axis=1)
+    chunk = chunk.copy()
+    chunk[NUMERIC_FEATURES] = numeric
+    predictions = np.full(len(chunk), np.nan)
+    if (~invalid).any():
+        predictions[~invalid] = model.predict(chunk.loc[~invalid, FEATURE_COLUMNS])
+    # All rows, so unknown codes show up on the monitoring page; NaN values are skipped
+    observe(chunk[FEATURE_COLUMNS], predictions, source="batch")
+
+    chunk[PREDICTION_COLUMN] = predictions
+    if intervals is not None:
+        add_interval_columns(chunk, predictions, intervals)
+    return chunk, int(invalid.sum())
+
+
+def add_interval_columns(chunk, predictions, intervals):
+    from prediction_intervals import LOWER_COLUMN, UPPER_COLUMN
+
+    chunk[LOWER_COLUMN], chunk[UPPER_COLUMN] = intervals.bounds(predictions)
+
+
+def _parquet_schema(table):
+    # Fixed once, from the first chunk: later chunks may infer other types for the
+    # same column (int vs float, all null vs string), which one Parquet file cannot hold.
+    # Other columns keep their type; one that is all null so far is taken as text.
+    import pyarrow as pa
+
+    from prediction_intervals import LOWER_COLUMN, UPPER_COLUMN
+
+    fields = []
+    for field, column in zip(table.schema, table.columns):
+        if field.name in NUMERIC_FEATURES or field.name in (PREDICTION_COLUMN, LOWER_COLUMN, UPPER_COLUMN):
+            fields.append(pa.field(field.name, pa.float64()))
+        elif field.name in CATEGORICAL_FEATURES or column.null_count == len(column):
+            fields.append(pa.field(field.name, pa.string()))
+        else:
+            fields.append(pa.field(field.name, field.type))
+    return pa.schema(fields)
+
+
+class _Writer:
+    # Appends scored chunks to a CSV or Parquet sink (path or binary buffer).
+
+    def __init__(self, sink, parquet):
+        self.sink = sink
+        self.parquet = parquet
+        self._parquet_writer = None
+        self._schema = None
+        self._header = True
+
+    def write(self, chunk):
+        if self.parquet:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            table = pa.Table.from_pandas(chunk, preserve_index=False)
+            if self._parquet_writer is None:
+                self._schema = _parquet_schema(table)
+                self._parquet_writer = pq.ParquetWriter(self.sink, self._schema)
+            self._parquet_writer.write_table(table.cast(self._schema))
+        else:
+            csv = chunk.to_csv(index=False, header=self._header)
+            if isinstance(self.sink, (str, os.PathLike)):
+                with open(self.sink, "w" if self._header else "a", newline="") as f:
+                    f.write(csv)
+            else:
+                self.sink.write(csv.encode("utf-8"))
+        self._header = False
+
+    def close(self):
+        if self._parquet_writer is not None:
+            self._parquet_writer.close()
+
+
+def score_file(model, source, sink, chunksize=DEFAULT_CHUNKSIZE, parquet_in=None, parquet_out=None,
+               progress=None, intervals=None):
+    """Score ``source`` chunk by chunk and write the result to ``sink``.
+
+    ``progress`` is an optional callable receiving the number of rows scored so far;
+    ``intervals`` adds prediction interval columns (see score_chunk).
+    Returns a dict with row counts, elapsed seconds and rows/second.
+    """
+    if parquet_out is None:
+        parquet_out = _is_parquet(getattr(sink, "name", sink))
+
+    writer = _Writer(sink, parquet_out)
+    rows = invalid_rows = 0
+    start = time.perf_counter()
+    try:
+        for chunk in iter_chunks(source, chunksize, parquet_in):
+            scored, invalid = score_chunk(model, chunk, intervals)
+            writer.write(scored)
+            rows += len(scored)
+            invalid_rows += invalid
+            if progress is not None:
+                progress(rows)
+    finally:
+        writer.close()
+    seconds = time.perf_counter() - start
+
+    return {
+        "rows": rows,
+        "invalid_rows": invalid_rows,
+        "seconds": seconds,
+        "rows_per_second": rows / seconds if seconds > 0 else float("nan"),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Score a CSV/Parquet file of plants with the CO₂ model.")
+    parser.add_argument("input", help="CSV or Parquet file with the five model feature columns")
+    parser.add_argument("output", help="CSV or Parquet file to write (input columns + prediction)")
+    parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE)
+    parser.add_argument("--model", default=None, help="Path to the trained pipeline (default: model_pickle/)")
+    parser.add_argument("--compiled", action="store_true",
+                        help="Predict with the pipeline flattened to NumPy (see compiled_model.py)")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Score chunks in this many processes (0 = one per CPU core)")
+    parser.add_argument("--intervals", action="store_true",
+                        help="Add conformal prediction interval columns (see prediction_intervals.py)")
+    args = parser.parse_args(argv)
+
+    from data_loader import MODEL_PATH, load_compiled_model, load_intervals, load_model
+
+    intervals = load_intervals(args.model or MODEL_PATH) if args.intervals else None
+    if args.workers != 1:
+        from parallel_scoring import score_file_parallel
+
+        stats = score_file_parallel(args.input, args.output, workers=args.workers or None,
+                                    chunksize=args.chunksize, model_path=args.model, compiled=args.compiled,
+                                    intervals=intervals)
+    else:
+        model = (load_compiled_model if args.compiled else load_model)(args.model or MODEL_PATH)
+        stats = score_file(model, args.input, args.output, chunksize=args.chunksize, intervals=intervals)
+
+    print(f"Scored {stats['rows']:,} rows in {stats['seconds']:.2f} s "
+          f"({stats['rows_per_second']:,.0f} rows/s)")
+    if stats["invalid_rows"]:
+        print(f"{stats['invalid_rows']:,} rows had an unknown Fuel Code or Prime Mover or a missing numeric input "
+              "and were not scored")
+
+
+if __name__ == "__main__":
+    main()
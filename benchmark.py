@@ -0,0 +1,305 @@
+"""Benchmarks for prediction, data loading and the per-rerun page work.
+
+Every benchmark runs against synthetic datasets built from the shipped ones at
+several scales (1x, 10x and 100x by default) and the results are written as
+JSON, tagged with the current git commit, so two runs can be compared:
+
+    python benchmark.py --output bench_results.json
+    python benchmark.py --compare old.json new.json
+"""
+
+import argparse
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+import data_loader
+from columnar_store import read_feather, write_feather
+from compiled_model import CompileError, compile_pipeline
+from emissions_index import EMISSIONS_COLUMN, EmissionsIndex
+from model_registry import ModelError
+from model_inputs import FEATURE_COLUMNS
+from plant_lookup import PlantLookup
+from strategy_codes import boiler_comparison, decode_frame
+
+DEFAULT_SCALES = [1, 10, 100]
+
+# Numeric columns that get multiplicative noise in the synthetic copies
+_JITTER_COLUMNS = [
+    "Generation (kWh)", "Total Fuel Consumption (MMBtu)",
+    "Fuel Consumption for Electric Generation (MMBtu)", EMISSIONS_COLUMN,
+]
+
+
+def scale_frame(df, factor, seed=0):
+    """``factor`` copies of ``df``; each copy gets its own Plant Codes and jittered numeric values."""
+    if factor == 1:
+        return df.reset_index(drop=True)
+
+    rng = np.random.default_rng(seed)
+    code_offset = int(df["Plant Code"].max()) + 1
+    copies = []
+    for k in range(factor):
+        copy = df.copy()
+        copy["Plant Code"] = copy["Plant Code"] + k * code_offset
+        if k:
+            for col in _JITTER_COLUMNS:
+                if col in copy.columns:
+                    noise = rng.lognormal(0.0, 0.1, len(copy))
+                    copy[col] = (copy[col].to_numpy() * noise).astype(copy[col].dtype)
+        copies.append(copy)
+    return pd.concat(copies, ignore_index=True)
+
+
+def _timeit(fn, repeat=5):
+    # Median wall time of ``repeat`` calls, in seconds
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+def _peak_memory(fn):
+    # Peak bytes allocated (as seen by tracemalloc) while running fn
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def _record(benchmark, scale, rows, seconds, **extra):
+    record = {"benchmark": benchmark, "scale": scale, "rows": int(rows), "seconds": seconds}
+    if rows and seconds > 0:
+        record["rows_per_second"] = rows / seconds
+    record.update(extra)
+    return record
+
+
+def bench_predict(model, emissions, scale, single_calls=200):
+    features = emissions[FEATURE_COLUMNS]
+    one_row = features.iloc[[0]]
+
+    single = _timeit(lambda: [model.predict(one_row) for _ in range(single_calls)], repeat=3) / single_calls
+    batch = _timeit(lambda: model.predict(features), repeat=3)
+    results = [
+        _record("predict_single_row", scale, 1, single),
+        _record("predict_batch", scale, len(features), batch),
+    ]
+
+    try:
+        compiled = compile_pipeline(model)
+    except CompileError:
+        return results
+    values = tuple(one_row.iloc[0])
+    single = _timeit(lambda: [compiled.predict_one(*values) for _ in range(single_calls)], repeat=3) / single_calls
+    batch = _timeit(lambda: compiled.predict(features), repeat=3)
+    return results + [
+        _record("predict_compiled_single_row", scale, 1, single),
+        _record("predict_compiled_batch", scale, len(features), batch),
+    ]
+
+
+def bench_artifacts(frames, scale):
+    # ``frames`` as read from the shipped .pkl files (object dtypes), not the
+    # loaded Feather frames: pickling those (categoricals) understates the unpickle cost
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, df in frames.items():
+            path = os.path.join(tmp, f"{name}.pkl")
+            df.to_pickle(path)
+            seconds = _timeit(lambda: pd.read_pickle(path))
+            peak = _peak_memory(lambda: pd.read_pickle(path))
+            results.append(_record(f"unpickle:{name}", scale, len(df), seconds,
+                                   file_bytes=os.path.getsize(path), peak_bytes=peak))
+
+            path = os.path.join(tmp, f"{name}.feather")
+            write_feather(df, path)
+            seconds = _timeit(lambda: read_feather(path))
+            peak = _peak_memory(lambda: read_feather(path))
+            results.append(_record(f"feather:{name}", scale, len(df), seconds,
+                                   file_bytes=os.path.getsize(path), peak_bytes=peak))
+    return results
+
+
+def bench_model_load(path):
+    # The model artifact the loader reads (the .sav, or its export); it does not depend on the scale
+    from model_registry import read_artifact, resolve_model
+
+    artifact = resolve_model(path)[0]
+    read = read_artifact if artifact.endswith((".skops", ".joblib")) else pd.read_pickle
+    seconds = _timeit(lambda: read(artifact))
+    return [_record(f"load_model:{os.path.basename(artifact)}", 1, 0, seconds, file_bytes=os.path.getsize(artifact))]
+
+
+def bench_filter(emissions, scale, queries=50, range_percent=10, seed=0):
+    rng = np.random.default_rng(seed)
+    predictions = rng.choice(emissions[EMISSIONS_COLUMN].to_numpy(), queries)
+    column = emissions[EMISSIONS_COLUMN]
+
+    def masks():
+        for p in predictions:
+            lower, upper = p * (1 - range_percent / 100), p * (1 + range_percent / 100)
+            emissions[(column >= lower) & (column <= upper)]
+
+    build = _timeit(lambda: EmissionsIndex.from_frame(emissions), repeat=3)
+    index = EmissionsIndex.from_frame(emissions)
+
+    def searches():
+        for p in predictions:
+            emissions.iloc[index.window(p * (1 - range_percent / 100), p * (1 + range_percent / 100))]
+
+    return [
+        _record("filter_boolean_mask", scale, len(emissions), _timeit(masks) / queries),
+        _record("filter_index_build", scale, len(emissions), build),
+        _record("filter_sorted_index", scale, len(emissions), _timeit(searches) / queries),
+    ]
+
+
+def bench_lookup(frames, scale, queries=200, seed=0):
+    rng = np.random.default_rng(seed)
+    results = []
+    for name in ("emissions", "emiss_strategy_plant"):
+        df = frames[name]
+        codes = rng.choice(df["Plant Code"].to_numpy(), queries)
+
+        def scans():
+            for code in codes:
+                df[df["Plant Code"].astype(int) == code]
+
+        build = _timeit(lambda: PlantLookup(df), repeat=3)
+        lookup = PlantLookup(df)
+
+        def slices():
+            for code in codes:
+                lookup.rows(code)
+
+        results += [
+            _record(f"lookup_scan:{name}", scale, len(df), _timeit(scans) / queries),
+            _record(f"lookup_build:{name}", scale, len(df), build),
+            _record(f"lookup_index:{name}", scale, len(df), _timeit(slices) / queries),
+        ]
+    return results
+
+
+def bench_decode(strategy, scale, queries=50, seed=0):
+    rng = np.random.default_rng(seed)
+    codes = rng.choice(strategy["Plant Code"].to_numpy(), queries)
+
+    build = _timeit(lambda: PlantLookup(decode_frame(strategy)), repeat=3)
+    peak = _peak_memory(lambda: PlantLookup(decode_frame(strategy)))
+    decoded = PlantLookup(decode_frame(strategy))
+
+    def tables():
+        for code in codes:
+            boiler_comparison(decoded.rows(code))
+
+    return [
+        _record("decode_build", scale, len(strategy), build, peak_bytes=peak),
+        _record("decode_plant_table", scale, len(strategy), _timeit(tables) / queries),
+    ]
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=data_loader.BASE_DIR, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(scales=DEFAULT_SCALES, include_predict=True):
+    base = {
+        "emissions": data_loader.load_emissions(),
+        "emiss_strategy_plant": data_loader.load_strategy(),
+        "PlantGen": data_loader.load_plant_gen(),
+    }
+    shipped = {name: pd.read_pickle(os.path.join(data_loader.MODEL_DIR, f"{name}.pkl")) for name in base}
+    model = None
+    results = []
+    if include_predict:
+        try:
+            model = data_loader.load_model()
+        except ModelError as e:
+            print(f"{e} Skipping predict benchmarks")
+        else:
+            results += bench_model_load(data_loader.MODEL_PATH)
+
+    for scale in scales:
+        frames = {name: scale_frame(df, scale, seed=scale) for name, df in base.items()}
+        print(f"Scale {scale}x: {len(frames['emissions']):,} emission rows, "
+              f"{len(frames['emiss_strategy_plant']):,} boiler rows")
+        if model is not None:
+            results += bench_predict(model, frames["emissions"], scale)
+        results += bench_artifacts({name: scale_frame(df, scale, seed=scale) for name, df in shipped.items()}, scale)
+        results += bench_filter(frames["emissions"], scale)
+        results += bench_lookup(frames, scale)
+        results += bench_decode(frames["emiss_strategy_plant"], scale)
+
+    return {
+        "commit": _git_commit(),
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "numpy": np.__version__,
+        "machine": platform.machine(),
+        "results": results,
+    }
+
+
+def compare(old, new, threshold=1.2):
+    """Print old vs new seconds per benchmark; returns the number of regressions over ``threshold``."""
+    old_times = {(r["benchmark"], r["scale"]): r["seconds"] for r in old["results"]}
+    regressions = 0
+    out = io.StringIO()
+    print(f"{'benchmark':<40}{'scale':>6}{'old (ms)':>12}{'new (ms)':>12}{'ratio':>8}", file=out)
+    for r in new["results"]:
+        key = (r["benchmark"], r["scale"])
+        if key not in old_times:
+            continue
+        ratio = r["seconds"] / old_times[key] if old_times[key] else float("nan")
+        flag = "  <-- slower" if ratio > threshold else ""
+        regressions += ratio > threshold
+        print(f"{r['benchmark']:<40}{r['scale']:>6}{old_times[key] * 1000:>12.3f}"
+              f"{r['seconds'] * 1000:>12.3f}{ratio:>8.2f}{flag}", file=out)
+    print(out.getvalue(), end="")
+    print(f"{regressions} regression(s) over {threshold:.1f}x ({old.get('commit')} -> {new.get('commit')})")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark prediction, data loading and page lookups.")
+    parser.add_argument("--scales", type=int, nargs="+", default=DEFAULT_SCALES)
+    parser.add_argument("--output", default="bench_results.json")
+    parser.add_argument("--no-predict", action="store_true", help="Skip the model benchmarks")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="Compare two result files")
+    parser.add_argument("--threshold", type=float, default=1.2, help="Slowdown ratio reported as regression")
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        with open(args.compare[0]) as f:
+            old = json.load(f)
+        with open(args.compare[1]) as f:
+            new = json.load(f)
+        raise SystemExit(1 if compare(old, new, args.threshold) else 0)
+
+    report = run(args.scales, include_predict=not args.no_predict)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {len(report['results'])} results to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+"""Emissions vs generation comparison chart for the benchmarking page.
+
+The ±range window can hold thousands of plants, and sending one bar per plant
+to the browser dominates page latency. The figure is therefore capped:
+
+- up to ``max_bars`` plants: one bar pair per plant (as before);
+- more than that: the ``max_bars`` plants nearest to the prediction get their
+  own bars, the rest is aggregated into a few equal-count bins on each side;
+- more than ``webgl_threshold`` plants: a WebGL scatter (emissions vs
+  generation) of at most ``max_points`` points; the ``max_bars`` plants nearest
+  to the prediction are always plotted, only the rest is thinned.
+
+Everything is built from NumPy arrays that are already sorted by emissions
+(as returned by the sorted emissions index), without DataFrame concat/sort.
+"""
+
+import numpy as np
+import plotly.graph_objects as go
+
+DEFAULT_MAX_BARS = 50
+DEFAULT_BINS_PER_SIDE = 5
+DEFAULT_WEBGL_THRESHOLD = 5_000
+DEFAULT_MAX_POINTS = 4_000
+
+PREDICTED_LABEL = "Predicted Value"
+
+
+def _nearest_window(emissions, prediction, k):
+    # The k values closest to ``prediction`` form a contiguous run of the sorted array
+    nearest = np.sort(np.argpartition(np.abs(emissions - prediction), k - 1)[:k])
+    return nearest[0], nearest[-1] + 1
+
+
+def _bins(codes, emissions, generation, n_bins):
+    # Equal-count bins: label, mean emissions, mean generation
+    labels, emiss, gen = [], [], []
+    if len(emissions) == 0:
+        return np.array(labels, dtype=object), np.array(emiss, dtype=float), np.array(gen, dtype=float)
+    for part in np.array_split(np.arange(len(emissions)), min(n_bins, len(emissions))):
+        if len(part) == 0:
+            continue
+        lo, hi = emissions[part[0]], emissions[part[-1]]
+        labels.append(f"{len(part)} plants {lo:,.0f}–{hi:,.0f} t")
+        emiss.append(emissions[part].mean())
+        gen.append(generation[part].mean())
+    return np.array(labels, dtype=object), np.array(emiss, dtype=float), np.array(gen, dtype=float)
+
+
+def _bar_figure(labels, emissions, generation, kind):
+    # kind: 0 = plant, 1 = predicted value, 2 = aggregated bin
+    colors_emiss = np.choose(kind, ["skyblue", "steelblue", "lightgray"])
+    colors_gen = np.choose(kind, ["rosybrown", "indianred", "gainsboro"])
+
+    fig = go.Figure()
+
+    # Primary Y-axis: Tons of CO2 Emissions
+    fig.add_trace(go.Bar(
+        x=labels,
+        y=emissions,
+        name='CO₂ Emissions (Ton)',
+        marker_color=colors_emiss,
+        yaxis='y1'
+    ))
+
+    # Secondary Y-axis: Generation (kWh)
+    fig.add_trace(go.Bar(
+        x=labels,
+        y=generation,
+        name='Generation (kWh)',
+        marker_color=colors_gen,
+        yaxis='y2'
+    ))
+
+    fig.update_layout(
+        title='CO₂ Emissions vs Generation by Plant',
+        xaxis=dict(
+            title='Plant Code',
+            type='category'
+        ),
+        yaxis=dict(
+            title='CO₂ Emissions (Ton)',
+            titlefont=dict(color="steelblue"),
+            tickfont=dict(color="steelblue"),
+        ),
+        yaxis2=dict(
+            title='Generation (kWh)',
+            titlefont=dict(color='indianred'),
+            tickfont=dict(color='indianred'),
+            overlaying='y',
+            side='right'
+        ),
+        legend=dict(x=0.01, y=0.99),
+        barmode='group',
+        margin=dict(l=40, r=40, t=60, b=40)
+    )
+    return fig
+
+
+def _scatter_figure(codes, emissions, generation, prediction, gen_plant, max_points, max_bars):
+    # Keep the plants nearest to the prediction, thin out the rest evenly along
+    # the emissions order (the extremes are always kept)
+    if len(emissions) > max_points:
+        start, stop = _nearest_window(emissions, prediction, min(max_bars, max_points))
+        rest = np.concatenate([np.arange(start), np.arange(stop, len(emissions))])
+        n_rest = max_points - (stop - start)
+        thinned = rest[np.unique(np.linspace(0, len(rest) - 1, n_rest).astype(int))] if n_rest > 0 else rest[:0]
+        keep = np.sort(np.concatenate([np.arange(start, stop), thinned]))
+        codes, emissions, generation = codes[keep], emissions[keep], generation[keep]
+
+    fig = go.Figure()
+    fig.add_trace(go.Scattergl(
+        x=emissions,
+        y=generation,
+        mode='markers',
+        name='Plants',
+        text=codes,
+        hovertemplate="Plant %{text}<br>%{x:,.0f} Ton<br>%{y:,.0f} kWh<extra></extra>",
+        marker=dict(color="skyblue", size=5, opacity=0.7),
+    ))
+    fig.add_trace(go.Scattergl(
+        x=[prediction],
+        y=[gen_plant],
+        mode='markers',
+        name=PREDICTED_LABEL,
+        marker=dict(color="indianred", size=12, symbol="diamond"),
+    ))
+    fig.update_layout(
+        title='CO₂ Emissions vs Generation by Plant',
+        xaxis=dict(title='CO₂ Emissions (Ton)'),
+        yaxis=dict(title='Generation (kWh)'),
+        legend=dict(x=0.01, y=0.99),
+        margin=dict(l=40, r=40, t=60, b=40)
+    )
+    return fig
+
+
+def build_comparison_figure(codes, emissions, generation, prediction, gen_plant,
+                            max_bars=DEFAULT_MAX_BARS, bins_per_side=DEFAULT_BINS_PER_SIDE,
+                            webgl_threshold=DEFAULT_WEBGL_THRESHOLD, max_points=DEFAULT_MAX_POINTS):
+    """Comparison figure for the plants in the window plus the predicted plant.
+
+    ``codes``, ``emissions`` and ``generation`` are arrays sorted by emissions.
+    Returns ``(figure, mode)`` with mode "bars", "binned" or "webgl".
+    """
+    codes = np.asarray(codes).astype(str).astype(object)
+    emissions = np.asarray(emissions, dtype=float)
+    generation = np.asarray(generation, dtype=float)
+    n = len(emissions)
+
+    if n > webgl_threshold:
+        return _scatter_figure(codes, emissions, generation, prediction, gen_plant, max_points, max_bars), "webgl"
+
+    kind = np.zeros(n, dtype=int)
+    mode = "bars"
+    if n > max_bars:
+        start, stop = _nearest_window(emissions, prediction, max_bars)
+        below = _bins(codes[:start], emissions[:start], generation[:start], bins_per_side)
+        above = _bins(codes[stop:], emissions[stop:], generation[stop:], bins_per_side)
+        codes = np.concatenate([below[0], codes[start:stop], above[0]])
+        emissions = np.concatenate([below[1], emissions[start:stop], above[1]])
+        generation = np.concatenate([below[2], generation[start:stop], above[2]])
+        kind = np.concatenate([np.full(len(below[0]), 2), np.zeros(stop - start, dtype=int),
+                               np.full(len(above[0]), 2)])
+        mode = "binned"
+
+    # Add the predicted value where it belongs in the emissions order
+    at = np.searchsorted(emissions, prediction, side="right")
+    codes = np.insert(codes, at, PREDICTED_LABEL)
+    emissions = np.insert(emissions, at, prediction)
+    generation = np.insert(generation, at, gen_plant)
+    kind = np.insert(kind, at, 1)
+
+    return _bar_figure(codes, emissions, generation, kind), mode
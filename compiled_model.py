@@ -0,0 +1,262 @@
+"""Flat NumPy inference for the trained CO₂ pipeline.
+
+For one-row predictions ``Pipeline.predict`` spends most of its time building
+and validating DataFrames, not computing. ``compile_pipeline`` reads the fitted
+ColumnTransformer (scalers on the numeric features, one-hot encoding of
+Fuel Code / Prime Mover) and the final estimator into plain arrays and dicts:
+
+- linear estimators (anything with ``coef_``/``intercept_``) are folded with the
+  preprocessing into one constant, three numeric weights and a weight per code,
+  so a prediction is a handful of multiply-adds;
+- other estimators get the feature matrix built in NumPy and their ``predict``
+  called on it directly, skipping the pandas/ColumnTransformer layer.
+
+``verify_equivalence`` checks a compiled model against the original pipeline,
+including rows of zeros and unknown codes; data_loader.load_compiled_model runs
+it before handing the model out. Run the same check from the command line after
+retraining:
+
+    python compiled_model.py     # verify against the shipped pipeline and compare latency
+"""
+
+import time
+
+import numpy as np
+import pandas as pd
+
+from model_inputs import CATEGORICAL_FEATURES, FEATURE_COLUMNS, NUMERIC_FEATURES
+
+UNKNOWN_CODE = "__unknown__"   # code used to check the handling of unseen categories
+
+
+class CompileError(ValueError):
+    """The pipeline uses a step the compiler does not know how to flatten."""
+
+
+def _affine(transformer, n):
+    # (scale, offset) such that transformer.transform(x) == x * scale + offset
+    name = type(transformer).__name__
+    if transformer == "passthrough" or name == "FunctionTransformer" and transformer.func is None:
+        return np.ones(n), np.zeros(n)
+    if name == "StandardScaler":
+        scale = np.ones(n) if transformer.scale_ is None else 1.0 / transformer.scale_
+        mean = np.zeros(n) if transformer.mean_ is None else transformer.mean_
+        return scale, -mean * scale
+    if name == "MinMaxScaler":
+        if getattr(transformer, "clip", False):
+            raise CompileError("MinMaxScaler(clip=True) is not supported")
+        return transformer.scale_.copy(), transformer.min_.copy()
+    if name == "MaxAbsScaler":
+        return 1.0 / transformer.scale_, np.zeros(n)
+    raise CompileError(f"Unsupported numeric transformer: {name}")
+
+
+def _one_hot_columns(encoder, features):
+    # [(feature, category)] in the encoder's output order
+    if type(encoder).__name__ != "OneHotEncoder":
+        raise CompileError(f"Unsupported categorical transformer: {type(encoder).__name__}")
+    if getattr(encoder, "_infrequent_enabled", False):
+        raise CompileError("OneHotEncoder with infrequent categories is not supported")
+    drop_idx = encoder.drop_idx_
+    columns = []
+    for i, (feature, categories) in enumerate(zip(features, encoder.categories_)):
+        for j, category in enumerate(categories):
+            if drop_idx is not None and drop_idx[i] is not None and j == drop_idx[i]:
+                continue
+            columns.append((feature, category))
+    return columns, encoder.handle_unknown == "error"
+
+
+class CompiledModel:
+    """Pipeline flattened to arrays; see ``compile_pipeline``."""
+
+    def __init__(self, numeric_specs, categorical_specs, n_outputs, estimator, strict_features):
+        # numeric_specs: [(output column, input feature, scale, offset)]
+        # categorical_specs: [(output column, input feature, category)]
+        self.n_outputs = n_outputs
+        self.estimator = estimator
+        self.strict_features = strict_features
+
+        self._num_out = np.array([s[0] for s in numeric_specs], dtype=int)
+        self._num_src = np.array([NUMERIC_FEATURES.index(s[1]) for s in numeric_specs], dtype=int)
+        self._num_scale = np.array([s[2] for s in numeric_specs], dtype=float)
+        self._num_offset = np.array([s[3] for s in numeric_specs], dtype=float)
+        self._cat_out = {feature: {} for feature in CATEGORICAL_FEATURES}
+        for out, feature, category in categorical_specs:
+            self._cat_out[feature][category] = out
+        self.known_codes = {feature: set(levels) for feature, levels in self._cat_out.items()}
+
+        # Single-output linear model: one weight per preprocessed column
+        coef = getattr(estimator, "coef_", None)
+        self.linear = coef is not None and np.size(coef) == n_outputs
+        if self.linear:
+            coef = np.ravel(coef)
+            intercept = float(np.ravel(estimator.intercept_)[0])
+            self.constant = intercept + float(coef[self._num_out] @ self._num_offset)
+            self.numeric_weights = np.zeros(len(NUMERIC_FEATURES))
+            np.add.at(self.numeric_weights, self._num_src, coef[self._num_out] * self._num_scale)
+            self.code_weights = {feature: {category: float(coef[out]) for category, out in levels.items()}
+                                 for feature, levels in self._cat_out.items()}
+            self._w0, self._w1, self._w2 = (float(w) for w in self.numeric_weights)
+
+    def _check_codes(self, feature, codes):
+        if feature in self.strict_features:
+            unknown = set(codes) - self.known_codes[feature]
+            if unknown:
+                raise ValueError(f"Found unknown categories {sorted(map(str, unknown))} in '{feature}'")
+
+    def predict_one(self, fuel_elec_gen, total_fuel, generation, fuel_code, prime_mover):
+        """Prediction for one plant from plain values (same order as the prediction page inputs)."""
+        if not self.linear:
+            return float(self.predict_arrays(
+                np.array([[fuel_elec_gen, total_fuel, generation]], dtype=float), [fuel_code], [prime_mover])[0])
+        self._check_codes("Fuel Code", (fuel_code,))
+        self._check_codes("Prime Mover", (prime_mover,))
+        return (self.constant + self._w0 * fuel_elec_gen + self._w1 * total_fuel + self._w2 * generation
+                + self.code_weights["Fuel Code"].get(fuel_code, 0.0)
+                + self.code_weights["Prime Mover"].get(prime_mover, 0.0))
+
+    def predict_arrays(self, numeric, fuel_codes, prime_movers):
+        """Predictions from an (n, 3) numeric array (NUMERIC_FEATURES order) and two code sequences."""
+        numeric = np.asarray(numeric, dtype=float).reshape(-1, len(NUMERIC_FEATURES))
+        codes = {"Fuel Code": np.asarray(fuel_codes, dtype=object),
+                 "Prime Mover": np.asarray(prime_movers, dtype=object)}
+        for feature, values in codes.items():
+            self._check_codes(feature, values)
+
+        if self.linear:
+            result = self.constant + numeric @ self.numeric_weights
+            for feature, values in codes.items():
+                weights = self.code_weights[feature]
+                result += np.fromiter((weights.get(v, 0.0) for v in values), dtype=float, count=len(values))
+            return result
+
+        X = np.zeros((len(numeric), self.n_outputs))
+        X[:, self._num_out] = numeric[:, self._num_src] * self._num_scale + self._num_offset
+        rows = np.arange(len(numeric))
+        for feature, values in codes.items():
+            out = np.fromiter((self._cat_out[feature].get(v, -1) for v in values), dtype=int, count=len(values))
+            known = out >= 0
+            X[rows[known], out[known]] = 1.0
+        return self.estimator.predict(X)
+
+    def predict(self, X):
+        """Same input as the pipeline (DataFrame), or a dict of feature column -> values."""
+        if isinstance(X, pd.DataFrame):
+            numeric = X[NUMERIC_FEATURES].to_numpy(dtype=float)
+            return self.predict_arrays(numeric, X["Fuel Code"].to_numpy(), X["Prime Mover"].to_numpy())
+        numeric = np.column_stack([np.atleast_1d(np.asarray(X[col], dtype=float)) for col in NUMERIC_FEATURES])
+        return self.predict_arrays(numeric, np.atleast_1d(X["Fuel Code"]), np.atleast_1d(X["Prime Mover"]))
+
+
+def compile_pipeline(pipeline):
+    """Flatten a fitted Pipeline(ColumnTransformer, estimator) into a CompiledModel."""
+    steps = getattr(pipeline, "steps", None)
+    if not steps or len(steps) != 2:
+        raise CompileError("Expected a Pipeline with a ColumnTransformer and an estimator")
+    preprocessor, estimator = steps[0][1], steps[1][1]
+    if type(preprocessor).__name__ != "ColumnTransformer":
+        raise CompileError(f"Unsupported preprocessing step: {type(preprocessor).__name__}")
+
+    numeric_specs, categorical_specs, strict = [], [], set()
+    for name, transformer, columns in preprocessor.transformers_:
+        if transformer == "drop" or len(columns) == 0:
+            continue
+        columns = [FEATURE_COLUMNS[c] if isinstance(c, (int, np.integer)) else c for c in columns]
+        start = preprocessor.output_indices_[name].start
+        if all(c in NUMERIC_FEATURES for c in columns):
+            scale, offset = _affine(transformer, len(columns))
+            numeric_specs += [(start + i, c, scale[i], offset[i]) for i, c in enumerate(columns)]
+        elif all(c in CATEGORICAL_FEATURES for c in columns):
+            one_hot, is_strict = _one_hot_columns(transformer, columns)
+            categorical_specs += [(start + i, f, category) for i, (f, category) in enumerate(one_hot)]
+            if is_strict:
+                strict.update(columns)
+        else:
+            raise CompileError(f"Transformer '{name}' mixes numeric and categorical columns")
+
+    n_outputs = max(s.stop for s in preprocessor.output_indices_.values())
+    return CompiledModel(numeric_specs, categorical_specs, n_outputs, estimator, strict)
+
+
+def verification_frame(emissions, max_rows=2000):
+    """Real rows from the emissions data plus every fuel code x prime mover pair, at the median and at zero."""
+    from model_inputs import FUEL_CODES, PRIME_MOVERS
+
+    sample = emissions[FEATURE_COLUMNS].head(max_rows)
+    medians = sample[NUMERIC_FEATURES].median()
+    grid = pd.DataFrame([(f, m) for f in sorted(FUEL_CODES) for m in sorted(PRIME_MOVERS)],
+                        columns=CATEGORICAL_FEATURES)
+    zeros = grid.copy()
+    for col in NUMERIC_FEATURES:
+        grid[col] = medians[col]
+        zeros[col] = 0.0
+    frame = pd.concat([sample, grid[FEATURE_COLUMNS], zeros[FEATURE_COLUMNS]], ignore_index=True)
+    frame["Fuel Code"] = frame["Fuel Code"].astype(str)
+    frame["Prime Mover"] = frame["Prime Mover"].astype(str)
+    return frame
+
+
+def verify_equivalence(compiled, pipeline, frame, rtol=1e-7):
+    """Raise ValueError unless ``compiled`` reproduces ``pipeline`` on ``frame``; returns the max abs error."""
+    # Codes a strict encoder has not seen are rejected; that is checked separately below
+    for feature in compiled.strict_features:
+        frame = frame[frame[feature].isin(compiled.known_codes[feature])]
+    expected = np.asarray(pipeline.predict(frame), dtype=float)
+    actual = compiled.predict(frame)
+    atol = rtol * max(1.0, float(np.abs(expected).max()))
+    if not np.allclose(actual, expected, rtol=rtol, atol=atol):
+        worst = int(np.argmax(np.abs(actual - expected)))
+        raise ValueError(f"Compiled model differs from the pipeline: row {worst} "
+                         f"gives {actual[worst]!r} instead of {expected[worst]!r}")
+    singles = [compiled.predict_one(*row) for row in frame.head(50).itertuples(index=False, name=None)]
+    if not np.allclose(singles, expected[:len(singles)], rtol=rtol, atol=atol):
+        raise ValueError("Compiled single-row path differs from the pipeline")
+
+    # Unseen codes: rejected by both, or scored the same by both
+    for feature in CATEGORICAL_FEATURES:
+        unknown = frame.head(5).copy()
+        unknown[feature] = UNKNOWN_CODE
+        try:
+            unknown_expected = np.asarray(pipeline.predict(unknown), dtype=float)
+        except ValueError:
+            try:
+                compiled.predict(unknown)
+            except ValueError:
+                continue
+            raise ValueError(f"Compiled model accepts unknown '{feature}' codes, the pipeline rejects them")
+        try:
+            unknown_actual = compiled.predict(unknown)
+        except ValueError:
+            raise ValueError(f"Compiled model rejects unknown '{feature}' codes, the pipeline accepts them")
+        if not np.allclose(unknown_actual, unknown_expected, rtol=rtol, atol=atol):
+            raise ValueError(f"Compiled model differs from the pipeline on unknown '{feature}' codes")
+    return float(np.abs(actual - expected).max())
+
+
+def main():
+    import data_loader
+
+    pipeline = data_loader.load_model()
+    frame = verification_frame(data_loader.load_emissions())
+    compiled = compile_pipeline(pipeline)
+    error = verify_equivalence(compiled, pipeline, frame)
+    print(f"Compiled ({'linear' if compiled.linear else 'feature matrix'}) model matches the pipeline "
+          f"on {len(frame):,} rows, zeros and unknown codes included (max abs error {error:.3g})")
+
+    one_row = frame.iloc[[0]]
+    values = tuple(one_row.iloc[0])
+    n = 2000
+    start = time.perf_counter()
+    for _ in range(n // 20):
+        pipeline.predict(one_row)
+    pipeline_us = (time.perf_counter() - start) / (n // 20) * 1e6
+    start = time.perf_counter()
+    for _ in range(n):
+        compiled.predict_one(*values)
+    compiled_us = (time.perf_counter() - start) / n * 1e6
+    print(f"Single row: pipeline {pipeline_us:,.1f} µs, compiled {compiled_us:,.2f} µs")
+
+
+if __name__ == "__main__":
+    main()
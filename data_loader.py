@@ -0,0 +1,401 @@
+"""Process-wide loader for the trained model and the datasets in model_pickle/.
+
+Streamlit re-runs every page script on each widget change, so unpickling at
+module level means paying the full load cost on every keystroke and for every
+session. The functions here load each artifact once per process and keep it
+until the file on disk changes (path + mtime), so dropping in a new artifact
+is picked up without restarting the server.
+
+Datasets are read from the memory-mapped Feather files written by
+columnar_store.py when they exist, with only the requested columns
+materialized; the pickles are used as a fallback. Year partitions appended by
+ingest.py (model_pickle/partitions/<dataset>/) are cached, and their indexes
+built, one file at a time, so new data only costs the new partitions plus a
+cheap merge.
+"""
+
+import json
+import os
+import pickle
+import threading
+import time
+
+import pandas as pd
+
+from instrumentation import timed
+
+# Copy-on-write lets every rerun get a cheap shallow view of the cached frames:
+# pages can add or convert columns locally without touching the shared copy.
+pd.set_option("mode.copy_on_write", True)
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+MODEL_DIR = os.path.join(BASE_DIR, "model_pickle")
+
+MODEL_PATH = os.path.join(MODEL_DIR, "trained_pipe_co2.sav")
+
+PARTITION_DIR = os.path.join(MODEL_DIR, "partitions")
+
+EMISSIONS = "emissions"
+STRATEGY = "emiss_strategy_plant"
+PLANT_GEN = "PlantGen"
+
+_cache = {}        # (path, columns) -> (mtime_ns, object)
+_derived = {}      # (path, columns, name) -> (mtime_ns, object built from the artifact)
+_combined = {}     # (dataset, columns, name) -> (partition signature, object merged from all partitions)
+_load_stats = {}   # (path, columns) -> {"seconds": ..., "bytes": ..., "mtime_ns": ...}
+_lock = threading.Lock()
+
+
+def _memory_footprint(obj):
+    # DataFrames report their real footprint; for anything else (the model)
+    # the pickle size on disk is a reasonable stand-in.
+    if isinstance(obj, pd.DataFrame):
+        return int(obj.memory_usage(deep=True).sum())
+    return None
+
+
+def data_path(name):
+    """Path of dataset ``name``: the Feather file if it has been converted, else the pickle."""
+    columnar = os.path.join(MODEL_DIR, f"{name}.feather")
+    if os.path.exists(columnar):
+        return columnar
+    return os.path.join(MODEL_DIR, f"{name}.pkl")
+
+
+def model_side_path(model_path, name):
+    """Path of file ``name`` describing the model at ``model_path`` (calibration, reference profile).
+
+    model_pickle/<name> for the live model (MODEL_PATH); next to any other
+    (candidate) model it is <model file without extension>_<name>, so training a
+    candidate never replaces the files of the live model.
+    """
+    if os.path.abspath(model_path) == os.path.abspath(MODEL_PATH):
+        return os.path.join(MODEL_DIR, name)
+    return f"{os.path.splitext(model_path)[0]}_{name}"
+
+
+def partition_paths(name):
+    """Year partitions of dataset ``name`` appended by ingest.py, in file name (year) order."""
+    directory = os.path.join(PARTITION_DIR, name)
+    if not os.path.isdir(directory):
+        return []
+    return sorted(os.path.join(directory, f) for f in os.listdir(directory) if f.endswith(".feather"))
+
+
+def dataset_paths(name):
+    """All files making up dataset ``name``: the shipped snapshot, then the year partitions."""
+    return [data_path(name)] + partition_paths(name)
+
+
+def _read(path, columns):
+    if path.endswith(".feather"):
+        from columnar_store import read_feather
+
+        return read_feather(path, columns)
+    if path.endswith(".json"):
+        with open(path) as f:
+            return json.load(f)
+    if path.endswith((".skops", ".joblib")):
+        from model_registry import read_artifact
+
+        return read_artifact(path)
+
+    with open(path, "rb") as f:
+        obj = pickle.load(f)
+    if columns is not None:
+        obj = obj[list(columns)]
+    return obj
+
+
+def _load(path, columns=None):
+    path = os.path.abspath(path)
+    columns = None if columns is None else tuple(columns)
+    key = (path, columns)
+    mtime = os.stat(path).st_mtime_ns
+
+    with _lock:
+        cached = _cache.get(key)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+
+        start = time.perf_counter()
+        with timed(f"load:{os.path.basename(path)}", columns=None if columns is None else len(columns)):
+            obj = _read(path, columns)
+        seconds = time.perf_counter() - start
+
+        footprint = _memory_footprint(obj)
+        if footprint is None:
+            footprint = os.path.getsize(path)
+
+        _cache[key] = (mtime, obj)
+        _load_stats[key] = {"seconds": seconds, "bytes": footprint, "mtime_ns": mtime}
+        return obj
+
+
+def _load_derived(path, name, build, columns=None):
+    # Structures computed from an artifact (indexes, lookup tables) are cached
+    # alongside it and rebuilt only when the artifact itself is reloaded.
+    obj = _load(path, columns)
+    key = (os.path.abspath(path), None if columns is None else tuple(columns))
+    mtime = _cache[key][0]
+
+    with _lock:
+        cached = _derived.get(key + (name,))
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+
+    built = build(obj)
+    with _lock:
+        _derived[key + (name,)] = (mtime, built)
+    return built
+
+
+def _load_dataset(name, derived, build, combine, columns=None, path=None):
+    # ``build`` runs once per partition file (cached with _load_derived), ``combine``
+    # merges the per-partition results and is cached on the (path, mtime) of every
+    # partition. An explicit ``path`` loads just that file.
+    paths = [path] if path else dataset_paths(name)
+    signature = tuple((os.path.abspath(p), os.stat(p).st_mtime_ns) for p in paths)
+    key = (name if not path else os.path.abspath(path), None if columns is None else tuple(columns), derived)
+
+    with _lock:
+        cached = _combined.get(key)
+        if cached is not None and cached[0] == signature:
+            return cached[1]
+
+    parts = [_load_derived(p, derived, build, columns) for p in paths]
+    combined = combine(parts)
+    with _lock:
+        _combined[key] = (signature, combined)
+    return combined
+
+
+def _load_signed(key, paths, build):
+    # ``build()`` cached on the (path, mtime) of every file in ``paths``
+    signature = tuple((os.path.abspath(p), os.stat(p).st_mtime_ns) for p in paths)
+    with _lock:
+        cached = _combined.get(key)
+        if cached is not None and cached[0] == signature:
+            return cached[1]
+
+    built = build()
+    with _lock:
+        _combined[key] = (signature, built)
+    return built
+
+
+def _identity(obj):
+    return obj
+
+
+def _concat_frames(frames):
+    if len(frames) == 1:
+        return frames[0]
+    combined = pd.concat(frames, ignore_index=True)
+    # Partitions store codes as plain text; keep the snapshot's categorical dtypes
+    for col, dtype in frames[0].dtypes.items():
+        if isinstance(dtype, pd.CategoricalDtype) and combined[col].dtype != dtype:
+            combined[col] = combined[col].astype("category")
+    return combined
+
+
+def _view(obj):
+    # Shallow copy: shares the underlying arrays, copy-on-write protects them.
+    if isinstance(obj, pd.DataFrame):
+        return obj.copy(deep=False)
+    return obj
+
+
+def load_model(path=MODEL_PATH):
+    """The trained pipeline, checked before use (see model_registry.py).
+
+    Loads the exported artifact named in the model manifest when there is one,
+    else the pickle at ``path``. Raises model_registry.ModelNotFoundError or
+    ModelValidationError with an explanation instead of failing later on.
+    """
+    from model_registry import ModelValidationError, check_artifact, resolve_model, validate_model
+
+    artifact, manifest = resolve_model(path)
+    check_artifact(artifact, manifest)
+    try:
+        return _load_derived(artifact, "validated", lambda model: validate_model(model, manifest))
+    except (pickle.UnpicklingError, EOFError, AttributeError, ImportError) as e:
+        raise ModelValidationError(f"{os.path.basename(artifact)} could not be loaded "
+                                   f"({type(e).__name__}: {e}); it may be corrupt or need other library versions.")
+
+
+def load_compiled_model(path=MODEL_PATH):
+    """The pipeline flattened to NumPy (see compiled_model.py), for high-volume callers.
+
+    Checked against the pipeline on the emissions data before it is returned;
+    raises compiled_model.CompileError if the pipeline cannot be flattened.
+    """
+    from compiled_model import compile_pipeline, verification_frame, verify_equivalence
+    from model_registry import resolve_model
+
+    pipeline = load_model(path)
+
+    def build(_):
+        compiled = compile_pipeline(pipeline)
+        verify_equivalence(compiled, pipeline, verification_frame(load_emissions()))
+        return compiled
+
+    return _load_derived(resolve_model(path)[0], "compiled", build)
+
+
+def load_intervals(path=MODEL_PATH):
+    """Conformal prediction intervals for the model at ``path``, see prediction_intervals.py.
+
+    Uses the saved calibration (model_pickle/intervals_co2.json for the live
+    model, see ``model_side_path``) when it was calibrated for this model
+    artifact, else calibrates once on the emissions data (in-sample, ``held_out``
+    False).
+    """
+    from model_registry import model_hash as get_model_hash, resolve_model
+    from prediction_intervals import CALIBRATION_FILE, IN_SAMPLE_SOURCE, ConformalIntervals, calibrate
+
+    model_hash = get_model_hash(path)
+    calibration_path = model_side_path(path, CALIBRATION_FILE)
+    if os.path.exists(calibration_path):
+        saved = ConformalIntervals.from_dict(_load(calibration_path))
+        if saved.model_hash == model_hash:
+            return saved
+
+    model = load_model(path)
+    return _load_derived(resolve_model(path)[0], "intervals", lambda _: calibrate(
+        model, load_emissions(), model_hash=model_hash, source=IN_SAMPLE_SOURCE, held_out=False))
+
+
+def load_reference_profile(path=None, model_path=MODEL_PATH):
+    """Input profile of the training data for drift monitoring, see drift_monitor.py.
+
+    Uses the saved profile (model_pickle/reference_profile.json for the live
+    model, written by train_model.py or ``python drift_monitor.py profile``) when
+    it was built for the model at ``model_path``, else profiles the emissions
+    data once per model.
+    """
+    from drift_monitor import REFERENCE_FILE, Profile, build_reference
+    from model_inputs import FEATURE_COLUMNS
+    from model_registry import model_hash as get_model_hash
+
+    model_hash = get_model_hash(model_path)
+    path = path or model_side_path(model_path, REFERENCE_FILE)
+    if os.path.exists(path):
+        saved = _load_derived(path, "profile", Profile.from_dict)
+        if saved.meta.get("model_hash") == model_hash:
+            return saved
+
+    model = load_model(model_path)
+
+    def profile_emissions(emissions):
+        frame = emissions[FEATURE_COLUMNS]
+        return build_reference(frame, model.predict(frame), source="shipped emissions data", model_hash=model_hash)
+
+    return _load_derived(data_path(EMISSIONS), f"reference_profile:{model_hash}", profile_emissions)
+
+
+def load_emissions(columns=None, path=None):
+    return _view(_load_dataset(EMISSIONS, "frame", _identity, _concat_frames, columns, path))
+
+
+def load_emissions_index(path=None):
+    """Sorted "Tons of CO2 Emissions" index of the emissions data, see emissions_index.py."""
+    from emissions_index import EMISSIONS_COLUMN, EmissionsIndex
+
+    return _load_dataset(EMISSIONS, "emissions_index", EmissionsIndex.from_frame, EmissionsIndex.merge,
+                         columns=[EMISSIONS_COLUMN], path=path)
+
+
+def load_emissions_lookup(path=None):
+    """Emissions rows grouped by Plant Code, see plant_lookup.py."""
+    from plant_lookup import PlantLookup
+
+    return _load_dataset(EMISSIONS, "plant_lookup", PlantLookup, PlantLookup.merge, path=path)
+
+
+def load_plant_neighbors(use_codes=False, path=None):
+    """KD-tree over the emissions data for k-nearest-plant queries, see plant_neighbors.py.
+
+    The normalization depends on the whole dataset, so the tree is rebuilt over
+    all partitions whenever one of them changes.
+    """
+    from plant_neighbors import PlantNeighbors
+
+    return _load_dataset(EMISSIONS, f"neighbors:{use_codes}", _identity,
+                         lambda frames: PlantNeighbors(_concat_frames(frames), use_codes=use_codes), path=path)
+
+
+def load_strategy(columns=None, path=None):
+    return _view(_load_dataset(STRATEGY, "frame", _identity, _concat_frames, columns, path))
+
+
+def load_strategy_lookup(path=None):
+    """Emissions-strategy rows grouped by Plant Code, see plant_lookup.py."""
+    from plant_lookup import PlantLookup
+
+    return _load_dataset(STRATEGY, "plant_lookup", PlantLookup, PlantLookup.merge, path=path)
+
+
+def load_decoded_strategy_lookup(path=None):
+    """Human-readable emissions-strategy data (every code decoded), grouped by Plant Code.
+
+    Decoded once per loaded partition with strategy_codes.decode_frame.
+    """
+    from plant_lookup import PlantLookup
+    from strategy_codes import decode_frame
+
+    return _load_dataset(STRATEGY, "decoded_lookup", lambda df: PlantLookup(decode_frame(df)), PlantLookup.merge,
+                         path=path)
+
+
+def load_plant_gen(columns=None, path=None):
+    return _view(_load_dataset(PLANT_GEN, "frame", _identity, _concat_frames, columns, path))
+
+
+def load_fleet_rankings():
+    """Per-plant emissions intensity and its fleet / fuel / prime mover percentiles, see fleet_rankings.py.
+
+    Reads the tables precomputed by ``python fleet_rankings.py``. Without them,
+    or when an emissions or PlantGen file (the snapshot or a partition) changed
+    after they were written, the tables are built from the emissions data and
+    PlantGen, once per change of any of their files.
+    """
+    from fleet_rankings import BREAKPOINTS_FILE, SUMMARY_FILE, FleetRankings, build_breakpoints, build_summary
+
+    precomputed = [os.path.join(MODEL_DIR, SUMMARY_FILE), os.path.join(MODEL_DIR, BREAKPOINTS_FILE)]
+    if all(os.path.exists(p) for p in precomputed):
+        written = min(os.stat(p).st_mtime_ns for p in precomputed)
+        sources = dataset_paths(EMISSIONS) + dataset_paths(PLANT_GEN)
+        if all(os.stat(p).st_mtime_ns <= written for p in sources):
+            return _load_signed(("fleet_rankings", None, "precomputed"), precomputed + sources,
+                                lambda: FleetRankings(_load(precomputed[0]), _load(precomputed[1])))
+
+    def build():
+        summary = build_summary(load_emissions(), load_plant_gen())
+        return FleetRankings(summary, build_breakpoints(summary))
+
+    return _load_signed(("fleet_rankings", None, "built"), dataset_paths(EMISSIONS) + dataset_paths(PLANT_GEN),
+                        build)
+
+
+def get_load_stats():
+    """Return {file name: {"seconds", "bytes", "mtime_ns"}} for everything loaded so far.
+
+    Column projections of a dataset are listed separately, as "name [n columns]".
+    """
+    with _lock:
+        stats = {}
+        for (path, columns), entry in _load_stats.items():
+            name = os.path.basename(path)
+            if columns is not None:
+                name = f"{name} [{len(columns)} columns]"
+            stats[name] = dict(entry)
+        return stats
+
+
+def clear_cache():
+    with _lock:
+        _cache.clear()
+        _derived.clear()
+        _combined.clear()
+        _load_stats.clear()
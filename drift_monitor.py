@@ -0,0 +1,435 @@
+"""Streaming input and prediction drift monitoring.
+
+Every ``predict`` call of the app (prediction page), batch scoring and the
+prediction service passes its input frame and predictions to ``observe``. Only
+constant-size summaries are kept, never the requests themselves:
+
+- ``QuantileSketch``: log-spaced bucket counts (relative accuracy 2%) for each
+  numeric feature and the prediction; a fixed array per feature, whatever the
+  number or range of the values;
+- ``CodeCounter``: counts per Fuel Code / Prime Mover, at most MAX_CODES
+  distinct codes (the rest is counted as "(other)").
+
+A ``Profile`` bundles them. Each process keeps one profile per source for the
+current day and writes it every FLUSH_SECONDS (and at exit) to
+model_pickle/monitoring/<day>/<source>-<process>.json; days older than
+RETENTION_DAYS are deleted. The reference profile is built from the training
+rows (train_model.py writes model_pickle/reference_profile.json, or run
+``python drift_monitor.py profile`` for the shipped data).
+
+``drift_report`` compares a window of days with the reference: population
+stability index (PSI) over the reference deciles and the Kolmogorov-Smirnov
+distance for numeric features, PSI over the codes plus the share of codes
+absent from the reference for categorical ones. The monitoring page
+(pages/Input_Drift_Monitoring.py) shows it;
+
+    python drift_monitor.py report --days 7
+
+prints it. Set CO2_MONITORING=0 to switch the hooks off.
+"""
+
+import argparse
+import atexit
+import datetime
+import json
+import math
+import os
+import shutil
+import threading
+import time
+import uuid
+
+import numpy as np
+
+from model_inputs import CATEGORICAL_FEATURES, NUMERIC_FEATURES
+
+PREDICTION_FEATURE = "Prediction"
+REFERENCE_FILE = "reference_profile.json"
+MONITOR_DIR_NAME = "monitoring"
+
+ENABLED = os.environ.get("CO2_MONITORING", "1") != "0"
+FLUSH_SECONDS = float(os.environ.get("CO2_MONITORING_FLUSH_SECONDS", 30))
+RETENTION_DAYS = 30
+
+RELATIVE_ACCURACY = 0.02
+MIN_MAGNITUDE = 1e-2     # |x| below this counts as zero
+MAX_MAGNITUDE = 1e13     # above this, the last bucket
+MAX_CODES = 64
+OTHER_CODE = "(other)"
+
+# PSI thresholds commonly used for "some" and "significant" shift
+PSI_WATCH = 0.1
+PSI_DRIFT = 0.25
+MIN_ROWS = 100           # fewer observed rows are reported but not judged
+
+_GAMMA = (1 + RELATIVE_ACCURACY) / (1 - RELATIVE_ACCURACY)
+_LOG_GAMMA = math.log(_GAMMA)
+_K_MIN = math.ceil(math.log(MIN_MAGNITUDE) / _LOG_GAMMA)
+_K_MAX = math.ceil(math.log(MAX_MAGNITUDE) / _LOG_GAMMA)
+_BUCKETS = _K_MAX - _K_MIN + 1
+
+
+class QuantileSketch:
+    """Fixed-size log-bucket histogram of non-negative and negative values (DDSketch-like)."""
+
+    def __init__(self):
+        self.positive = np.zeros(_BUCKETS, dtype=np.int64)
+        self.negative = np.zeros(_BUCKETS, dtype=np.int64)
+        self.zero = 0
+
+    @staticmethod
+    def _buckets(magnitudes):
+        k = np.ceil(np.log(np.maximum(magnitudes, MIN_MAGNITUDE)) / _LOG_GAMMA).astype(np.int64)
+        return np.clip(k, _K_MIN, _K_MAX) - _K_MIN
+
+    def update(self, values):
+        values = np.asarray(values, dtype=float)
+        values = values[np.isfinite(values)]
+        small = np.abs(values) < MIN_MAGNITUDE
+        self.zero += int(small.sum())
+        for sign, counts in ((values > 0) & ~small, self.positive), ((values < 0) & ~small, self.negative):
+            if sign.any():
+                counts += np.bincount(self._buckets(np.abs(values[sign])), minlength=_BUCKETS)
+
+    @property
+    def count(self):
+        return int(self.positive.sum() + self.negative.sum() + self.zero)
+
+    def merge(self, other):
+        self.positive += other.positive
+        self.negative += other.negative
+        self.zero += other.zero
+        return self
+
+    def histogram(self):
+        """Counts over the ordered bucket grid: negatives (most negative first), zero, positives."""
+        return np.concatenate([self.negative[::-1], [self.zero], self.positive])
+
+    def grid(self):
+        """Representative value of each bucket of ``histogram``."""
+        magnitudes = 2 * _GAMMA ** np.arange(_K_MIN, _K_MAX + 1) / (_GAMMA + 1)
+        return np.concatenate([-magnitudes[::-1], [0.0], magnitudes])
+
+    def quantiles(self, qs):
+        """Values at the quantiles ``qs`` (within RELATIVE_ACCURACY), NaN when empty."""
+        counts = np.cumsum(self.histogram())
+        if counts[-1] == 0:
+            return np.full(len(qs), np.nan)
+        ranks = np.asarray(qs, dtype=float) * (counts[-1] - 1)
+        return self.grid()[np.searchsorted(counts, ranks, side="right")]
+
+    def to_dict(self):
+        def sparse(counts):
+            (index,) = np.nonzero(counts)
+            return {str(i): int(counts[i]) for i in index}
+        return {"positive": sparse(self.positive), "negative": sparse(self.negative), "zero": self.zero}
+
+    @classmethod
+    def from_dict(cls, data):
+        sketch = cls()
+        for name in ("positive", "negative"):
+            counts = getattr(sketch, name)
+            for i, n in data[name].items():
+                counts[int(i)] = n
+        sketch.zero = data["zero"]
+        return sketch
+
+
+class CodeCounter:
+    """Counts of categorical codes, bounded to MAX_CODES distinct codes."""
+
+    def __init__(self, counts=None):
+        self.counts = dict(counts or {})
+
+    def _add(self, code, n):
+        code = code[:32]
+        if code not in self.counts and len(self.counts) >= MAX_CODES:
+            code = OTHER_CODE
+        self.counts[code] = self.counts.get(code, 0) + int(n)
+
+    def update(self, codes):
+        values, counts = np.unique(np.asarray(codes, dtype=str), return_counts=True)
+        for code, n in zip(values, counts):
+            self._add(str(code), n)
+
+    @property
+    def count(self):
+        return sum(self.counts.values())
+
+    def merge(self, other):
+        for code, n in other.counts.items():
+            self._add(code, n)
+        return self
+
+    def to_dict(self):
+        return dict(self.counts)
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data)
+
+
+class Profile:
+    """Sketches of the numeric features and the prediction, counters of the codes."""
+
+    def __init__(self, numeric=None, codes=None, meta=None):
+        self.numeric = numeric or {f: QuantileSketch() for f in NUMERIC_FEATURES + [PREDICTION_FEATURE]}
+        self.codes = codes or {f: CodeCounter() for f in CATEGORICAL_FEATURES}
+        self.meta = dict(meta or {})
+
+    def update(self, frame, predictions=None):
+        for feature in NUMERIC_FEATURES:
+            self.numeric[feature].update(frame[feature].to_numpy(dtype=float, na_value=np.nan))
+        for feature in CATEGORICAL_FEATURES:
+            self.codes[feature].update(frame[feature].astype(str).to_numpy())
+        if predictions is not None:
+            self.numeric[PREDICTION_FEATURE].update(predictions)
+
+    @property
+    def rows(self):
+        # Every row has a code (missing ones count as "nan"), not every row a finite number
+        return self.codes[CATEGORICAL_FEATURES[0]].count
+
+    def merge(self, other):
+        for feature, sketch in other.numeric.items():
+            self.numeric[feature].merge(sketch)
+        for feature, counter in other.codes.items():
+            self.codes[feature].merge(counter)
+        return self
+
+    def to_dict(self):
+        return {"meta": self.meta, "numeric": {f: s.to_dict() for f, s in self.numeric.items()},
+                "codes": {f: c.to_dict() for f, c in self.codes.items()}}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls({f: QuantileSketch.from_dict(s) for f, s in data["numeric"].items()},
+                   {f: CodeCounter.from_dict(c) for f, c in data["codes"].items()}, data.get("meta"))
+
+
+def build_reference(frame, predictions=None, **meta):
+    """Reference profile of training rows (features, optionally the model's predictions)."""
+    profile = Profile(meta={"created": time.strftime("%Y-%m-%dT%H:%M:%S"), **meta})
+    profile.update(frame, predictions)
+    profile.meta["rows"] = profile.rows
+    return profile
+
+
+def write_profile(profile, path):
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(profile.to_dict(), f)
+    os.replace(tmp, path)
+
+
+def read_profile(path):
+    with open(path) as f:
+        return Profile.from_dict(json.load(f))
+
+
+def _psi(reference, current, eps=1e-4):
+    reference = np.maximum(reference / max(reference.sum(), 1), eps)
+    current = np.maximum(current / max(current.sum(), 1), eps)
+    return float(np.sum((current - reference) * np.log(current / reference)))
+
+
+def numeric_drift(reference, current):
+    """{"psi", "ks", "median", "reference_median"} of two sketches."""
+    ref, cur = reference.histogram(), current.histogram()
+    ref_cdf = np.cumsum(ref) / max(ref.sum(), 1)
+    cur_cdf = np.cumsum(cur) / max(cur.sum(), 1)
+    # Bins: the buckets between the reference deciles
+    edges = np.unique(np.searchsorted(ref_cdf, np.linspace(0.1, 0.9, 9), side="left"))
+    groups = np.split(np.arange(len(ref)), edges + 1)
+    return {
+        "psi": _psi(np.array([ref[g].sum() for g in groups]), np.array([cur[g].sum() for g in groups])),
+        "ks": float(np.max(np.abs(ref_cdf - cur_cdf))),
+        "median": float(current.quantiles([0.5])[0]),
+        "reference_median": float(reference.quantiles([0.5])[0]),
+    }
+
+
+def code_drift(reference, current):
+    """{"psi", "unseen_share", "unseen"} of two code counters."""
+    codes = sorted(set(reference.counts) | set(current.counts))
+    unseen = {c: n for c, n in current.counts.items() if c not in reference.counts}
+    return {
+        "psi": _psi(np.array([reference.counts.get(c, 0) for c in codes], dtype=float),
+                    np.array([current.counts.get(c, 0) for c in codes], dtype=float)),
+        "unseen_share": sum(unseen.values()) / max(current.count, 1),
+        "unseen": sorted(unseen, key=unseen.get, reverse=True),
+    }
+
+
+def _status(psi, rows):
+    if rows < MIN_ROWS:
+        return "too few rows"
+    return "drift" if psi >= PSI_DRIFT else "watch" if psi >= PSI_WATCH else "ok"
+
+
+def drift_report(reference, current):
+    """One row per feature (and the prediction): kind, rows, scores and status."""
+    rows = []
+    for feature, sketch in current.numeric.items():
+        if not sketch.count or feature not in reference.numeric or not reference.numeric[feature].count:
+            continue
+        scores = numeric_drift(reference.numeric[feature], sketch)
+        rows.append({"feature": feature, "kind": "numeric", "rows": sketch.count, **scores,
+                     "status": _status(scores["psi"], sketch.count)})
+    for feature, counter in current.codes.items():
+        if not counter.count or feature not in reference.codes:
+            continue
+        scores = code_drift(reference.codes[feature], counter)
+        rows.append({"feature": feature, "kind": "categorical", "rows": counter.count, **scores,
+                     "status": _status(scores["psi"], counter.count)})
+    return rows
+
+
+class Monitor:
+    """Per-process profiles of the current day, one per source, flushed to ``directory``."""
+
+    def __init__(self, directory, flush_seconds=FLUSH_SECONDS):
+        self.directory = directory
+        self.flush_seconds = flush_seconds
+        self.process = uuid.uuid4().hex[:12]
+        self._lock = threading.Lock()
+        self._day = None
+        self._profiles = {}
+        self._dirty = False
+        self._last_flush = time.monotonic()
+
+    def observe(self, frame, predictions=None, source="app"):
+        day = datetime.date.today().isoformat()
+        with self._lock:
+            if day != self._day:
+                self._flush_locked()
+                self._day, self._profiles = day, {}
+            self._profiles.setdefault(source, Profile()).update(frame, predictions)
+            self._dirty = True
+            due = time.monotonic() - self._last_flush >= self.flush_seconds
+        if due:
+            self.flush()
+
+    def flush(self):
+        with self._lock:
+            self._flush_locked()
+
+    def _flush_locked(self):
+        self._last_flush = time.monotonic()
+        if not self._dirty or self._day is None:
+            return
+        day_dir = os.path.join(self.directory, self._day)
+        os.makedirs(day_dir, exist_ok=True)
+        for source, profile in self._profiles.items():
+            # The file holds this process' whole day, so rewriting it is idempotent
+            write_profile(profile, os.path.join(day_dir, f"{source}-{self.process}.json"))
+        self._dirty = False
+        _prune(self.directory)
+
+
+def _prune(directory, keep_days=RETENTION_DAYS):
+    oldest = (datetime.date.today() - datetime.timedelta(days=keep_days)).isoformat()
+    for day in os.listdir(directory):
+        if day < oldest and os.path.isdir(os.path.join(directory, day)):
+            shutil.rmtree(os.path.join(directory, day), ignore_errors=True)
+
+
+def monitor_dir():
+    from data_loader import MODEL_DIR
+
+    return os.path.join(MODEL_DIR, MONITOR_DIR_NAME)
+
+
+_monitor = None
+_monitor_lock = threading.Lock()
+
+
+def get_monitor():
+    """The process-wide Monitor (flushed at exit)."""
+    global _monitor
+    with _monitor_lock:
+        if _monitor is None:
+            _monitor = Monitor(monitor_dir())
+            atexit.register(_monitor.flush)
+        return _monitor
+
+
+def observe(frame, predictions=None, source="app"):
+    """Record the inputs (and predictions) of one ``predict`` call; never raises."""
+    if not ENABLED or frame is None or not len(frame):
+        return
+    try:
+        get_monitor().observe(frame, predictions, source)
+    except Exception:
+        # Monitoring must never break a prediction
+        import logging
+
+        logging.getLogger("co2.monitoring").exception("Could not record the prediction inputs")
+
+
+def load_window(days=7, sources=None, directory=None):
+    """Merged Profile of the last ``days`` days and the sources found.
+
+    ``sources`` limits it to some sources (None: all of them; an empty list: none).
+    """
+    directory = directory or monitor_dir()
+    if _monitor is not None and _monitor.directory == directory:
+        _monitor.flush()
+    first = (datetime.date.today() - datetime.timedelta(days=days - 1)).isoformat()
+    window, found = Profile(), {}
+    if not os.path.isdir(directory):
+        return window, found
+    for day in sorted(os.listdir(directory)):
+        day_dir = os.path.join(directory, day)
+        if day < first or not os.path.isdir(day_dir):
+            continue
+        for name in os.listdir(day_dir):
+            source = name.rsplit("-", 1)[0]
+            if not name.endswith(".json") or sources is not None and source not in sources:
+                continue
+            try:
+                profile = read_profile(os.path.join(day_dir, name))
+            except (OSError, ValueError, KeyError):
+                continue   # being replaced, or from another version
+            window.merge(profile)
+            found[source] = found.get(source, 0) + profile.rows
+    return window, found
+
+
+def main(argv=None):
+    import data_loader
+
+    parser = argparse.ArgumentParser(description="Reference profile and drift report of the model inputs.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("profile", help=f"Write model_pickle/{REFERENCE_FILE} from the shipped emissions data")
+    report = sub.add_parser("report", help="Compare the recorded inputs with the reference profile")
+    report.add_argument("--days", type=int, default=7)
+    report.add_argument("--source", action="append", default=None, help="Only these sources (app, batch, service)")
+    args = parser.parse_args(argv)
+
+    if args.command == "profile":
+        from model_inputs import FEATURE_COLUMNS
+        from model_registry import model_hash
+
+        emissions = data_loader.load_emissions(FEATURE_COLUMNS)
+        profile = build_reference(emissions, data_loader.load_model().predict(emissions),
+                                  source="shipped emissions data", model_hash=model_hash(data_loader.MODEL_PATH))
+        write_profile(profile, os.path.join(data_loader.MODEL_DIR, REFERENCE_FILE))
+        print(f"Wrote {REFERENCE_FILE} ({profile.rows:,} rows)")
+        return
+
+    window, found = load_window(args.days, args.source)
+    if not window.rows:
+        print(f"No predictions recorded in the last {args.days} day(s).")
+        return
+    print(f"{window.rows:,} rows in the last {args.days} day(s): "
+          + ", ".join(f"{source} {rows:,}" for source, rows in sorted(found.items())))
+    for row in drift_report(data_loader.load_reference_profile(), window):
+        extra = (f"KS {row['ks']:.3f}, median {row['median']:,.0f} (reference {row['reference_median']:,.0f})"
+                 if row["kind"] == "numeric" else
+                 f"unseen {row['unseen_share']:.1%}" + (f" ({', '.join(row['unseen'][:5])})" if row["unseen"] else ""))
+        print(f"{row['status']:>12}  {row['feature']}: PSI {row['psi']:.3f}, {extra}")
+
+
+if __name__ == "__main__":
+    main()
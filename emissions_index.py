@@ -0,0 +1,54 @@
+"""Sorted index over "Tons of CO2 Emissions" for the ±range benchmarking filter."""
+
+import numpy as np
+
+EMISSIONS_COLUMN = "Tons of CO2 Emissions"
+
+
+class EmissionsIndex:
+    """Emissions values sorted once, with the row position each value came from.
+
+    ``window(lower, upper)`` answers the benchmarking filter with two
+    ``searchsorted`` calls instead of two boolean masks over the whole frame.
+    """
+
+    def __init__(self, emissions):
+        values = np.asarray(emissions, dtype=np.float64)
+        positions = np.argsort(values, kind="stable")
+        self._set(values[positions], positions)
+
+    def _set(self, values, positions):
+        self.values = values
+        self.positions = positions
+        self.positions.setflags(write=False)
+        self.values.setflags(write=False)
+
+    @classmethod
+    def from_frame(cls, df, column=EMISSIONS_COLUMN):
+        return cls(df[column].to_numpy())
+
+    @classmethod
+    def merge(cls, parts):
+        """Index over the concatenation of the frames indexed by ``parts`` (in that order).
+
+        Each part is already sorted, so the stable sort below only merges runs.
+        """
+        if len(parts) == 1:
+            return parts[0]
+        offsets = np.cumsum([0] + [len(part) for part in parts[:-1]])
+        values = np.concatenate([part.values for part in parts])
+        positions = np.concatenate([part.positions + offset for part, offset in zip(parts, offsets)])
+        order = np.argsort(values, kind="stable")
+
+        merged = cls.__new__(cls)
+        merged._set(values[order], positions[order])
+        return merged
+
+    def __len__(self):
+        return len(self.values)
+
+    def window(self, lower, upper):
+        """Row positions (sorted by emissions) with ``lower <= emissions <= upper``."""
+        start = np.searchsorted(self.values, lower, side="left")
+        stop = np.searchsorted(self.values, upper, side="right")
+        return self.positions[start:stop]
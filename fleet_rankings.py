@@ -0,0 +1,142 @@
+"""Per-plant emissions-intensity summary and fleet rankings.
+
+Joins PlantGen (generation per plant) with the emissions data into one row per
+plant: generation, CO₂ emissions, intensity (tons CO₂ per kWh), the fuel code
+and prime mover producing most of its generation, and its percentile in the
+fleet. Alongside it, quantile breakpoints (0th to 100th percentile) of the
+intensity per fuel code and per prime mover.
+
+Precompute both tables once (writes model_pickle/fleet_summary.feather and
+fleet_breakpoints.feather; rerun after ingest.py adds data):
+
+    python fleet_rankings.py
+
+``FleetRankings.place`` then puts any intensity on those distributions with
+binary searches, without touching the raw rows.
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+
+from emissions_index import EMISSIONS_COLUMN
+
+SUMMARY_FILE = "fleet_summary.feather"
+BREAKPOINTS_FILE = "fleet_breakpoints.feather"
+
+GENERATION_COLUMN = "Generation (kWh)"
+INTENSITY_COLUMN = "Intensity (Tons CO2/kWh)"
+PERCENTILE_COLUMN = "Fleet Percentile"
+GROUP_COLUMNS = ["Fuel Code", "Prime Mover"]
+PERCENTILES = np.arange(101)
+
+
+def _primary(emissions, column):
+    # Code of the row with the largest generation of each plant
+    rows = emissions.sort_values(GENERATION_COLUMN, ascending=False, kind="stable")
+    return rows.drop_duplicates("Plant Code").set_index("Plant Code")[column].astype(str)
+
+
+def build_summary(emissions, plant_gen):
+    """One row per plant with a positive generation, sorted by intensity."""
+    emissions = emissions.assign(**{"Plant Code": emissions["Plant Code"].astype("int64")})
+    plant_gen = plant_gen.assign(**{"Plant Code": plant_gen["Plant Code"].astype("int64")})
+
+    per_plant = emissions.groupby("Plant Code").agg(
+        **{EMISSIONS_COLUMN: (EMISSIONS_COLUMN, "sum"), "_generation": (GENERATION_COLUMN, "sum")})
+    generation = plant_gen.groupby("Plant Code")[GENERATION_COLUMN].sum()
+    # PlantGen is the reference for generation; plants it does not cover (newer partitions) use the emissions rows
+    per_plant[GENERATION_COLUMN] = generation.reindex(per_plant.index).fillna(per_plant["_generation"])
+    for column in GROUP_COLUMNS:
+        per_plant[column] = _primary(emissions, column)
+
+    summary = per_plant[per_plant[GENERATION_COLUMN] > 0].drop(columns="_generation")
+    summary[INTENSITY_COLUMN] = summary[EMISSIONS_COLUMN] / summary[GENERATION_COLUMN]
+    summary = summary.sort_values(INTENSITY_COLUMN, kind="stable").reset_index()
+    # Share of plants with an intensity at or below this plant's
+    intensities = summary[INTENSITY_COLUMN].to_numpy()
+    summary[PERCENTILE_COLUMN] = np.searchsorted(intensities, intensities, side="right") / len(summary) * 100
+    return summary[["Plant Code", GENERATION_COLUMN, EMISSIONS_COLUMN, INTENSITY_COLUMN, PERCENTILE_COLUMN]
+                   + GROUP_COLUMNS]
+
+
+def build_breakpoints(summary):
+    """Intensity percentiles 0..100 of the plants grouped by primary fuel code and by prime mover."""
+    rows = []
+    for column in GROUP_COLUMNS:
+        for value, group in summary.groupby(column, observed=True):
+            quantiles = np.percentile(group[INTENSITY_COLUMN].to_numpy(), PERCENTILES)
+            rows.append({"Group": column, "Value": str(value), "Plants": len(group),
+                         **{f"p{p}": q for p, q in zip(PERCENTILES, quantiles)}})
+    return pd.DataFrame(rows)
+
+
+class FleetRankings:
+    """Summary + breakpoint tables with O(log n) placement of an intensity."""
+
+    def __init__(self, summary, breakpoints):
+        self.summary = summary
+        self.intensities = summary[INTENSITY_COLUMN].to_numpy()
+        quantile_columns = [f"p{p}" for p in PERCENTILES]
+        self._breakpoints = {
+            (row["Group"], row["Value"]): (np.asarray([row[c] for c in quantile_columns], dtype=float),
+                                           int(row["Plants"]))
+            for row in breakpoints.to_dict("records")
+        }
+        self._plant_rows = pd.Series(np.arange(len(summary)), index=summary["Plant Code"].to_numpy())
+
+    def fleet_percentile(self, intensity):
+        """Share of plants (in %) with an intensity at or below ``intensity``."""
+        return np.searchsorted(self.intensities, intensity, side="right") / len(self.intensities) * 100
+
+    def group_percentile(self, group, value, intensity):
+        """Percentile of ``intensity`` among plants whose primary ``group`` is ``value``, or None."""
+        entry = self._breakpoints.get((group, str(value)))
+        if entry is None:
+            return None
+        breakpoints, _ = entry
+        # Interpolate between the two breakpoints around the intensity
+        return float(np.interp(intensity, breakpoints, PERCENTILES, left=0.0, right=100.0))
+
+    def group_size(self, group, value):
+        entry = self._breakpoints.get((group, str(value)))
+        return 0 if entry is None else entry[1]
+
+    def place(self, intensity, fuel_code=None, prime_mover=None):
+        """{"fleet": %, "Fuel Code": % or None, "Prime Mover": % or None} for one intensity."""
+        return {
+            "fleet": float(self.fleet_percentile(intensity)),
+            "Fuel Code": None if fuel_code is None else self.group_percentile("Fuel Code", fuel_code, intensity),
+            "Prime Mover": None if prime_mover is None else self.group_percentile("Prime Mover", prime_mover,
+                                                                                   intensity),
+        }
+
+    def plant(self, plant_code):
+        """Summary row of a plant, or None."""
+        position = self._plant_rows.get(int(plant_code))
+        return None if position is None else self.summary.iloc[position]
+
+
+def precompute(model_dir=None):
+    """Build the summary and breakpoint tables from the loaded datasets and write them as Feather."""
+    import data_loader
+    from columnar_store import write_feather
+
+    model_dir = model_dir or data_loader.MODEL_DIR
+    summary = build_summary(data_loader.load_emissions(["Plant Code", EMISSIONS_COLUMN, GENERATION_COLUMN]
+                                                       + GROUP_COLUMNS),
+                            data_loader.load_plant_gen())
+    breakpoints = build_breakpoints(summary)
+    write_feather(summary, os.path.join(model_dir, SUMMARY_FILE))
+    write_feather(breakpoints, os.path.join(model_dir, BREAKPOINTS_FILE))
+    return summary, breakpoints
+
+
+def main():
+    summary, breakpoints = precompute()
+    print(f"Wrote {SUMMARY_FILE} ({len(summary):,} plants) and {BREAKPOINTS_FILE} ({len(breakpoints)} groups)")
+
+
+if __name__ == "__main__":
+    main()
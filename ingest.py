@@ -0,0 +1,300 @@
+"""Incremental ingestion of new EIA data releases.
+
+Drop EIA-923 emissions extracts and/or EIA-860 boiler extracts (CSV or XLSX)
+into a directory and run:
+
+    python ingest.py path/to/new_release/ --year 2024
+
+Each file is streamed in chunks, its columns are mapped onto the schema of
+emissions.pkl or emiss_strategy_plant.pkl, and the rows are written as a
+year partition under model_pickle/partitions/<dataset>/<year>.feather. Only
+the partitions of the ingested years are (re)written; the shipped snapshot and
+other years are left untouched. The app picks the new partitions up on the next
+rerun and rebuilds indexes only for them (see data_loader._load_dataset).
+
+The year comes from a "Year"/"Report Year" column, else from --year, else from
+a 4-digit year in the file name. Reading XLSX needs openpyxl.
+"""
+
+import argparse
+import os
+import re
+import tempfile
+
+import pandas as pd
+import pyarrow as pa
+
+import data_loader
+
+DEFAULT_CHUNKSIZE = 100_000
+
+# Target schemas, in the column order of the shipped datasets
+EMISSIONS_SCHEMA = {
+    "Plant Code": pa.int64(),
+    "State": pa.string(),
+    "Sector Code": pa.int64(),
+    "Prime Mover": pa.string(),
+    "Fuel Code": pa.string(),
+    "Generation (kWh)": pa.float64(),
+    "Useful Thermal Output (MMBtu)": pa.float64(),
+    "Total Fuel Consumption (MMBtu)": pa.float64(),
+    "Fuel Consumption for Electric Generation (MMBtu)": pa.float64(),
+    "\n Fuel Consumption for Useful Thermal Output (MMBtu)": pa.float64(),
+    "Tons of CO2 Emissions": pa.float64(),
+}
+STRATEGY_SCHEMA = {
+    "Plant Code": pa.int64(),
+    "Plant Name": pa.string(),
+    "State": pa.string(),
+    "Boiler ID": pa.string(),
+    "Boiler Status": pa.string(),
+    "Type of Boiler": pa.string(),
+    "New Source Review": pa.string(),
+    "Regulation Sulfur": pa.string(),
+    "Standard Sulfur Rate": pa.string(),
+    "Standard Sulfur Percent Scrubbed": pa.string(),
+    "Sulfur Dioxide Control Existing Strategy 1": pa.string(),
+    "Sulfur Dioxide Control Proposed Strategy 1": pa.string(),
+    "Regulation Nitrogen": pa.string(),
+    "Standard Nitrogen Rate": pa.string(),
+    "Nitrogen Oxide Control Existing Strategy 1": pa.string(),
+    "Nitrogen Oxide Control Proposed Strategy 1": pa.string(),
+    "Regulation Particulate": pa.string(),
+    "Standard Particulate Rate": pa.string(),
+    "Regulation Mercury": pa.string(),
+    "Mercury Control Existing Strategy 1": pa.string(),
+    "Mercury Control Proposed Strategy 1": pa.string(),
+    "Steam Plant Type": pa.int64(),
+}
+SCHEMAS = {data_loader.EMISSIONS: EMISSIONS_SCHEMA, data_loader.STRATEGY: STRATEGY_SCHEMA}
+
+# Columns a file must provide to be accepted for a dataset; the rest are filled with nulls
+REQUIRED = {
+    data_loader.EMISSIONS: ["Plant Code", "Prime Mover", "Fuel Code", "Generation (kWh)",
+                            "Total Fuel Consumption (MMBtu)", "Fuel Consumption for Electric Generation (MMBtu)",
+                            "Tons of CO2 Emissions"],
+    data_loader.STRATEGY: ["Plant Code", "Boiler ID"],
+}
+
+# Header spellings used across EIA releases -> schema column
+ALIASES = {
+    "plant id": "Plant Code",
+    "plant state": "State",
+    "sector": "Sector Code",
+    "reported prime mover": "Prime Mover",
+    "reported fuel type code": "Fuel Code",
+    "net generation (kwh)": "Generation (kWh)",
+    "total fuel consumption mmbtu": "Total Fuel Consumption (MMBtu)",
+    "elec fuel consumption mmbtu": "Fuel Consumption for Electric Generation (MMBtu)",
+    "co2 emissions (tons)": "Tons of CO2 Emissions",
+    "boiler id": "Boiler ID",
+    "report year": "Year",
+    "year": "Year",
+}
+
+
+def _normalize_header(name):
+    return re.sub(r"\s+", " ", str(name)).strip().lower()
+
+
+_CANONICAL = {_normalize_header(col): col for schema in SCHEMAS.values() for col in schema}
+
+
+def map_columns(columns):
+    """{source column: schema column} for the columns that can be recognized."""
+    mapping = {}
+    for col in columns:
+        key = _normalize_header(col)
+        target = _CANONICAL.get(key) or ALIASES.get(key)
+        if target is not None and target not in mapping.values():
+            mapping[col] = target
+    return mapping
+
+
+def detect_dataset(mapped):
+    """Which dataset a file with the (mapped) columns belongs to, or None."""
+    for name in (data_loader.STRATEGY, data_loader.EMISSIONS):
+        if all(col in mapped for col in REQUIRED[name]):
+            return name
+    return None
+
+
+def _to_number(series):
+    # EIA spreadsheets use thousands separators and "." for missing values
+    if series.dtype == object:
+        series = series.astype(str).str.replace(",", "", regex=False).str.strip()
+    return pd.to_numeric(series, errors="coerce")
+
+
+def _to_code(series):
+    # Integer codes (Plant Code, Steam Plant Type, ...) as nullable Int64: with a
+    # missing value a plain int column would turn float and decode as "1.0 – ..."
+    number = _to_number(series)
+    return number.where(number == number.round()).astype("Int64")
+
+
+def _to_text(series):
+    text = series.astype("string").str.strip()
+    return text.mask(text == "").astype(object)
+
+
+def normalize_chunk(chunk, dataset, mapping):
+    """Rename, type and complete one chunk so it matches the dataset schema (plus "Year" if present)."""
+    chunk = chunk.rename(columns=mapping)
+    schema = SCHEMAS[dataset]
+    out = {}
+    for col, arrow_type in schema.items():
+        # Missing columns go through the same conversion, so they carry the schema's dtype
+        values = chunk[col] if col in chunk.columns else pd.Series(pd.NA, index=chunk.index, dtype=object)
+        if arrow_type == pa.string():
+            out[col] = _to_text(values)
+        elif arrow_type == pa.int64():
+            out[col] = _to_code(values)
+        else:
+            out[col] = _to_number(values)
+    normalized = pd.DataFrame(out, index=chunk.index)
+    if "Year" in chunk.columns:
+        normalized["Year"] = _to_number(chunk["Year"])
+    # Rows without a plant cannot be looked up or joined
+    return normalized[normalized["Plant Code"].notna()]
+
+
+def iter_file(path, chunksize=DEFAULT_CHUNKSIZE):
+    """Yield raw DataFrame chunks of a CSV or XLSX file."""
+    if path.lower().endswith((".xlsx", ".xlsm")):
+        from openpyxl import load_workbook
+
+        sheet = load_workbook(path, read_only=True, data_only=True).active
+        rows = sheet.iter_rows(values_only=True)
+        header = next(rows)
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) == chunksize:
+                yield pd.DataFrame(batch, columns=header)
+                batch = []
+        if batch:
+            yield pd.DataFrame(batch, columns=header)
+    else:
+        yield from pd.read_csv(path, chunksize=chunksize, dtype=str, thousands=",")
+
+
+def _year_from_name(path):
+    match = re.search(r"(19|20)\d{2}", os.path.basename(path))
+    return int(match.group(0)) if match else None
+
+
+class _PartitionWriter:
+    # Streams record batches of one (dataset, year) into a temporary Arrow file,
+    # swapped into place on commit so readers never see a half-written partition.
+    # The file keeps the pandas metadata of the first chunk, so Int64 code
+    # columns read back as Int64 rather than float.
+
+    def __init__(self, dataset, year):
+        self.dataset = dataset
+        self.year = year
+        self.schema = pa.schema(list(SCHEMAS[dataset].items()))
+        self.directory = os.path.join(data_loader.PARTITION_DIR, dataset)
+        os.makedirs(self.directory, exist_ok=True)
+        fd, self.tmp_path = tempfile.mkstemp(suffix=".feather.tmp", dir=self.directory)
+        os.close(fd)
+        self._sink = pa.OSFile(self.tmp_path, "wb")
+        self._writer = None
+        self.rows = 0
+
+    @property
+    def path(self):
+        return os.path.join(self.directory, f"{self.year}.feather")
+
+    def write(self, frame):
+        table = pa.Table.from_pandas(frame[list(self.schema.names)], schema=self.schema, preserve_index=False)
+        if self._writer is None:
+            self.schema = table.schema
+            self._writer = pa.ipc.new_file(self._sink, self.schema)
+        self._writer.write_table(table.replace_schema_metadata(self.schema.metadata))
+        self.rows += len(frame)
+
+    def _close(self):
+        if self._writer is None:
+            self._writer = pa.ipc.new_file(self._sink, self.schema)
+        self._writer.close()
+        self._sink.close()
+
+    def commit(self):
+        self._close()
+        os.replace(self.tmp_path, self.path)
+
+    def abort(self):
+        self._close()
+        os.remove(self.tmp_path)
+
+
+def _chain(first, rest):
+    yield first
+    yield from rest
+
+
+def ingest(paths, year=None, chunksize=DEFAULT_CHUNKSIZE, log=print):
+    """Ingest the given files; returns {(dataset, year): rows} for the partitions written."""
+    writers = {}
+    try:
+        for path in paths:
+            chunks = iter_file(path, chunksize)
+            first = next(chunks, None)
+            if first is None:
+                log(f"Skipping {path}: empty file")
+                continue
+            mapping = map_columns(first.columns)
+            dataset = detect_dataset(mapping.values())
+            if dataset is None:
+                log(f"Skipping {path}: columns do not match the emissions or strategy schema")
+                continue
+            file_year = year or _year_from_name(path)
+
+            rows = 0
+            for chunk in _chain(first, chunks):
+                chunk = normalize_chunk(chunk, dataset, mapping)
+                # Per row: the Year column where given, else the year of the file
+                years = chunk["Year"] if "Year" in chunk.columns else pd.Series(float("nan"), index=chunk.index)
+                if years.isna().any():
+                    if file_year is None:
+                        raise ValueError(f"No year for some rows of {path}: fill the Year column, pass --year "
+                                         "or put it in the name")
+                    years = years.fillna(file_year)
+                for chunk_year, part in chunk.groupby(years.astype(int)):
+                    key = (dataset, int(chunk_year))
+                    if key not in writers:
+                        writers[key] = _PartitionWriter(dataset, int(chunk_year))
+                    writers[key].write(part)
+                rows += len(chunk)
+            log(f"{path}: {rows:,} {dataset} rows")
+    except BaseException:
+        for writer in writers.values():
+            writer.abort()
+        raise
+
+    for writer in writers.values():
+        writer.commit()
+    return {key: writer.rows for key, writer in writers.items()}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Append new EIA releases as year partitions.")
+    parser.add_argument("source", help="Directory with CSV/XLSX extracts (or a single file)")
+    parser.add_argument("--year", type=int, default=None, help="Year of the release if not in the data")
+    parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE)
+    args = parser.parse_args(argv)
+
+    if os.path.isdir(args.source):
+        paths = sorted(os.path.join(args.source, f) for f in os.listdir(args.source)
+                       if f.lower().endswith((".csv", ".xlsx", ".xlsm")))
+    else:
+        paths = [args.source]
+
+    written = ingest(paths, year=args.year, chunksize=args.chunksize)
+    for (dataset, year), rows in sorted(written.items()):
+        print(f"Wrote partition {dataset}/{year}.feather ({rows:,} rows)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+"""Timing of the hot paths: model/data loads, predict, filtering, figure builds, decoding.
+
+Wrap a stage with ``timed`` (context manager or decorator):
+
+    with timed("predict"):
+        model.predict(frame)
+
+Every stage is written as one JSON line to the "co2.timing" logger (set
+CO2_TIMING_LOG to a file path, or "-" for stderr, to enable the handler) and
+collected for the current page rerun. With the developer panel enabled
+(``?dev=1`` in the URL or CO2_DEV_PANEL=1) the sidebar shows the wall time of
+each stage of the rerun, plus rolling p50/p95 over the session.
+
+Peak memory per stage (tracemalloc) slows down every allocation of the process,
+so it is only measured when the server runs with CO2_DEV_PANEL=1, and stops
+again once no developer panel has rendered for MEMORY_TRACKING_IDLE_SECONDS.
+The peaks are process-wide: concurrent sessions' allocations are included.
+"""
+
+import contextlib
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import tracemalloc
+
+import numpy as np
+
+logger = logging.getLogger("co2.timing")
+
+_local = threading.local()   # per script thread: page name and stages of the current rerun
+_memory_tracking = False
+_last_panel_render = 0.0
+_tracking_lock = threading.Lock()
+
+SESSION_HISTORY = 200   # rerun samples kept per stage for the rolling percentiles
+MEMORY_TRACKING_IDLE_SECONDS = float(os.environ.get("CO2_MEMORY_TRACKING_IDLE_SECONDS", 300))
+
+
+def configure_logging(destination=None):
+    """Send the JSON timing lines to ``destination`` (file path, or "-" for stderr)."""
+    destination = destination or os.environ.get("CO2_TIMING_LOG")
+    if not destination or logger.handlers:
+        return
+    handler = logging.StreamHandler(sys.stderr) if destination == "-" else logging.FileHandler(destination)
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+
+def memory_tracking_allowed():
+    # tracemalloc slows every allocation of the process, so only the operator can switch it on
+    return os.environ.get("CO2_DEV_PANEL") == "1"
+
+
+def enable_memory_tracking():
+    """Trace allocations until no developer panel has rendered for MEMORY_TRACKING_IDLE_SECONDS."""
+    global _memory_tracking, _last_panel_render
+    with _tracking_lock:
+        _last_panel_render = time.monotonic()
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+        _memory_tracking = True
+
+
+def _stop_idle_memory_tracking():
+    global _memory_tracking
+    with _tracking_lock:
+        if _memory_tracking and time.monotonic() - _last_panel_render > MEMORY_TRACKING_IDLE_SECONDS:
+            _memory_tracking = False
+            if tracemalloc.is_tracing():
+                tracemalloc.stop()
+
+
+def begin_rerun(page):
+    """Start collecting stages for a new run of ``page``."""
+    _stop_idle_memory_tracking()
+    _local.page = page
+    _local.stages = []
+
+
+def current_stages():
+    return list(getattr(_local, "stages", []))
+
+
+def _memory_stack():
+    if not hasattr(_local, "memory_stack"):
+        _local.memory_stack = []
+    return _local.memory_stack
+
+
+class timed(contextlib.ContextDecorator):
+    """Measure wall time (and peak memory, when tracking is on) of a stage."""
+
+    def __init__(self, stage, **fields):
+        self.stage = stage
+        self.fields = fields
+
+    def __enter__(self):
+        self._memory = _memory_tracking and tracemalloc.is_tracing()
+        if self._memory:
+            stack = _memory_stack()
+            # reset_peak() below would lose the enclosing stage's peak so far: hand it over first
+            if stack:
+                stack[-1]._max_bytes = max(stack[-1]._max_bytes, tracemalloc.get_traced_memory()[1])
+            tracemalloc.reset_peak()
+            self._start_bytes = self._max_bytes = tracemalloc.get_traced_memory()[0]
+            stack.append(self)
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        seconds = time.perf_counter() - self._start
+        record = {"stage": self.stage, "seconds": seconds}
+        if self._memory and not tracemalloc.is_tracing():
+            # Tracking was stopped while the stage ran: no meaningful peak
+            _memory_stack().remove(self)
+        elif self._memory:
+            peak = max(tracemalloc.get_traced_memory()[1], self._max_bytes)
+            record["peak_bytes"] = peak - self._start_bytes
+            stack = _memory_stack()
+            stack.pop()
+            if stack:
+                stack[-1]._max_bytes = max(stack[-1]._max_bytes, peak)
+        if exc_type is not None:
+            record["error"] = exc_type.__name__
+        record.update(self.fields)
+
+        page = getattr(_local, "page", None)
+        if page is not None:
+            record["page"] = page
+            _local.stages.append(record)
+        if logger.isEnabledFor(logging.INFO):
+            logger.info(json.dumps({"event": "timing", "time": time.time(), **record}))
+        return False
+
+
+def _dev_panel_enabled(st):
+    if os.environ.get("CO2_DEV_PANEL") == "1":
+        return True
+    try:
+        return st.query_params.get("dev") == "1"
+    except Exception:
+        return False
+
+
+def render_dev_panel():
+    """Sidebar panel with this rerun's stages and the session's rolling p50/p95 (developer mode only)."""
+    import streamlit as st
+
+    if not _dev_panel_enabled(st):
+        return
+    if memory_tracking_allowed():
+        enable_memory_tracking()
+
+    history = st.session_state.setdefault("_timing_history", {})
+    stages = current_stages()
+    for record in stages:
+        samples = history.setdefault(record["stage"], [])
+        samples.append(record["seconds"])
+        del samples[:-SESSION_HISTORY]
+
+    with st.sidebar.expander("⏱️ Developer: timings", expanded=True):
+        st.markdown("**This rerun**")
+        if not stages:
+            st.caption("No instrumented stages ran.")
+        for record in stages:
+            memory = f", peak {record['peak_bytes'] / 1e6:,.2f} MB" if "peak_bytes" in record else ""
+            st.markdown(f"- `{record['stage']}`: {record['seconds'] * 1000:,.2f} ms{memory}")
+        if any("peak_bytes" in record for record in stages):
+            st.caption("Memory peaks are process-wide: allocations of concurrent sessions are included.")
+        elif not memory_tracking_allowed():
+            st.caption("Start the server with CO2_DEV_PANEL=1 to measure memory peaks.")
+
+        st.markdown("**Session (p50 / p95)**")
+        for stage, samples in sorted(history.items()):
+            p50, p95 = np.percentile(samples, [50, 95])
+            st.markdown(f"- `{stage}`: {p50 * 1000:,.2f} / {p95 * 1000:,.2f} ms ({len(samples)} runs)")
+
+    from session_memory import render_session_report
+
+    render_session_report(st)
+
+
+configure_logging()
@@ -0,0 +1,119 @@
+"""Local load test: memory growth per concurrent Streamlit session.
+
+Simulates N sessions with Streamlit's AppTest. Each instance is a session with
+its own session state, run in this process like on the server. Every session
+predicts a different plant on page 1, opens the benchmarking page and the
+details page, and is kept alive until the end. The process RSS is sampled as
+sessions are added:
+
+    python load_test.py --sessions 50
+    python load_test.py --sessions 200 --max-kb-per-session 1000   # exit 1 above the limit
+
+The first session (which loads the model, datasets and indexes into the shared
+cache) is the baseline, so the growth reported is what each further session costs.
+AppTest also keeps every session's rendered page (charts included) in memory,
+so the figure is an upper bound for a real browser session.
+"""
+
+import argparse
+import gc
+import os
+import time
+
+import numpy as np
+
+import data_loader
+from model_inputs import FEATURE_COLUMNS, fuel_code_options, prime_mover_options
+from session_memory import process_rss, sessions_summary
+
+MAIN_PAGE = os.path.join(data_loader.BASE_DIR, "CO₂_Emissions_Prediction.py")
+PAGES = ["pages/CO₂_Emissions_Prediction_Benchmarking.py", "pages/Standards_and_Strategy_Details.py"]
+
+_FUEL_LABELS = {code: label for label, code in fuel_code_options.items()}
+_MOVER_LABELS = {code: label for label, code in prime_mover_options.items()}
+
+
+def _plant_inputs(count, seed=0):
+    # Inputs of real plants (known codes only), one per session
+    emissions = data_loader.load_emissions(FEATURE_COLUMNS)
+    emissions = emissions[emissions["Fuel Code"].isin(_FUEL_LABELS) & emissions["Prime Mover"].isin(_MOVER_LABELS)]
+    rows = np.random.default_rng(seed).choice(len(emissions), count, replace=count > len(emissions))
+    return [emissions.iloc[i] for i in rows]
+
+
+def run_session(plant, timeout=120):
+    """One session going through the three pages; returns the AppTest (the live session)."""
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(MAIN_PAGE, default_timeout=timeout).run()
+    at.number_input[0].set_value(float(plant["Fuel Consumption for Electric Generation (MMBtu)"]))
+    at.number_input[1].set_value(float(plant["Total Fuel Consumption (MMBtu)"]))
+    at.number_input[2].set_value(float(plant["Generation (kWh)"]))
+    at.selectbox[0].set_value(_FUEL_LABELS[plant["Fuel Code"]])
+    at.selectbox[1].set_value(_MOVER_LABELS[plant["Prime Mover"]])
+    at.button[0].click().run()
+    _check(at, MAIN_PAGE)
+    for page in PAGES:
+        _check(at.switch_page(page).run(), page)
+    return at
+
+
+def _check(at, page):
+    if at.exception:
+        raise RuntimeError(f"Session failed on {os.path.basename(page)}: {at.exception[0].message}")
+
+
+def _rss_mb():
+    gc.collect()
+    rss = process_rss()
+    return float("nan") if rss is None else rss / 1e6
+
+
+def load_test(sessions, report_every=10, log=print):
+    """Run ``sessions`` live sessions; returns the RSS samples and the growth per session."""
+    plants = _plant_inputs(sessions + 1)
+    live = [run_session(plants[0])]
+    baseline = _rss_mb()
+    log(f"Baseline after the first session: {baseline:,.1f} MB RSS")
+
+    samples = [(1, baseline)]
+    start = time.perf_counter()
+    for n, plant in enumerate(plants[1:], start=2):
+        live.append(run_session(plant))
+        if n % report_every == 0 or n == sessions + 1:
+            rss = _rss_mb()
+            samples.append((n, rss))
+            log(f"{n:>5} sessions: {rss:,.1f} MB RSS (+{(rss - baseline) / (n - 1) * 1e3:,.0f} kB/session)")
+    seconds = time.perf_counter() - start
+
+    registry = sessions_summary()
+    growth_kb = (samples[-1][1] - baseline) / max(sessions, 1) * 1e3
+    return {
+        "sessions": sessions,
+        "baseline_mb": baseline,
+        "final_mb": samples[-1][1],
+        "kb_per_session": growth_kb,
+        "session_state_kb": registry["session_bytes"] / max(registry["sessions"], 1) / 1e3,
+        "seconds_per_session": seconds / max(sessions, 1),
+        "samples": samples,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure the RSS growth per concurrent Streamlit session.")
+    parser.add_argument("--sessions", type=int, default=50)
+    parser.add_argument("--report-every", type=int, default=10)
+    parser.add_argument("--max-kb-per-session", type=float, default=None,
+                        help="Exit with status 1 if the growth per session is above this")
+    args = parser.parse_args(argv)
+
+    result = load_test(args.sessions, args.report_every)
+    print(f"{result['sessions']} extra sessions: {result['baseline_mb']:,.1f} -> {result['final_mb']:,.1f} MB RSS, "
+          f"{result['kb_per_session']:,.0f} kB per session "
+          f"(session state {result['session_state_kb']:,.1f} kB, {result['seconds_per_session']:.2f} s per session)")
+    if args.max_kb_per_session is not None and result["kb_per_session"] > args.max_kb_per_session:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""Input schema of the trained CO₂ pipeline.
+
+The prediction page, the batch scorer and any other caller must build the model
+input the same way, so the dropdown code maps and the feature column names live
+here instead of inside the page script.
+"""
+
+import pandas as pd
+
+# Inputs for the dropdown boxes:
+fuel_code_options = {
+    "BIT - Bituminous Coal": "BIT", "DFO - Distillate Fuel Oil": "DFO",
+    "GEO - Geothermal": "GEO", "JF - Jet Fuel": "JF",
+    "KER - Kerosene": "KER", "LIG - Lignite": "LIG",
+    "MSW - Municipal Solid Waste": "MSW", "NG - Natural Gas": "NG",
+    "PC - Petroleum Coke": "PC", "PG - Propane Gas": "PG",
+    "RC - Refined Coal": "RC", "RFO - Residual Fuel Oil": "RFO",
+    "SGC - Synthetic Gas from Coal": "SGC", "SUB - Subbituminous Coal": "SUB",
+    "TDF - Tire-derived Fuel": "TDF", "WC - Waste Coal": "WC",
+    "WO - Waste/Used Oil": "WO"
+}
+prime_mover_options = {
+    "CA - Combined Cycle (Multi-Shaft)": "CA", "CE - Compressed Air Energy Storage": "CE",
+    "CS - Compressed Air Storage": "CS", "CT - Combined Cycle (Single Shaft)": "CT",
+    "FC - Fuel Cell": "FC", "GT - Combustion Turbine (Gas Turbine)": "GT",
+    "IC - Internal Combustion Engine": "IC", "OT - Other": "OT",
+    "ST - Steam Turbine": "ST"
+}
+
+FUEL_CODES = frozenset(fuel_code_options.values())
+PRIME_MOVERS = frozenset(prime_mover_options.values())
+
+# Feature columns in the order the pipeline was trained on
+NUMERIC_FEATURES = [
+    "Fuel Consumption for Electric Generation (MMBtu)",
+    "Total Fuel Consumption (MMBtu)",
+    "Generation (kWh)",
+]
+CATEGORICAL_FEATURES = ["Fuel Code", "Prime Mover"]
+FEATURE_COLUMNS = NUMERIC_FEATURES + CATEGORICAL_FEATURES
+
+PREDICTION_COLUMN = "Predicted Tons of CO2 Emissions"
+
+
+def make_input_frame(fuel_elec_gen, total_fuel, generation, fuel_code, prime_mover):
+    """One-row model input, as the prediction page sends it."""
+    return pd.DataFrame({
+        "Fuel Consumption for Electric Generation (MMBtu)": [fuel_elec_gen],
+        "Total Fuel Consumption (MMBtu)": [total_fuel],
+        "Generation (kWh)": [generation],
+        "Fuel Code": [fuel_code],
+        "Prime Mover": [prime_mover],
+    })
+
+
+def numeric_inputs(df):
+    """The numeric features of ``df`` as a float array; values that are not numbers become NaN."""
+    return df[NUMERIC_FEATURES].apply(pd.to_numeric, errors="coerce").to_numpy(dtype=float)
+
+
+def invalid_code_mask(df):
+    """Boolean Series, True for rows whose Fuel Code or Prime Mover is not a known code."""
+    return ~df["Fuel Code"].isin(FUEL_CODES) | ~df["Prime Mover"].isin(PRIME_MOVERS)
@@ -0,0 +1,272 @@
+"""Model artifact export, manifest and load-time checks.
+
+``trained_pipe_co2.sav`` is a raw pickle: loading it runs arbitrary code, it is
+fully deserialized on every load and it only works with the exact library
+versions it was written with. Export it once:
+
+    python model_registry.py export            # skops if installed, else joblib
+    python model_registry.py check             # validate what the app would load
+
+This writes ``trained_pipe_co2.skops`` (skops, loads only allow-listed types)
+or ``trained_pipe_co2.joblib`` (uncompressed, numpy arrays memory-mapped on
+load) next to the pickle, plus ``trained_pipe_co2.manifest.json`` with the
+SHA-256 of the artifact, the library versions, the feature order and the
+categorical levels of the encoder.
+
+data_loader.load_model resolves the manifest first (falling back to the pickle)
+and checks, before anything is deserialized, that the file exists, that its
+hash matches and that the library versions are compatible; after loading, that
+the features and levels match the manifest and what the app sends. Problems
+raise ModelNotFoundError / ModelValidationError with an explanation.
+"""
+
+import argparse
+import json
+import os
+import platform
+import time
+
+import numpy as np
+import pandas as pd
+import sklearn
+
+from model_inputs import FEATURE_COLUMNS, FUEL_CODES, NUMERIC_FEATURES, PREDICTION_COLUMN, PRIME_MOVERS
+from prediction_cache import artifact_hash
+
+MANIFEST_SUFFIX = ".manifest.json"
+FORMATS = {"skops": ".skops", "joblib": ".joblib"}
+
+# Every type a skops artifact of the CO₂ pipeline may contain: the layout of
+# train_model.build_pipeline with any estimator of its grid (and the scalers
+# compiled_model.py supports). Anything else, e.g. builtins.eval, fails the load.
+TRUSTED_TYPES = frozenset({
+    "sklearn.pipeline.Pipeline",
+    "sklearn.compose._column_transformer.ColumnTransformer",
+    "sklearn.compose._column_transformer._RemainderColsList",
+    "sklearn.preprocessing._data.StandardScaler",
+    "sklearn.preprocessing._data.MinMaxScaler",
+    "sklearn.preprocessing._data.MaxAbsScaler",
+    "sklearn.preprocessing._encoders.OneHotEncoder",
+    "sklearn.linear_model._base.LinearRegression",
+    "sklearn.linear_model._ridge.Ridge",
+    "sklearn.linear_model._coordinate_descent.Lasso",
+    "sklearn.linear_model._huber.HuberRegressor",
+    "numpy.ndarray",
+    "numpy.dtype",
+    "numpy.dtypes.Float64DType",
+    "numpy.dtypes.Int64DType",
+    "numpy.dtypes.ObjectDType",
+    "numpy.float64",
+    "numpy.int64",
+    "builtins.slice",
+})
+
+# Codes offered by the prediction page, per categorical feature
+INPUT_CODES = {"Fuel Code": FUEL_CODES, "Prime Mover": PRIME_MOVERS}
+
+
+class ModelError(Exception):
+    """The model artifact cannot be used."""
+
+
+class ModelNotFoundError(ModelError, FileNotFoundError):
+    pass
+
+
+class ModelValidationError(ModelError, ValueError):
+    pass
+
+
+def manifest_path(path):
+    """Manifest belonging to the model at ``path`` (``<name>.manifest.json``)."""
+    return os.path.splitext(path)[0] + MANIFEST_SUFFIX
+
+
+def read_manifest(path):
+    with open(manifest_path(path)) as f:
+        return json.load(f)
+
+
+def resolve_model(path):
+    """(artifact path, manifest or None) for the model at ``path``; raises ModelNotFoundError."""
+    manifest_file = manifest_path(path)
+    if os.path.exists(manifest_file):
+        manifest = read_manifest(path)
+        artifact = os.path.join(os.path.dirname(manifest_file), manifest["artifact"])
+        if not os.path.exists(artifact):
+            raise ModelNotFoundError(
+                f"{os.path.basename(manifest_file)} refers to {manifest['artifact']}, which does not exist. "
+                "Re-export the model with `python model_registry.py export`.")
+        return artifact, manifest
+    if os.path.exists(path):
+        return path, None
+    raise ModelNotFoundError(
+        f"No trained model found: {path} does not exist. Copy trained_pipe_co2.sav into model_pickle/ "
+        "(and optionally run `python model_registry.py export`).")
+
+
+def model_hash(path):
+    """Content hash identifying the model at ``path`` (the manifest's, when exported)."""
+    artifact, manifest = resolve_model(path)
+    return manifest["sha256"] if manifest else artifact_hash(artifact)
+
+
+def _versions():
+    return {"python": platform.python_version(), "scikit-learn": sklearn.__version__,
+            "numpy": np.__version__, "pandas": pd.__version__}
+
+
+def _minor(version):
+    return tuple(version.split(".")[:2])
+
+
+def check_artifact(artifact, manifest):
+    """Checks that need no deserialization: content hash and library versions."""
+    if manifest is None:
+        return
+    if artifact_hash(artifact) != manifest["sha256"]:
+        raise ModelValidationError(
+            f"{os.path.basename(artifact)} does not match its manifest (SHA-256 differs): the file was changed "
+            "or replaced after export. Re-export it with `python model_registry.py export`.")
+    installed = _versions()
+    for library in ("scikit-learn", "numpy"):
+        exported = manifest["versions"][library]
+        if _minor(exported) != _minor(installed[library]):
+            raise ModelValidationError(
+                f"The model was exported with {library} {exported}, but {installed[library]} is installed. "
+                "Install the versions from requirements.txt or re-export the model with this environment.")
+
+
+def read_artifact(path):
+    """Deserialize an exported artifact (.skops or .joblib)."""
+    if path.endswith(FORMATS["skops"]):
+        import skops.io as sio
+
+        untrusted = sio.get_untrusted_types(file=path)
+        unexpected = [t for t in untrusted if t not in TRUSTED_TYPES]
+        if unexpected:
+            raise ModelValidationError(f"{os.path.basename(path)} contains types that are not allow-listed "
+                                       f"(model_registry.TRUSTED_TYPES): {unexpected}")
+        return sio.load(path, trusted=untrusted)
+
+    import joblib
+
+    # Uncompressed joblib files map the numpy arrays instead of copying them
+    return joblib.load(path, mmap_mode="r")
+
+
+def categorical_levels(model):
+    """{feature: [levels]} of the one-hot encoders in the model's ColumnTransformer."""
+    levels = {}
+    preprocessor = model.steps[0][1] if hasattr(model, "steps") else None
+    for _, transformer, columns in getattr(preprocessor, "transformers_", []):
+        if hasattr(transformer, "categories_"):
+            for column, categories in zip(columns, transformer.categories_):
+                levels[column] = [str(c) for c in categories]
+    return levels
+
+
+def validate_model(model, manifest=None):
+    """Check the loaded model against the app's input schema and the manifest; returns the model."""
+    if not hasattr(model, "predict"):
+        raise ModelValidationError(f"The model artifact holds a {type(model).__name__}, not a fitted pipeline.")
+
+    features = [str(f) for f in getattr(model, "feature_names_in_", FEATURE_COLUMNS)]
+    if sorted(features) != sorted(FEATURE_COLUMNS):
+        raise ModelValidationError(f"The model expects the columns {features}, but the app sends {FEATURE_COLUMNS}.")
+
+    if manifest is not None:
+        if features != manifest["features"]["order"]:
+            raise ModelValidationError(f"Feature order {features} differs from the manifest "
+                                       f"({manifest['features']['order']}).")
+        if categorical_levels(model) != manifest["features"]["categorical"]:
+            raise ModelValidationError("The encoder's categorical levels differ from the manifest.")
+    return model
+
+
+def unknown_input_codes(model):
+    """{feature: sorted codes} offered by the prediction page that the model never saw in training."""
+    levels = categorical_levels(model)
+    return {feature: sorted(codes - set(levels[feature])) for feature, codes in INPUT_CODES.items()
+            if feature in levels and codes - set(levels[feature])}
+
+
+def build_manifest(model, artifact, fmt, source=None):
+    return {
+        "format": fmt,
+        "artifact": os.path.basename(artifact),
+        "sha256": artifact_hash(artifact),
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "source": source,
+        "versions": _versions(),
+        "estimator": type(model.steps[-1][1] if hasattr(model, "steps") else model).__name__,
+        "features": {
+            "order": [str(f) for f in getattr(model, "feature_names_in_", FEATURE_COLUMNS)],
+            "numeric": NUMERIC_FEATURES,
+            "categorical": categorical_levels(model),
+        },
+        "output": PREDICTION_COLUMN,
+    }
+
+
+def default_format():
+    try:
+        import skops.io  # noqa: F401
+    except ImportError:
+        return "joblib"
+    return "skops"
+
+
+def export_model(model, path, fmt=None, source=None):
+    """Write ``model`` in ``fmt`` next to ``path`` plus its manifest; returns the manifest."""
+    validate_model(model)
+    fmt = fmt or default_format()
+    artifact = os.path.splitext(path)[0] + FORMATS[fmt]
+    tmp = artifact + ".tmp"
+    if fmt == "skops":
+        import skops.io as sio
+
+        sio.dump(model, tmp)
+    else:
+        import joblib
+
+        joblib.dump(model, tmp, compress=0)
+    os.replace(tmp, artifact)
+
+    manifest = build_manifest(model, artifact, fmt, source)
+    with open(manifest_path(path), "w") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def main(argv=None):
+    import data_loader
+
+    parser = argparse.ArgumentParser(description="Export and check the CO₂ model artifact.")
+    parser.add_argument("command", choices=["export", "check"])
+    parser.add_argument("--model", default=data_loader.MODEL_PATH, help="Pickled pipeline to export / model to check")
+    parser.add_argument("--format", choices=sorted(FORMATS), default=None)
+    args = parser.parse_args(argv)
+
+    try:
+        if args.command == "export":
+            if not os.path.exists(args.model):
+                raise ModelNotFoundError(f"{args.model} does not exist; nothing to export.")
+            model = validate_model(data_loader._load(args.model))
+            manifest = export_model(model, args.model, args.format, source=os.path.basename(args.model))
+            print(f"Exported {manifest['estimator']} to {manifest['artifact']} ({manifest['format']}), "
+                  f"manifest {os.path.basename(manifest_path(args.model))}")
+        else:
+            model = data_loader.load_model(args.model)
+            artifact, manifest = resolve_model(args.model)
+            print(f"OK: {os.path.basename(artifact)}" + (f" ({manifest['format']}, sha256 {manifest['sha256'][:12]})"
+                                                        if manifest else " (pickle, no manifest)"))
+            for feature, codes in unknown_input_codes(model).items():
+                print(f"Warning: {feature} codes offered by the app but unknown to the model: {', '.join(codes)}")
+    except (ModelNotFoundError, ModelValidationError, FileNotFoundError, ValueError) as e:
+        # data_loader raises the classes of the imported module, not of __main__
+        raise SystemExit(f"Error: {e}")
+
+
+if __name__ == "__main__":
+    main()
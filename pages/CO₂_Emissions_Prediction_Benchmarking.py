@@ -1,8 +1,15 @@
 
 
 import streamlit as st
-import pandas as pd
-import pickle
+
+from data_loader import (
+    load_emissions, load_emissions_index, load_emissions_lookup, load_fleet_rankings, load_plant_neighbors,
+    load_strategy_lookup,
+)
+from instrumentation import begin_rerun, render_dev_panel, timed
+from session_memory import track_session
+
+begin_rerun("benchmarking")
 
 # configure the page 
 st.set_page_config(
@@ -35,120 +42,158 @@ if gen_plant is None:
 
 st.write(f"Using an input plant generation of:  **{gen_plant:,.0f} kWh**")
 
+# Place the predicted emissions intensity on the fleet distribution (precomputed, see fleet_rankings.py)
+if gen_plant > 0:
+    from model_inputs import fuel_code_options, prime_mover_options
+
+    with timed("fleet_rank"):
+        fleet_rankings = load_fleet_rankings()
+        intensity = co2_prediction / gen_plant
+        fuel_code = fuel_code_options.get(st.session_state.get("FuCod"))
+        prime_mover = prime_mover_options.get(st.session_state.get("PriMov"))
+        placement = fleet_rankings.place(intensity, fuel_code, prime_mover)
+
+    st.subheader("Emissions intensity in the fleet")
+    st.write(f"Predicted intensity: **{intensity * 1000:,.3f} Ton CO₂/MWh**")
+    fleet_col, fuel_col, mover_col = st.columns(3)
+    fleet_col.metric(f"Fleet percentile ({len(fleet_rankings.intensities):,} plants)", f"{placement['fleet']:.0f}%")
+    if placement["Fuel Code"] is not None:
+        fuel_col.metric(f"Among {fuel_code} plants ({fleet_rankings.group_size('Fuel Code', fuel_code):,})",
+                        f"{placement['Fuel Code']:.0f}%")
+    if placement["Prime Mover"] is not None:
+        mover_col.metric(f"Among {prime_mover} plants ({fleet_rankings.group_size('Prime Mover', prime_mover):,})",
+                         f"{placement['Prime Mover']:.0f}%")
+    st.caption("Share of plants with a lower or equal CO₂ per kWh; groups use each plant's main fuel and prime mover.")
+else:
+    st.info("Enter a positive generation on page 1 to see the plant's emissions intensity in the fleet.")
+
 st.markdown("---------------")
-# Step 2: load emissions data and Plant Generation from Pickle
+# Step 2: load emissions data and Plant Generation (cached once per process)
 
 try: 
-    with open("model_pickle/emissions.pkl", "rb") as f:
-        co2emissions_plant = pickle.load(f)
+    # Only the columns this page plots are read from the memory-mapped file
+    co2emissions_plant = load_emissions(columns=["Plant Code", "Tons of CO2 Emissions", "Generation (kWh)"])
+    emissions_index = load_emissions_index()
+    emissions_lookup = load_emissions_lookup()
 except Exception as e:
     st.error (f"Error loading emissions data: {e}")
     st.stop()
 
-# Initialize session state for slider
-if "range_percent_emiss" not in st.session_state:
-    st.session_state.range_percent_emiss = 10
-
-# Sidebar slider for dynamic range to filter similar emissions
-range_percent_emiss = st.sidebar.slider(
-    "Select ± range around predicted CO₂ emissions",
-    min_value=1,
-    max_value=25,
-    value=st.session_state.range_percent_emiss,
-    step=1,
-    help="Adjust the percentage range to filter similar emissions"
+# Sidebar: how similar plants are found
+match_mode = st.sidebar.radio(
+    "Find similar plants by",
+    ["± range on CO₂ emissions", "k nearest plants (emissions + generation)"],
+    key="match_mode",
+    help="The k-nearest search compares emissions and generation together and always returns k plants"
 )
-# Update session state for slider
-st.session_state.range_percent_emiss = range_percent_emiss
 
-# Calculate bounds: emissions
-lower_bound = co2_prediction * (1 - range_percent_emiss / 100)
-upper_bound = co2_prediction * (1 + range_percent_emiss / 100)
-
-
-
-# Filter data with error handling. Emissions.
-try:
-    filtered_co2_emissions = co2emissions_plant[
-        (co2emissions_plant["Tons of CO2 Emissions"] >= lower_bound) &
-        (co2emissions_plant["Tons of CO2 Emissions"] <= upper_bound)
-    ][["Plant Code", "Tons of CO2 Emissions", "Generation (kWh)"]]
-except KeyError:
-    st.error("Data must contain the 'Plant Code', 'Tons of CO₂ Emissions' and 'Generation (kWh)' columns.")
-    st.stop()
+if match_mode == "± range on CO₂ emissions":
+    # A held-out prediction interval from page 1 is the default window; an in-sample one
+    # (no held-out calibration yet) is only offered, the ± slider stays the default then
+    co2_interval = st.session_state.get("co2_interval", None)
+    use_interval = co2_interval is not None and st.sidebar.checkbox(
+        "Use the prediction interval as range",
+        value=st.session_state.get("co2_interval_held_out", False),
+        help="Compare with plants whose emissions fall inside the model's prediction interval"
+    )
 
+    if use_interval:
+        lower_bound, upper_bound = co2_interval
+        st.write(f"Comparing with plants inside the prediction interval:  "
+                 f"**{lower_bound:,.0f} – {upper_bound:,.0f} Ton**")
+    else:
+        # Initialize session state for slider
+        if "range_percent_emiss" not in st.session_state:
+            st.session_state.range_percent_emiss = 10
+
+        # Sidebar slider for dynamic range to filter similar emissions
+        range_percent_emiss = st.sidebar.slider(
+            "Select ± range around predicted CO₂ emissions",
+            min_value=1,
+            max_value=25,
+            value=st.session_state.range_percent_emiss,
+            step=1,
+            help="Adjust the percentage range to filter similar emissions"
+        )
+        # Update session state for slider
+        st.session_state.range_percent_emiss = range_percent_emiss
+
+        # Calculate bounds: emissions
+        lower_bound = co2_prediction * (1 - range_percent_emiss / 100)
+        upper_bound = co2_prediction * (1 + range_percent_emiss / 100)
+
+
+
+    # Filter data with error handling. Emissions.
+    # The sorted index answers the ±range window with a binary search (O(log n)).
+    try:
+        with timed("emissions_filter"):
+            filtered_co2_emissions = co2emissions_plant.iloc[
+                emissions_index.window(lower_bound, upper_bound)
+            ][["Plant Code", "Tons of CO2 Emissions", "Generation (kWh)"]]
+    except KeyError:
+        st.error("Data must contain the 'Plant Code', 'Tons of CO₂ Emissions' and 'Generation (kWh)' columns.")
+        st.stop()
 
+    if use_interval:
+        empty_message = "No plants found within the prediction interval."
+    else:
+        empty_message = f"No plants found within (±{range_percent_emiss}%) of predicted emissions."
 
-# Display the bar charts: Emissions
-import plotly.graph_objects as go
+else:
+    # k nearest plants on emissions and generation (KD-tree built once, see plant_neighbors.py)
+    k_neighbors = st.sidebar.slider("Number of similar plants (k)", min_value=5, max_value=100, value=20, step=5)
+    match_codes = st.sidebar.checkbox("Also match Fuel Code and Prime Mover of the page 1 plant")
+
+    from model_inputs import fuel_code_options, prime_mover_options
+    fuel_code = fuel_code_options.get(st.session_state.get("FuCod"))
+    prime_mover = prime_mover_options.get(st.session_state.get("PriMov"))
+    if match_codes and (fuel_code is None or prime_mover is None):
+        st.warning("Fuel Code / Prime Mover of the page 1 plant are missing; matching on emissions and generation only.")
+        match_codes = False
+
+    with timed("emissions_neighbors", k=k_neighbors):
+        neighbors = load_plant_neighbors(use_codes=match_codes)
+        positions, _ = neighbors.query(co2_prediction, gen_plant, k=k_neighbors,
+                                       fuel_code=fuel_code, prime_mover=prime_mover)
+        # Sorted by emissions, like the ±range window
+        filtered_co2_emissions = co2emissions_plant.iloc[positions].sort_values("Tons of CO2 Emissions")
+
+    empty_message = "No similar plants found."
+
+
+
+# Display the bar charts: Emissions (capped / WebGL for large windows, see benchmark_chart.py)
+from benchmark_chart import build_comparison_figure, DEFAULT_MAX_BARS
+
+max_bars = st.sidebar.number_input(
+    "Plants shown as individual bars",
+    min_value=10,
+    max_value=500,
+    value=DEFAULT_MAX_BARS,
+    step=10,
+    help="Plants nearest to the prediction get their own bars; the rest is grouped into bins"
+)
 
 if filtered_co2_emissions.empty:
-    st.warning(f"No plants found within (±{range_percent_emiss}%) of predicted emissions.")
+    st.warning(empty_message)
 else:
-    # Add predicted value as a syntetic row
-    plot_df = filtered_co2_emissions.copy()
-    predicted_row = pd.DataFrame({
-        "Plant Code": ["Predicted Value"],
-        "Tons of CO2 Emissions": [co2_prediction],
-        "Generation (kWh)":[gen_plant]
-    })
-    plot_df = pd.concat([plot_df, predicted_row], ignore_index = True)
-    
-    plot_df = plot_df.sort_values("Tons of CO2 Emissions").reset_index(drop=True)
-
-    # Assign colors:
-
-    colors_emiss = ["steelblue" if code == "Predicted Value" else "skyblue" for code in plot_df["Plant Code"]]
-    
-    colors_gen = ["indianred" if code == "Predicted Value" else "rosybrown" for code in plot_df["Plant Code"]]
-        
- 
-    # Create the figure
-    fig_dual = go.Figure()
-
-    # Primary Y-axis: Tons of CO2 Emissions
-    fig_dual.add_trace(go.Bar(
-        x=plot_df['Plant Code'],
-        y=plot_df['Tons of CO2 Emissions'],
-        name='CO₂ Emissions (Ton)',
-        marker_color=colors_emiss,
-        yaxis='y1'
-    ))
-
-    # Secondary Y-axis: Generation (kWh)
-    fig_dual.add_trace(go.Bar(
-        x=plot_df['Plant Code'],
-        y=plot_df['Generation (kWh)'],
-        name='Generation (kWh)',
-        marker_color=colors_gen,
-        yaxis='y2'
-    ))
-
-    # Update layout for dual axes
-    fig_dual.update_layout(
-        title='CO₂ Emissions vs Generation by Plant',
-        xaxis=dict(
-            title='Plant Code',
-            type='category'
-        ),
-        yaxis=dict(
-            title='CO₂ Emissions (Ton)',
-            titlefont=dict(color="steelblue"),
-            tickfont=dict(color="steelblue"),
-            # titlefont=dict(color=colors_emiss[0]), # hier assigns the series color to the font
-            # tickfont=dict(color=colors_emiss[0])
-        ),
-        yaxis2=dict(
-            title='Generation (kWh)',
-            titlefont=dict(color='indianred'),
-            tickfont=dict(color='indianred'),
-            overlaying='y',
-            side='right'
-        ),
-        legend=dict(x=0.01, y=0.99),
-        barmode='group',
-        margin=dict(l=40, r=40, t=60, b=40)
-    )
+    # Build the figure (timed: this is the heaviest step of the page)
+    with timed("benchmark_figure", plants=len(filtered_co2_emissions)):
+        fig_dual, chart_mode = build_comparison_figure(
+            filtered_co2_emissions["Plant Code"].to_numpy(),
+            filtered_co2_emissions["Tons of CO2 Emissions"].to_numpy(),
+            filtered_co2_emissions["Generation (kWh)"].to_numpy(),
+            co2_prediction,
+            gen_plant,
+            max_bars=max_bars,
+        )
+
+    if chart_mode == "binned":
+        st.caption(f"{len(filtered_co2_emissions):,} plants in range: the {max_bars} nearest are shown "
+                   "individually, the others are grouped into bins (grey).")
+    elif chart_mode == "webgl":
+        st.caption(f"{len(filtered_co2_emissions):,} plants in range: shown as a scatter plot.")
 
     # Display in Streamlit
     st.plotly_chart(fig_dual, use_container_width=True)
@@ -158,6 +203,9 @@ else:
 
 emiss_codes = filtered_co2_emissions["Plant Code"].drop_duplicates().sort_values()
 
+# Plants of the window, for the strategy export on the details page (a compact int array)
+st.session_state.benchmark_plant_codes = emiss_codes.to_numpy(dtype="int32")
+
 # Ensure it's a list (Streamlit prefers lists over Series)
 emiss_codes_list = emiss_codes.tolist()
 
@@ -188,11 +236,10 @@ selected_plant = st.selectbox(
 st.session_state.selected_plant = selected_plant
 
 
-# Load the emissions-strategy data from Pickle
+# Load the emissions-strategy data (cached once per process)
 
 try:
-    with open("model_pickle/emiss_strategy_plant.pkl", "rb") as f:
-        emiss_strategy_plant = pickle.load(f)
+    strategy_lookup = load_strategy_lookup()
 except Exception as e:
     st.error(f"Error loading emissions-strategy data: {e}")
     st.stop()
@@ -206,19 +253,15 @@ st.write(f"You selected: **{selected_plant}**")
 
 # Filter metadata for selected plant
 
+# Plant Code is stored as a compact int and grouped at load time (plant_lookup.py),
+# so each lookup is a binary search + slice and the cached frames are never modified.
 selected_plant = int(selected_plant)
-emiss_strategy_plant["Plant Code"]= emiss_strategy_plant["Plant Code"].astype(int)
-co2emissions_plant["Plant Code"] = co2emissions_plant["Plant Code"].astype(int)  #Added 01.10.25 16:00
 
 # Filter emissions strategy:
-matching_rows = emiss_strategy_plant[emiss_strategy_plant["Plant Code"] == selected_plant]
-matching_rows = matching_rows.reset_index() # Bring index into a column
-matching_rows = matching_rows.drop(columns=["index"]) # removes that column... It is not reflected on the plot... this step is not necessary 
+matching_rows = strategy_lookup.rows(selected_plant).reset_index(drop=True)
 
 # Filer Prime Mover and Fuel Code:
-matching_rows_mover = co2emissions_plant[co2emissions_plant["Plant Code"] == selected_plant]
-matching_rows_mover = matching_rows_mover.reset_index() # Bring index into a column
-matching_rows_mover = matching_rows_mover[["Plant Code", "Prime Mover", "Fuel Code"]]
+matching_rows_mover = emissions_lookup.rows(selected_plant)[["Plant Code", "Prime Mover", "Fuel Code"]]
 
 # Df for strategy
 if matching_rows.empty:
@@ -235,3 +278,5 @@ else:
     st.dataframe(matching_rows_mover, use_container_width=True)
 
 
+track_session("benchmarking")
+render_dev_panel()
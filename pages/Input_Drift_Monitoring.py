@@ -0,0 +1,110 @@
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+import streamlit as st
+
+from data_loader import load_reference_profile
+from drift_monitor import PREDICTION_FEATURE, PSI_DRIFT, PSI_WATCH, RETENTION_DAYS, drift_report, load_window
+from instrumentation import begin_rerun, render_dev_panel, timed
+from model_registry import ModelError
+from session_memory import track_session
+
+begin_rerun("monitoring")
+
+# configure the page
+st.set_page_config(
+    page_title="Input Drift Monitoring",
+    page_icon="📈",
+    layout="centered",
+)
+
+st.markdown(
+    "<h1 style='text-align: center;'>Input Drift Monitoring</h1>",
+    unsafe_allow_html=True
+)
+
+st.markdown("---------------")
+
+st.info("""
++ Compares the inputs sent to the model (prediction page, batch scoring and the prediction service)
+with the data the model was trained on.
++ Only counts per value range and per code are recorded, never the requests themselves.
+""")
+
+# Window and sources
+days = st.sidebar.slider("Days to include", min_value=1, max_value=RETENTION_DAYS, value=7)
+all_sources = ["app", "batch", "service"]
+sources = st.sidebar.multiselect("Sources", all_sources, default=all_sources,
+                                 help="app: prediction page, batch: file scoring, service: prediction_service.py")
+if not sources:
+    st.info("Select at least one source.")
+    st.stop()
+
+try:
+    reference = load_reference_profile()
+except ModelError as e:
+    st.error(f"The reference profile needs the prediction model: {e}")
+    st.stop()
+
+with timed("drift_report", days=days):
+    # None reads every source, including ones recorded under other names
+    window, found = load_window(days, None if set(sources) == set(all_sources) else sources)
+    report = drift_report(reference, window) if window.rows else []
+
+if not window.rows:
+    st.warning(f"No predictions recorded in the last {days} day(s).")
+    st.stop()
+if not report:
+    st.info("No features to compare with the reference profile.")
+    st.stop()
+
+rows_col, ref_col = st.columns(2)
+rows_col.metric(f"Rows scored (last {days} day(s))", f"{window.rows:,}")
+ref_col.metric("Reference rows", f"{reference.rows:,}")
+st.caption(" · ".join(f"{source}: {rows:,} rows" for source, rows in sorted(found.items()))
+           + f" · reference: {reference.meta.get('source', 'unknown')}")
+
+# Drift scores
+status_icons = {"ok": "🟢 ok", "watch": "🟡 watch", "drift": "🔴 drift", "too few rows": "⚪ too few rows"}
+table = pd.DataFrame([{
+    "Feature": row["feature"],
+    "Status": status_icons[row["status"]],
+    "PSI": row["psi"],
+    "KS": row.get("ks", np.nan),
+    "Unseen codes": (f"{row['unseen_share']:.1%}" + (f" ({', '.join(row['unseen'][:5])})" if row["unseen"] else "")
+                     if row["kind"] == "categorical" else ""),
+    "Rows": row["rows"],
+} for row in report])
+
+st.subheader("Drift per feature")
+st.dataframe(table, use_container_width=True, hide_index=True,
+             column_config={"PSI": st.column_config.NumberColumn(format="%.3f"),
+                            "KS": st.column_config.NumberColumn(format="%.3f")})
+st.caption(f"PSI (population stability index) below {PSI_WATCH} is stable, {PSI_WATCH}–{PSI_DRIFT} a moderate "
+           f"and above {PSI_DRIFT} a significant shift. KS is the largest gap between the two distributions.")
+
+# Distribution of one feature: reference vs recorded
+st.subheader("Distribution")
+feature = st.selectbox("Feature", [row["feature"] for row in report])
+kind = next(row["kind"] for row in report if row["feature"] == feature)
+
+fig = go.Figure()
+if kind == "numeric":
+    levels = np.linspace(0.01, 0.99, 99)
+    for name, profile in (("Reference", reference), (f"Last {days} day(s)", window)):
+        fig.add_trace(go.Scatter(x=profile.numeric[feature].quantiles(levels), y=levels * 100, mode="lines",
+                                 name=name))
+    fig.update_layout(xaxis_title=feature if feature != PREDICTION_FEATURE else "Predicted Tons of CO2 Emissions",
+                      yaxis_title="Percentile", xaxis_type="log")
+else:
+    codes = sorted(set(reference.codes[feature].counts) | set(window.codes[feature].counts))
+    for name, counter in (("Reference", reference.codes[feature]), (f"Last {days} day(s)", window.codes[feature])):
+        fig.add_trace(go.Bar(x=codes, y=[counter.counts.get(c, 0) / max(counter.count, 1) * 100 for c in codes],
+                             name=name))
+    fig.update_layout(xaxis_title=feature, yaxis_title="Share of rows (%)", barmode="group")
+fig.update_layout(height=400, margin=dict(t=30))
+st.plotly_chart(fig, use_container_width=True)
+
+
+track_session("monitoring")
+render_dev_panel()
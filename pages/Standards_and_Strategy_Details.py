@@ -1,7 +1,11 @@
 
 import streamlit as st
-import pandas as pd
-import pickle
+
+from data_loader import load_decoded_strategy_lookup
+from instrumentation import begin_rerun, render_dev_panel, timed
+from session_memory import track_session
+
+begin_rerun("standards_details")
 
 # configure the page 
 st.set_page_config(
@@ -15,131 +19,84 @@ st.title("Emissions Standards and Strategy - Details")
 st.markdown("")
 st.success("**Find detailed information here about content presented on page 2**")
 
-# Diccionarios ordenados alfabéticamente
-
-boiler_status = {
-    "CN": "Cancelled (previously reported as 'planned')",
-    "CO": "New unit under construction",
-    "OP": "Operating (in commercial service or out of service < 365 days)",
-    "OS": "Out of service (365 days or longer)",
-    "PL": "Planned (expected to go into service within 10 years)",
-    "RE": "Retired",
-    "SB": "Standby (inactive reserve)",
-    "SC": "Cold Standby (requires 3 to 6 months to reactivate)",
-    "TS": "Operating under test conditions"
-}
-
-type_boilers = {
-    "D":  "Standards of Performance for fossil-fuel fired steam boilers for which construction began after August 17, 1971.",
-    "Da": "Standards of Performance for fossil-fuel fired steam boilers for which construction began after September 18, 1978.",
-    "Db": "Standards of Performance for fossil-fuel fired steam boilers for which construction began after June 19, 1984.",
-    "Dc": "Standards of Performance for small industrial-commercial-institutional steam generating units.",
-    "N":  "Not covered under New Source Performance Standards."
-}
-
-regulation_sulfur_nitrogen_particulate = {"FD": "Federal",
-"ST" : "State level",
-"LO": "Local",
-'XX': "Unvavailable or Unknown"}
-
-so2_control_strategy_1 = {
-    "CF": "Fluidized Bed Combustor",
-    "IF": "Use flue gas desulfurization unit or other SO₂ control process",
-    "NA": "Not applicable",
-    "ND": "Not determined at this time",
-    "NP": "No plans to control",
-    "OT": "Other (specify in Schedule 7)",
-    "SE": "Seeking revision of government regulation",
-    "SS": "Switch to lower sulfur fuel",
-    "WA": "Allocated allowances and purchase allowances"
-}
-
-nox_control_strategy_1 = {
-    "AA": "Advanced overfire air",
-    "BF": "Biased firing (alternative burners)",
-    "BO": "Burner out of service",
-    "CF": "Fluidized bed combustor",
-    "FR": "Flue gas recirculation",
-    "FU": "Fuel reburning",
-    "H2O": "Water injection",
-    "LA": "Low excess air",
-    "LN": "Low NOx burner",
-    "MS": "Currently meeting standard",
-    "NA": "Not applicable",
-    "NC": "No change in historic operation of unit anticipated",
-    "ND": "Not determined at this time",
-    "NH3": "Ammonia injection",
-    "NP": "No plans to control",
-    "OT": "Other (unspecified or see Schedule 7)",
-    "OV": "Overfire air",
-    "RP": "Repower unit",
-    "SC": "Slagging",
-    "SE": "Seeking revision of government regulation",
-    "SN": "Selective noncatalytic reduction (SNCR)",
-    "SR": "Selective catalytic reduction (SCR)",
-    "STM": "Steam injection",
-    "UE": "Decrease utilization – rely on energy conservation and/or improved efficiency"
-}
-
-mercury_control_strategy_1 = {
-    "ACI": "Activated carbon injection system",
-    "BP": "Baghouse (fabric filter), pulse",
-    "BR": "Baghouse (fabric filter), reverse air",
-    "BS": "Baghouse (fabric filter), shake and deflate",
-    "CD": "Circulating dry scrubber",
-    "DSI": "Dry sorbent (powder) injection type",
-    "EC": "Electrostatic precipitator, cold side, with flue gas conditioning",
-    "EH": "Electrostatic precipitator, hot side, with flue gas conditioning",
-    "EK": "Electrostatic precipitator, cold side, without flue gas conditioning",
-    "EW": "Electrostatic precipitator, hot side, without flue gas conditioning",
-    "FP": "Fabric filter with powdered activated carbon",
-    "HGP": "High gradient magnetic separation",
-    "JB": "Jet bubbling reactor (wet) scrubber",
-    "LIJ": "Lime injection",
-    "MA": "Mechanically aided type (wet) scrubber",
-    "MS": "Currently meeting standard",
-    "MW": "Mercury wet scrubber",
-    "NA": "Not applicable",
-    "ND": "Not determined at this time",
-    "OT": "Other (specify in SCHEDULE 7)",
-    "PA": "Packed type (wet) scrubber",
-    "RA": "Regenerative activated coke technology",
-    "RB": "Rotating belt filter",
-    "SD": "Spray dryer type / dry FGD / semi-dry FGD",
-    "SP": "Spray type (wet) scrubber",
-    "TR": "Tray type (wet) scrubber",
-    "VE": "Venturi type (wet) scrubber"
-}
-
-steam_plant_type = {
-    1: "Plants with combustible-fueled steam-electric generators ≥ 100 MW capacity (including combined cycle steam-electric with duct firing).",
-    2: "Plants with combustible-fueled steam-electric generators ≥ 10 MW but < 100 MW capacity (including combined cycle steam-electric with duct firing).",
-    3: "Plants with nuclear fueled, combined cycle steam-electric without duct firing, solar thermal electric with steam cycle ≥ 100 MW.",
-    4: "Plants with non-steam fueled electric generators (wind, PV, geothermal, fuel cell, combustion turbines, IC engines, etc.)."
-}
-
-additional_info = {
-    "State": "United States of America states where the plant is located.",
-    "Boiler ID": "Unique identifier of boilers within a plant."
-}
-
-# Read from Pickle the emissions strategy information
+# Code dictionaries and the column-wise decoder live in strategy_codes.py
+from strategy_codes import (
+    boiler_status, type_boilers, regulation_sulfur_nitrogen_particulate,
+    so2_control_strategy_1, nox_control_strategy_1, mercury_control_strategy_1,
+    steam_plant_type, additional_info, boiler_comparison,
+)
+
+# Read the emissions strategy information (cached once per process)
 
 try:
-    with open("model_pickle/emiss_strategy_plant.pkl", "rb") as f:
-        emiss_strategy_plant = pickle.load(f)
+    decoded_lookup = load_decoded_strategy_lookup()
 except Exception as e:
     st.error(f"Error loading emissions-strategy data: {e}")
     st.stop()
 
+
+# Export for many plants: runs in a background thread (strategy_export.py), the
+# session only keeps the job id and the page polls its progress.
+from strategy_export import MIME_TYPES, available_formats, discard_job, get_job, plants_in_states, start_export
+
+
+@st.fragment(run_every=1)
+def export_progress(job_id):
+    job = get_job(job_id)
+    if job is not None and job.status == "running":
+        st.progress(job.fraction, text=f"Exporting {job.plants_done:,} / {job.total:,} plants "
+                                       f"({job.rows:,} boilers)")
+        if st.button("Cancel export"):
+            discard_job(job_id)
+            st.rerun()
+    else:
+        # Finished: redraw the page once, without this polling fragment
+        st.rerun()
+
+
+with st.expander("📦 Export decoded data for many plants"):
+    window_codes = st.session_state.get("benchmark_plant_codes", None)
+    scopes = ["Plants in the benchmarking window"] if window_codes is not None and len(window_codes) else []
+    scopes += ["States", "All plants"]
+    scope = st.radio("Plants to export", scopes, horizontal=True)
+    if scope == "States":
+        states = st.multiselect("States", sorted(decoded_lookup.frame["State"].dropna().astype(str).unique()))
+        export_codes = plants_in_states(decoded_lookup, states)
+        export_label = "_".join(states[:5]) or "states"
+    elif scope == "All plants":
+        export_codes, export_label = decoded_lookup.codes, "all_plants"
+    else:
+        export_codes, export_label = window_codes, "benchmark_window"
+    export_format = st.selectbox("Format", available_formats(),
+                                 help="Excel needs openpyxl; CSV and Parquet are always available")
+    st.caption(f"{len(export_codes):,} plants selected; every boiler is written with its decoded fields.")
+
+    if st.button("Start export", disabled=not len(export_codes)):
+        previous = st.session_state.get("strategy_export_job")
+        if previous:
+            discard_job(previous)
+        st.session_state.strategy_export_job = start_export(decoded_lookup, export_codes, export_format,
+                                                            export_label).id
+
+    export_job = get_job(st.session_state.get("strategy_export_job"))
+    if export_job is not None:
+        if export_job.status == "running":
+            export_progress(export_job.id)
+        elif export_job.status == "done":
+            st.success(f"Exported {export_job.rows:,} boilers of {export_job.total:,} plants.")
+            with open(export_job.path, "rb") as f:
+                st.download_button(f"Download {export_job.file_name}", f, file_name=export_job.file_name,
+                                   mime=MIME_TYPES[export_job.fmt])
+        elif export_job.status == "failed":
+            st.error(f"The export failed: {export_job.error}")
+
 selected_plant = st.session_state.get("selected_plant", None)
 if selected_plant is None:
     st.warning("No plant selected yet. Please go to Page 2 first.")
     st.stop()
 
-# Ensure column is int
-emiss_strategy_plant["Plant Code"] = emiss_strategy_plant["Plant Code"].astype(int)
-plant_data = emiss_strategy_plant[emiss_strategy_plant["Plant Code"] == selected_plant]
+# Rows of the selected plant, already decoded (Plant Code is grouped and stored as int at load time)
+plant_data = decoded_lookup.rows(selected_plant)
 
 if plant_data.empty:
     st.warning("No data found for selected plant.")
@@ -168,46 +125,10 @@ st.subheader("📌 Standars & Strategy Values for Selected Plant")
 #plant_row = plant_data.iloc[0]
 
 
-# Fields and dictionaries to decode
-decode_map = {
-    "Boiler Status": boiler_status,
-    "Type of Boiler": type_boilers,
-    "Regulation Sulfur": regulation_sulfur_nitrogen_particulate,
-    "Sulfur Dioxide Control Existing Strategy 1": so2_control_strategy_1,
-    "Sulfur Dioxide Control Proposed Strategy 1": so2_control_strategy_1,
-    "Regulation Nitrogen": regulation_sulfur_nitrogen_particulate,
-    "Nitrogen Oxide Control Existing Strategy 1": nox_control_strategy_1,
-    "Nitrogen Oxide Control Proposed Strategy 1": nox_control_strategy_1,
-    "Regulation Particulate": regulation_sulfur_nitrogen_particulate,
-    "Regulation Mercury": regulation_sulfur_nitrogen_particulate,
-    "Mercury Control Existing Strategy 1": mercury_control_strategy_1,
-    "Mercury Control Proposed Strategy 1": mercury_control_strategy_1,
-    "Steam Plant Type": steam_plant_type
-}
-
-# Table
-# Table all info together
-
-comparison_rows = []
-row_labels = []
-
-for field in decode_map:
-    row = {}
-    for _, boiler in plant_data.iterrows():
-        raw_val = boiler.get(field, "NA")
-        if pd.isna(raw_val) or raw_val == "":
-            raw_val = "NA"
-            meaning = "Not Available"
-        else:
-            meaning = decode_map[field].get(raw_val, "Unknown")
-        boiler_label = f"Boiler ID: {boiler['Boiler ID']}"
-        row[boiler_label] = f"{raw_val} – {meaning}"
-    comparison_rows.append(row)
-    row_labels.append(field)
-
-# DataFrame
-comparison_df = pd.DataFrame(comparison_rows, index=row_labels)
-comparison_df.index.name = "Emissions Standars & Strategy"
+# Table all info together: the strategy data is decoded once at load time
+# (strategy_codes.decode_frame), so here we only slice the plant's boilers.
+with timed("boiler_decode", boilers=len(plant_data)):
+    comparison_df = boiler_comparison(plant_data)
 # Show the table
 #st.markdown("Each column below represents a boiler identified by its unique **Boiler ID**, from the previous results.")
 
@@ -262,3 +183,7 @@ st.markdown("---")
 st.subheader("ℹ️ Aditional Information")
 for key, val in additional_info.items():
     st.markdown(f"- **{key}**: {val}")
+
+
+track_session("standards_details")
+render_dev_panel()
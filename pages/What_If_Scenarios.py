@@ -0,0 +1,144 @@
+
+import streamlit as st
+import plotly.graph_objects as go
+
+from data_loader import load_model
+from model_registry import ModelError
+from model_inputs import fuel_code_options, prime_mover_options, PREDICTION_COLUMN
+from what_if import axes_key, cached_sweep, sweep, sweep_csv, grid_size, value_range, code_matrix, top_rows
+from instrumentation import begin_rerun, render_dev_panel, timed
+from session_memory import track_session
+
+begin_rerun("what_if")
+
+# configure the page 
+st.set_page_config(
+    page_title="What-if Scenarios",
+    page_icon="🔀",
+    layout="centered",
+)
+
+st.markdown(
+    "<h1 style='text-align: center;'>What-if: Fuel and Prime Mover Scenarios</h1>",
+    unsafe_allow_html=True
+)
+
+st.markdown("---------------")
+
+st.info("""
++ Predicts CO₂ emissions for every combination of the selected ***fuel codes*** and ***prime movers***, 
+optionally sweeping the numeric inputs over a range.
++ All combinations are scored together, and the result is shown as a heatmap.
+""")
+
+# Limit of grid points scored per run
+MAX_GRID_POINTS = 2_000_000
+
+try:
+    loaded_model = load_model()
+except ModelError as e:
+    st.error(f"The prediction model cannot be used: {e}")
+    st.stop()
+
+# Defaults: the plant entered on page 1 (if any)
+base_inputs = {
+    "Fuel Consumption for Electric Generation (MMBtu)": st.session_state.get("FuComElGen", 0.0),
+    "Total Fuel Consumption (MMBtu)": st.session_state.get("ToFuCom", 0.0),
+    "Generation (kWh)": st.session_state.get("Gen", 0.0),
+}
+base_fuel = st.session_state.get("FuCod", list(fuel_code_options.keys())[0])
+base_mover = st.session_state.get("PriMov", list(prime_mover_options.keys())[0])
+
+# Codes to compare
+fuel_labels = st.multiselect("Fuel Codes", list(fuel_code_options.keys()), default=list(fuel_code_options.keys()))
+mover_labels = st.multiselect("Prime Movers", list(prime_mover_options.keys()), default=list(prime_mover_options.keys()))
+
+# Numeric ranges: one step keeps the value fixed at "From"
+st.markdown("#### Numeric inputs")
+axes = {}
+for column, base_value in base_inputs.items():
+    col_from, col_to, col_steps = st.columns([2, 2, 1])
+    low = col_from.number_input(f"{column} - from", value=float(base_value))
+    high = col_to.number_input(f"{column} - to", value=float(base_value))
+    steps = col_steps.number_input("Steps", min_value=1, max_value=200, value=1, key=f"steps_{column}")
+    axes[column] = value_range(low, high, steps)
+
+axes["Fuel Code"] = [fuel_code_options[label] for label in fuel_labels]
+axes["Prime Mover"] = [prime_mover_options[label] for label in mover_labels]
+
+if not fuel_labels or not mover_labels:
+    st.warning("Select at least one Fuel Code and one Prime Mover.")
+    st.stop()
+
+n_points = grid_size(axes)
+st.write(f"Grid size: **{n_points:,}** combinations")
+if n_points > MAX_GRID_POINTS:
+    st.warning(f"Reduce the number of steps: at most {MAX_GRID_POINTS:,} combinations per run.")
+    st.stop()
+
+compare_to_base = st.checkbox(
+    f"Show change vs. the page 1 plant ({fuel_code_options[base_fuel]} / {prime_mover_options[base_mover]})"
+)
+
+# Only the axes of the last run live in session state; the scored grid is shared per process
+if st.button("Run scenarios"):
+    st.session_state.what_if_axes = axes_key(axes)
+
+what_if_axes = st.session_state.get("what_if_axes", None)
+if what_if_axes is None:
+    st.stop()
+run_axes = dict(what_if_axes)
+
+with st.spinner("Scoring scenarios..."):
+    with timed("what_if_sweep", grid_points=grid_size(run_axes)):
+        result = cached_sweep(loaded_model, run_axes)
+
+# Heatmap: Fuel Code x Prime Mover, averaged over the numeric sweep
+matrix = code_matrix(result)
+title = "Predicted CO₂ Emissions (Ton), mean over numeric sweep"
+
+if compare_to_base:
+    base_axes = dict(run_axes)
+    base_axes["Fuel Code"] = [fuel_code_options[base_fuel]]
+    base_axes["Prime Mover"] = [prime_mover_options[base_mover]]
+    base_prediction = sweep(loaded_model, base_axes)[PREDICTION_COLUMN].mean()
+    matrix = matrix - base_prediction
+    title = "Change in predicted CO₂ Emissions (Ton) vs. page 1 plant"
+
+fig = go.Figure(go.Heatmap(
+    z=matrix.to_numpy(),
+    x=matrix.columns.astype(str),
+    y=matrix.index.astype(str),
+    colorscale="RdBu_r" if compare_to_base else "Blues",
+    zmid=0 if compare_to_base else None,
+    colorbar=dict(title="Ton"),
+))
+fig.update_layout(
+    title=title,
+    xaxis=dict(title="Prime Mover", type="category"),
+    yaxis=dict(title="Fuel Code", type="category"),
+    margin=dict(l=40, r=40, t=60, b=40)
+)
+st.plotly_chart(fig, use_container_width=True)
+
+# Only a summary is rendered: the full grid can have millions of rows
+with st.expander("Scenario results"):
+    st.write(f"Range of predicted CO₂ Emissions (Ton) per combination, over {len(result):,} grid points")
+    summary = result.groupby(["Fuel Code", "Prime Mover"], observed=True)[PREDICTION_COLUMN].agg(["min", "mean", "max"])
+    st.dataframe(summary, use_container_width=True)
+    st.write("Highest predicted emissions")
+    st.dataframe(top_rows(result), use_container_width=True, hide_index=True)
+
+    # The CSV is written once per grid, and only when asked for
+    if st.session_state.get("what_if_csv_axes") != what_if_axes:
+        if st.button("Prepare CSV download"):
+            st.session_state.what_if_csv_axes = what_if_axes
+            st.rerun()
+    else:
+        with st.spinner("Writing CSV..."):
+            csv_path = sweep_csv(loaded_model, run_axes)
+        with open(csv_path, "rb") as f:
+            st.download_button("Download scenarios (CSV)", f, file_name="co2_what_if.csv", mime="text/csv")
+
+track_session("what_if")
+render_dev_panel()
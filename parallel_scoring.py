@@ -0,0 +1,173 @@
+"""Multi-core batch scoring: chunks are scored in a pool of worker processes.
+
+The parent process reads the input chunk by chunk (batch_scoring.iter_chunks)
+and packs the five feature columns into a shared-memory slot: the numeric
+features as float64, Fuel Code / Prime Mover as small integer codes. A worker,
+which loaded the model once at start-up, only receives the slot name and the
+row count, reads the features in place and writes its predictions back into
+the slot. The parent keeps the chunk itself, attaches the predictions and
+writes chunks out in input order. No DataFrame is pickled between processes.
+
+    python batch_scoring.py plants.parquet predictions.parquet --workers 32
+
+The parent still parses the input on one core; with many workers, Parquet
+input keeps it from becoming the bottleneck.
+"""
+
+import collections
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+from batch_scoring import (DEFAULT_CHUNKSIZE, _is_parquet, _Writer, add_interval_columns, check_feature_columns,
+                           iter_chunks)
+from drift_monitor import observe
+from model_inputs import (CATEGORICAL_FEATURES, FEATURE_COLUMNS, FUEL_CODES, NUMERIC_FEATURES,
+                          PREDICTION_COLUMN, PRIME_MOVERS, numeric_inputs)
+
+# Code vocabularies shared by parent and workers; -1 marks an unknown code
+FUEL_VOCAB = np.array(sorted(FUEL_CODES), dtype=object)
+MOVER_VOCAB = np.array(sorted(PRIME_MOVERS), dtype=object)
+
+_ROW_BYTES = len(NUMERIC_FEATURES) * 8 + 8 + len(CATEGORICAL_FEATURES) * 2
+
+
+class _Slot:
+    # One shared-memory block holding up to ``capacity`` rows:
+    # numeric features (float64), predictions (float64), Fuel Code / Prime Mover codes (int16).
+
+    def __init__(self, capacity, name=None):
+        self.capacity = capacity
+        self.shm = shared_memory.SharedMemory(name=name, create=name is None, size=capacity * _ROW_BYTES)
+        buf = self.shm.buf
+        n_numeric = len(NUMERIC_FEATURES)
+        self.numeric = np.ndarray((capacity, n_numeric), dtype=np.float64, buffer=buf)
+        self.predictions = np.ndarray(capacity, dtype=np.float64, buffer=buf, offset=capacity * n_numeric * 8)
+        self.codes = np.ndarray((capacity, len(CATEGORICAL_FEATURES)), dtype=np.int16, buffer=buf,
+                                offset=capacity * (n_numeric + 1) * 8)
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    def pack(self, chunk):
+        """Copy the features of ``chunk`` into the slot; returns the number of rows that cannot be scored."""
+        n = len(chunk)
+        self.numeric[:n] = numeric_inputs(chunk)
+        self.codes[:n, 0] = pd.Categorical(chunk["Fuel Code"], categories=FUEL_VOCAB).codes
+        self.codes[:n, 1] = pd.Categorical(chunk["Prime Mover"], categories=MOVER_VOCAB).codes
+        return int((~_valid_rows(self.numeric[:n], self.codes[:n])).sum())
+
+    def release(self):
+        # Views into the buffer must go before it can be closed
+        del self.numeric, self.predictions, self.codes
+        self.shm.close()
+
+
+def _valid_rows(numeric, codes):
+    # Known codes and finite numeric inputs, as batch_scoring.score_chunk requires
+    return (codes >= 0).all(axis=1) & np.isfinite(numeric).all(axis=1)
+
+
+# Worker process state: the model (loaded once) and the slots attached so far
+_worker_model = None
+_worker_slots = {}
+
+
+def _init_worker(model_path, compiled):
+    global _worker_model
+    from data_loader import load_compiled_model, load_model
+
+    _worker_model = (load_compiled_model if compiled else load_model)(model_path)
+
+
+def _score_slot(name, capacity, n):
+    slot = _worker_slots.get(name)
+    if slot is None:
+        slot = _worker_slots[name] = _Slot(capacity, name=name)
+
+    codes = slot.codes[:n]
+    valid = _valid_rows(slot.numeric[:n], codes)
+    predictions = slot.predictions[:n]
+    predictions[:] = np.nan
+    if valid.any():
+        numeric = slot.numeric[:n][valid]
+        fuel, mover = FUEL_VOCAB[codes[valid, 0]], MOVER_VOCAB[codes[valid, 1]]
+        if hasattr(_worker_model, "predict_arrays"):
+            predictions[valid] = _worker_model.predict_arrays(numeric, fuel, mover)
+        else:
+            frame = pd.DataFrame(numeric, columns=NUMERIC_FEATURES)
+            frame["Fuel Code"] = fuel
+            frame["Prime Mover"] = mover
+            predictions[valid] = _worker_model.predict(frame[FEATURE_COLUMNS])
+    return n
+
+
+def score_file_parallel(source, sink, workers=None, chunksize=DEFAULT_CHUNKSIZE, model_path=None, compiled=False,
+                        parquet_in=None, parquet_out=None, progress=None, intervals=None):
+    """Like batch_scoring.score_file, with the chunks scored by ``workers`` processes.
+
+    Each worker loads the model from ``model_path`` (the shipped pipeline by
+    default; ``compiled`` uses the NumPy-flattened model). Output rows are in
+    input order. Returns the same stats dict as score_file, plus "workers".
+    """
+    from data_loader import MODEL_PATH
+
+    workers = workers or os.cpu_count() or 1
+    if parquet_out is None:
+        parquet_out = _is_parquet(getattr(sink, "name", sink))
+
+    # Two chunks per worker in flight: one being scored, one packed and queued
+    slots = [_Slot(chunksize) for _ in range(2 * workers)]
+    free = list(slots)
+    pending = collections.deque()   # (chunk, slot, future) in input order
+    writer = _Writer(sink, parquet_out)
+    rows = invalid_rows = 0
+    start = time.perf_counter()
+
+    def write_oldest():
+        nonlocal rows
+        chunk, slot, future = pending.popleft()
+        n = future.result()
+        chunk = chunk.copy()
+        chunk[NUMERIC_FEATURES] = slot.numeric[:n].copy()
+        chunk[PREDICTION_COLUMN] = slot.predictions[:n].copy()
+        observe(chunk[FEATURE_COLUMNS], chunk[PREDICTION_COLUMN].to_numpy(), source="batch")
+        if intervals is not None:
+            add_interval_columns(chunk, chunk[PREDICTION_COLUMN].to_numpy(), intervals)
+        free.append(slot)
+        writer.write(chunk)
+        rows += n
+        if progress is not None:
+            progress(rows)
+
+    try:
+        with ProcessPoolExecutor(workers, initializer=_init_worker,
+                                 initargs=(model_path or MODEL_PATH, compiled)) as pool:
+            for chunk in iter_chunks(source, chunksize, parquet_in):
+                check_feature_columns(chunk)
+                if not free:
+                    write_oldest()
+                slot = free.pop()
+                invalid_rows += slot.pack(chunk)
+                pending.append((chunk, slot, pool.submit(_score_slot, slot.name, slot.capacity, len(chunk))))
+            while pending:
+                write_oldest()
+    finally:
+        writer.close()
+        for slot in slots:
+            slot.release()
+            slot.shm.unlink()
+    seconds = time.perf_counter() - start
+
+    return {
+        "rows": rows,
+        "invalid_rows": invalid_rows,
+        "seconds": seconds,
+        "rows_per_second": rows / seconds if seconds > 0 else float("nan"),
+        "workers": workers,
+    }
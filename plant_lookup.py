@@ -0,0 +1,50 @@
+"""Plant Code -> row range index over the emissions and strategy datasets."""
+
+import numpy as np
+import pandas as pd
+
+PLANT_CODE_COLUMN = "Plant Code"
+
+
+class PlantLookup:
+    """A frame stored grouped by Plant Code, plus the row range of every plant.
+
+    Built once per loaded artifact: Plant Code is converted to the smallest
+    integer dtype that holds it and the rows are stably sorted by it, so all
+    rows of one plant are contiguous and ``rows(code)`` is a binary search
+    plus a slice rather than a scan of the whole frame.
+    """
+
+    def __init__(self, df, column=PLANT_CODE_COLUMN):
+        codes = pd.to_numeric(df[column].astype(np.int64), downcast="integer")
+        order = np.argsort(codes.to_numpy(), kind="stable")
+
+        self.frame = df.iloc[order].reset_index(drop=True)
+        self.frame[column] = codes.to_numpy()[order]
+
+        sorted_codes = self.frame[column].to_numpy()
+        self.codes, self.starts, counts = np.unique(sorted_codes, return_index=True, return_counts=True)
+        self.stops = self.starts + counts
+
+    @classmethod
+    def merge(cls, parts):
+        """Lookup over the rows of all ``parts`` (e.g. one per year partition)."""
+        if len(parts) == 1:
+            return parts[0]
+        return cls(pd.concat([part.frame for part in parts], ignore_index=True))
+
+    def __contains__(self, plant_code):
+        i = np.searchsorted(self.codes, plant_code)
+        return i < len(self.codes) and self.codes[i] == plant_code
+
+    def row_range(self, plant_code):
+        """(start, stop) positions of the plant's rows in ``frame``; (0, 0) if unknown."""
+        i = np.searchsorted(self.codes, int(plant_code))
+        if i < len(self.codes) and self.codes[i] == int(plant_code):
+            return int(self.starts[i]), int(self.stops[i])
+        return 0, 0
+
+    def rows(self, plant_code):
+        """All rows of one plant, in their original order."""
+        start, stop = self.row_range(plant_code)
+        return self.frame.iloc[start:stop]
@@ -0,0 +1,58 @@
+"""k-nearest-neighbour search for plants comparable to the predicted one.
+
+Plants are compared on emissions and generation together (log scale, since both
+are heavy-tailed, then standardized), optionally also on fuel code and prime
+mover (one-hot, scaled by ``code_weight``). The KD-tree is built once per
+loaded emissions artifact, so a query costs O(log n) whatever the window.
+"""
+
+import numpy as np
+from sklearn.neighbors import KDTree
+
+EMISSIONS_COLUMN = "Tons of CO2 Emissions"
+GENERATION_COLUMN = "Generation (kWh)"
+CODE_COLUMNS = ["Fuel Code", "Prime Mover"]
+
+
+def _log(values):
+    # Signed log: generation can be negative for plants that consume more than they produce
+    values = np.asarray(values, dtype=np.float64)
+    return np.sign(values) * np.log1p(np.abs(values))
+
+
+class PlantNeighbors:
+    """KD-tree over the normalized features of every row of the emissions data."""
+
+    def __init__(self, df, use_codes=False, code_weight=1.0, leaf_size=40):
+        numeric = np.column_stack([_log(df[EMISSIONS_COLUMN]), _log(df[GENERATION_COLUMN])])
+        self.mean = numeric.mean(axis=0)
+        self.std = numeric.std(axis=0)
+        self.std[self.std == 0] = 1.0
+        features = [(numeric - self.mean) / self.std]
+
+        self.use_codes = use_codes
+        self.code_weight = code_weight
+        self.levels = {}
+        if use_codes:
+            for col in CODE_COLUMNS:
+                values = df[col].astype(str).to_numpy()
+                self.levels[col] = np.unique(values)
+                one_hot = values[:, None] == self.levels[col][None, :]
+                features.append(one_hot * code_weight)
+
+        self.tree = KDTree(np.hstack(features), leaf_size=leaf_size)
+
+    def _query_point(self, emissions, generation, fuel_code, prime_mover):
+        point = [(np.array([_log(emissions), _log(generation)]) - self.mean) / self.std]
+        if self.use_codes:
+            for col, code in zip(CODE_COLUMNS, (fuel_code, prime_mover)):
+                point.append((self.levels[col] == str(code)) * self.code_weight)
+        return np.hstack(point)[None, :]
+
+    def query(self, emissions, generation, k=10, fuel_code=None, prime_mover=None):
+        """Row positions of the ``k`` most similar plants and their distances (nearest first)."""
+        k = min(k, self.tree.data.shape[0])
+        distances, positions = self.tree.query(
+            self._query_point(emissions, generation, fuel_code, prime_mover), k=k
+        )
+        return positions[0], distances[0]
@@ -0,0 +1,200 @@
+"""LRU cache of model predictions, keyed on the normalized five model inputs.
+
+The cache is tied to the content hash of the model artifact: when
+trained_pipe_co2.sav changes, every cached prediction (in memory and on disk)
+is dropped. Optionally the cache is persisted to a local SQLite file, so
+predictions survive restarts; set CO2_PREDICTION_CACHE_DB to enable that for
+the app.
+"""
+
+import collections
+import hashlib
+import os
+import sqlite3
+import threading
+
+import numpy as np
+import pandas as pd
+
+from model_inputs import FEATURE_COLUMNS
+
+DEFAULT_MAXSIZE = 10_000
+
+_hashes = {}  # path -> (mtime_ns, sha256)
+
+
+def artifact_hash(path):
+    """SHA-256 of a file, recomputed only when its mtime changes."""
+    path = os.path.abspath(path)
+    mtime = os.stat(path).st_mtime_ns
+    cached = _hashes.get(path)
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    _hashes[path] = (mtime, digest.hexdigest())
+    return _hashes[path][1]
+
+
+def normalize_key(fuel_elec_gen, total_fuel, generation, fuel_code, prime_mover):
+    """Cache key for one plant: rounded floats and upper-case codes."""
+    return (
+        round(float(fuel_elec_gen), 6),
+        round(float(total_fuel), 6),
+        round(float(generation), 6),
+        str(fuel_code).strip().upper(),
+        str(prime_mover).strip().upper(),
+    )
+
+
+class _SQLiteStore:
+    # Persistent side of the cache; one row per (model hash, key).
+
+    def __init__(self, path):
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS predictions (
+                model_hash TEXT, fuel_elec_gen REAL, total_fuel REAL, generation REAL,
+                fuel_code TEXT, prime_mover TEXT, prediction REAL,
+                PRIMARY KEY (model_hash, fuel_elec_gen, total_fuel, generation, fuel_code, prime_mover)
+            )""")
+        self.conn.commit()
+
+    def get(self, model_hash, key):
+        row = self.conn.execute(
+            "SELECT prediction FROM predictions WHERE model_hash = ? AND fuel_elec_gen = ? AND total_fuel = ? "
+            "AND generation = ? AND fuel_code = ? AND prime_mover = ?", (model_hash,) + key
+        ).fetchone()
+        return None if row is None else row[0]
+
+    def put_many(self, model_hash, items):
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO predictions VALUES (?, ?, ?, ?, ?, ?, ?)",
+            [(model_hash,) + key + (value,) for key, value in items],
+        )
+        self.conn.commit()
+
+    def drop_other_models(self, model_hash):
+        self.conn.execute("DELETE FROM predictions WHERE model_hash != ?", (model_hash,))
+        self.conn.commit()
+
+
+class PredictionCache:
+    """Wraps the model artifact at ``model_path`` with a bounded LRU prediction cache.
+
+    ``predict(frame)`` takes the same input frame as the pipeline and only sends
+    rows it has not seen before to the model, in one ``predict`` call.
+    """
+
+    def __init__(self, model_path=None, maxsize=DEFAULT_MAXSIZE, db_path=None):
+        from data_loader import MODEL_PATH
+
+        self.model_path = model_path or MODEL_PATH
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = collections.OrderedDict()
+        self._model_hash = None
+        self._store = _SQLiteStore(db_path) if db_path else None
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _check_model(self):
+        # Called with the lock held: drop everything if the artifact changed
+        from model_registry import model_hash as get_model_hash
+
+        model_hash = get_model_hash(self.model_path)
+        if model_hash != self._model_hash:
+            self._entries.clear()
+            if self._store is not None:
+                self._store.drop_other_models(model_hash)
+            self._model_hash = model_hash
+        return model_hash
+
+    def _get(self, model_hash, key):
+        if key in self._entries:
+            self._entries.move_to_end(key)
+            return self._entries[key]
+        if self._store is not None:
+            value = self._store.get(model_hash, key)
+            if value is not None:
+                self._put(key, value)
+            return value
+        return None
+
+    def _put(self, key, value):
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def predict(self, frame):
+        from data_loader import load_model
+
+        keys = [normalize_key(*row) for row in frame[FEATURE_COLUMNS].itertuples(index=False, name=None)]
+        predictions = np.empty(len(keys))
+
+        with self._lock:
+            model_hash = self._check_model()
+            missing = []
+            for i, key in enumerate(keys):
+                value = self._get(model_hash, key)
+                if value is None:
+                    missing.append(i)
+                else:
+                    predictions[i] = value
+            self.hits += len(keys) - len(missing)
+            self.misses += len(missing)
+
+        if missing:
+            # Score exactly what the key stands for, so the cached value is right for every input
+            # that normalizes to it (" ng " and "NG" alike)
+            normalized = pd.DataFrame([keys[i] for i in missing], columns=FEATURE_COLUMNS)
+            scored = load_model(self.model_path).predict(normalized)
+            predictions[missing] = scored
+            new_items = [(keys[i], float(value)) for i, value in zip(missing, scored)]
+            with self._lock:
+                for key, value in new_items:
+                    self._put(key, value)
+                if self._store is not None:
+                    self._store.put_many(model_hash, new_items)
+
+        return predictions
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "entries": len(self._entries),
+            "maxsize": self.maxsize,
+            "persistent": self._store is not None,
+        }
+
+
+_shared = {}
+_shared_lock = threading.Lock()
+
+
+def get_prediction_cache(model_path=None, maxsize=DEFAULT_MAXSIZE, db_path=None):
+    """Process-wide PredictionCache for ``model_path``, shared by all sessions.
+
+    ``db_path`` defaults to the CO2_PREDICTION_CACHE_DB environment variable
+    (no persistence if unset).
+    """
+    from data_loader import MODEL_PATH
+
+    model_path = os.path.abspath(model_path or MODEL_PATH)
+    if db_path is None:
+        db_path = os.environ.get("CO2_PREDICTION_CACHE_DB") or None
+
+    with _shared_lock:
+        if model_path not in _shared:
+            _shared[model_path] = PredictionCache(model_path, maxsize, db_path)
+        return _shared[model_path]
@@ -0,0 +1,138 @@
+"""Split-conformal prediction intervals for the CO₂ pipeline.
+
+Emissions span six orders of magnitude, so a fixed ± band would be useless for
+small plants and too tight for large ones. The intervals are normalized: on a
+calibration set (rows the model was not trained on, ideally a newer EIA
+release) the score of each row is
+
+    |actual - predicted| / max(|predicted|, floor)
+
+and the interval of a new prediction is ``predicted ± q * max(|predicted|, floor)``,
+with q the conformal quantile of the scores for the requested coverage. It is
+computed from the point predictions with two array operations, so
+``predict_interval`` costs one ``predict`` call, whatever the number of rows.
+
+    python prediction_intervals.py --data eia923_2024.parquet --level 0.9
+
+writes model_pickle/intervals_co2.json, tied to the hash of the model artifact
+(train_model.py writes it from the plants it held out). Without it (or after
+the model changes) data_loader.load_intervals calibrates on the shipped
+emissions data, which the model was trained on: such intervals have
+``held_out`` False, the prediction page labels them as an in-sample range and
+the benchmarking page keeps the ± slider as its default window.
+"""
+
+import argparse
+import json
+import math
+import os
+
+import numpy as np
+import pandas as pd
+
+from model_inputs import FEATURE_COLUMNS, invalid_code_mask
+
+CALIBRATION_FILE = "intervals_co2.json"
+DEFAULT_LEVEL = 0.9
+TARGET_COLUMN = "Tons of CO2 Emissions"
+IN_SAMPLE_SOURCE = "shipped emissions data"
+
+# Columns added by batch scoring next to model_inputs.PREDICTION_COLUMN
+LOWER_COLUMN = "Predicted Tons of CO2 Emissions (lower bound)"
+UPPER_COLUMN = "Predicted Tons of CO2 Emissions (upper bound)"
+
+
+class ConformalIntervals:
+    """Normalized conformal interval: ``prediction ± quantile * max(|prediction|, floor)``."""
+
+    def __init__(self, level, quantile, floor, rows=0, model_hash=None, source=None, held_out=True):
+        self.level = level
+        self.quantile = quantile
+        self.floor = floor
+        self.rows = rows
+        self.model_hash = model_hash
+        self.source = source
+        # False when calibrated on rows the model was trained on: no coverage guarantee
+        self.held_out = held_out
+
+    @classmethod
+    def fit(cls, actual, predicted, level=DEFAULT_LEVEL, **meta):
+        actual = np.asarray(actual, dtype=float)
+        predicted = np.asarray(predicted, dtype=float)
+        floor = float(np.median(np.abs(actual)))
+        scores = np.sort(np.abs(actual - predicted) / np.maximum(np.abs(predicted), floor))
+        # Finite-sample conformal quantile: the ceil((n + 1) * level)-th smallest score
+        rank = min(math.ceil((len(scores) + 1) * level), len(scores)) - 1
+        return cls(level, float(scores[rank]), floor, rows=len(scores), **meta)
+
+    def bounds(self, predictions):
+        """(lower, upper) arrays for an array of point predictions; emissions are never negative.
+
+        Both bounds are clipped at 0, so lower <= upper also for negative predictions.
+        """
+        predictions = np.asarray(predictions, dtype=float)
+        half_width = self.quantile * np.maximum(np.abs(predictions), self.floor)
+        return np.maximum(predictions - half_width, 0.0), np.maximum(predictions + half_width, 0.0)
+
+    def predict_interval(self, model, frame):
+        """(prediction, lower, upper) for every row of ``frame`` from a single ``predict`` call."""
+        predictions = np.asarray(model.predict(frame), dtype=float)
+        return (predictions,) + self.bounds(predictions)
+
+    def to_dict(self):
+        return {"level": self.level, "quantile": self.quantile, "floor": self.floor, "rows": self.rows,
+                "model_hash": self.model_hash, "source": self.source, "held_out": self.held_out}
+
+    @classmethod
+    def from_dict(cls, data):
+        data = dict(data)
+        # Files written before "held_out" existed: only the shipped data was in-sample
+        data.setdefault("held_out", data.get("source") != IN_SAMPLE_SOURCE)
+        return cls(**data)
+
+
+def calibrate(model, frame, level=DEFAULT_LEVEL, **meta):
+    """Fit intervals on the rows of ``frame`` (features + actual emissions) the model can score."""
+    usable = frame[frame[TARGET_COLUMN].notna() & ~invalid_code_mask(frame)]
+    if usable.empty:
+        raise ValueError("No rows with known codes and actual emissions to calibrate on")
+    predicted = model.predict(usable[FEATURE_COLUMNS])
+    return ConformalIntervals.fit(usable[TARGET_COLUMN], predicted, level, **meta)
+
+
+def _read_table(path):
+    if path.lower().endswith((".parquet", ".pq")):
+        return pd.read_parquet(path)
+    if path.lower().endswith(".feather"):
+        return pd.read_feather(path)
+    return pd.read_csv(path)
+
+
+def main(argv=None):
+    import data_loader
+    from model_registry import model_hash
+
+    parser = argparse.ArgumentParser(description="Calibrate conformal prediction intervals for the CO₂ model.")
+    parser.add_argument("--data", default=None,
+                        help="Held-out CSV/Parquet/Feather with the model features and actual emissions "
+                             "(default: the shipped emissions data)")
+    parser.add_argument("--level", type=float, default=DEFAULT_LEVEL, help="Target coverage, e.g. 0.9")
+    parser.add_argument("--model", default=data_loader.MODEL_PATH)
+    parser.add_argument("--output", default=None,
+                        help=f"Where to write the calibration (default: {CALIBRATION_FILE} of the model, "
+                             "see data_loader.model_side_path)")
+    args = parser.parse_args(argv)
+    args.output = args.output or data_loader.model_side_path(args.model, CALIBRATION_FILE)
+
+    frame = _read_table(args.data) if args.data else data_loader.load_emissions()
+    intervals = calibrate(data_loader.load_model(args.model), frame, args.level,
+                          model_hash=model_hash(args.model), held_out=bool(args.data),
+                          source=os.path.basename(args.data) if args.data else IN_SAMPLE_SOURCE)
+    with open(args.output, "w") as f:
+        json.dump(intervals.to_dict(), f, indent=2)
+    print(f"{intervals.level:.0%} interval: prediction ± {intervals.quantile:.3f} x max(|prediction|, "
+          f"{intervals.floor:,.0f} t), calibrated on {intervals.rows:,} rows -> {args.output}")
+
+
+if __name__ == "__main__":
+    main()
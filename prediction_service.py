@@ -0,0 +1,257 @@
+"""Local HTTP/JSON prediction service for the CO₂ pipeline.
+
+Loads the same pipeline as the prediction page once, and combines concurrent
+single-plant requests that arrive within a short window into one ``predict``
+call. Runs on Tornado, which ships with Streamlit.
+
+    python prediction_service.py --port 8600 --window-ms 5
+
+Endpoints:
+
+    POST /predict   one plant (JSON object) or several (JSON list), keyed by the
+                    model feature names, e.g.
+                    {"Fuel Consumption for Electric Generation (MMBtu)": 914423,
+                     "Total Fuel Consumption (MMBtu)": 914423,
+                     "Generation (kWh)": 48678001,
+                     "Fuel Code": "NG", "Prime Mover": "GT"}
+    GET  /health    model status, queue size and latency percentiles
+"""
+
+import argparse
+import asyncio
+import collections
+import json
+import math
+import time
+
+import numpy as np
+import pandas as pd
+import tornado.web
+
+from drift_monitor import observe
+from model_inputs import FEATURE_COLUMNS, FUEL_CODES, PRIME_MOVERS, NUMERIC_FEATURES
+
+DEFAULT_WINDOW_MS = 5.0
+DEFAULT_MAX_BATCH = 512
+
+
+def parse_plant(payload):
+    """Validate one JSON plant record and return it as a dict of model features."""
+    if not isinstance(payload, dict):
+        raise ValueError("Each plant must be a JSON object")
+    missing = [col for col in FEATURE_COLUMNS if col not in payload]
+    if missing:
+        raise ValueError(f"Missing fields: {missing}")
+
+    plant = {}
+    for col in NUMERIC_FEATURES:
+        try:
+            plant[col] = float(payload[col])
+        except (TypeError, ValueError):
+            raise ValueError(f"'{col}' must be a number") from None
+        if not math.isfinite(plant[col]):
+            raise ValueError(f"'{col}' must be a finite number")
+    if payload["Fuel Code"] not in FUEL_CODES:
+        raise ValueError(f"Unknown Fuel Code: {payload['Fuel Code']!r}")
+    if payload["Prime Mover"] not in PRIME_MOVERS:
+        raise ValueError(f"Unknown Prime Mover: {payload['Prime Mover']!r}")
+    plant["Fuel Code"] = payload["Fuel Code"]
+    plant["Prime Mover"] = payload["Prime Mover"]
+    return plant
+
+
+class LatencyTracker:
+    # Rolling window of request latencies in milliseconds.
+
+    def __init__(self, size=10_000):
+        self._samples = collections.deque(maxlen=size)
+        self.count = 0
+
+    def add(self, ms):
+        self._samples.append(ms)
+        self.count += 1
+
+    def percentiles(self):
+        if not self._samples:
+            return {}
+        p50, p95, p99 = np.percentile(np.fromiter(self._samples, float), [50, 95, 99])
+        return {"p50": p50, "p95": p95, "p99": p99}
+
+
+class MicroBatcher:
+    """Queue single plants and score whatever arrives within ``window_ms`` in one ``predict`` call."""
+
+    def __init__(self, model, window_ms=DEFAULT_WINDOW_MS, max_batch=DEFAULT_MAX_BATCH):
+        self.model = model
+        self.window = window_ms / 1000
+        self.max_batch = max_batch
+        self.queue = asyncio.Queue()
+        self.batches = 0
+        self.rows = 0
+        self._task = None
+
+    def start(self):
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def predict(self, plant):
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((plant, future))
+        return await future
+
+    def _score(self, frame):
+        predictions = self.model.predict(frame)
+        observe(frame, predictions, source="service")
+        return predictions
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            deadline = loop.time() + self.window
+            while len(batch) < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            frame = pd.DataFrame([plant for plant, _ in batch], columns=FEATURE_COLUMNS)
+            try:
+                # predict is CPU bound; keep the event loop free to accept requests
+                predictions = await loop.run_in_executor(None, self._score, frame)
+            except Exception:
+                # One bad row must not fail the requests it was batched with: score them one by one
+                await loop.run_in_executor(None, self._score_rows, batch, frame)
+                continue
+
+            self.batches += 1
+            self.rows += len(batch)
+            for (_, future), value in zip(batch, predictions):
+                if not future.done():
+                    future.set_result(float(value))
+
+    def _score_rows(self, batch, frame):
+        for i, (_, future) in enumerate(batch):
+            try:
+                value = float(self._score(frame.iloc[[i]])[0])
+            except Exception as e:
+                result = (future.set_exception, e)
+            else:
+                self.rows += 1
+                result = (future.set_result, value)
+            # Futures belong to the event loop thread
+            future.get_loop().call_soon_threadsafe(self._resolve, future, *result)
+
+    @staticmethod
+    def _resolve(future, setter, value):
+        if not future.done():
+            setter(value)
+
+
+class PredictHandler(tornado.web.RequestHandler):
+
+    def initialize(self, batcher, latency):
+        self.batcher = batcher
+        self.latency = latency
+
+    async def post(self):
+        start = time.perf_counter()
+        try:
+            payload = json.loads(self.request.body)
+            single = isinstance(payload, dict)
+            plants = [parse_plant(p) for p in ([payload] if single else payload)]
+        except (ValueError, TypeError) as e:
+            self.set_status(400)
+            self.write({"error": str(e)})
+            return
+
+        try:
+            predictions = await asyncio.gather(*(self.batcher.predict(p) for p in plants))
+        except ValueError as e:
+            # Input the model rejects despite passing parse_plant
+            self.set_status(400)
+            self.write({"error": str(e)})
+            return
+        except Exception as e:
+            self.set_status(500)
+            self.write({"error": f"Prediction failed: {e}"})
+            return
+        self.latency.add((time.perf_counter() - start) * 1000)
+
+        if single:
+            self.write({"prediction": predictions[0]})
+        else:
+            self.write({"predictions": predictions})
+
+
+class HealthHandler(tornado.web.RequestHandler):
+
+    def initialize(self, batcher, latency):
+        self.batcher = batcher
+        self.latency = latency
+
+    def get(self):
+        health = {
+            "status": "ok",
+            "model": type(self.batcher.model).__name__,
+            "queue_size": self.batcher.queue.qsize(),
+            "requests": self.latency.count,
+            "batches": self.batcher.batches,
+            "rows": self.batcher.rows,
+            "latency_ms": self.latency.percentiles(),
+        }
+        if hasattr(self.batcher.model, "stats"):
+            health["cache"] = self.batcher.model.stats()
+        self.write(health)
+
+
+def make_app(model, window_ms=DEFAULT_WINDOW_MS, max_batch=DEFAULT_MAX_BATCH):
+    batcher = MicroBatcher(model, window_ms, max_batch)
+    handler_args = {"batcher": batcher, "latency": LatencyTracker()}
+    app = tornado.web.Application([
+        (r"/predict", PredictHandler, handler_args),
+        (r"/health", HealthHandler, handler_args),
+    ])
+    app.batcher = batcher
+    return app
+
+
+async def serve(model, host, port, window_ms, max_batch):
+    app = make_app(model, window_ms, max_batch)
+    app.batcher.start()
+    app.listen(port, address=host)
+    print(f"CO₂ prediction service listening on http://{host}:{port}")
+    await asyncio.Event().wait()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve CO₂ predictions over HTTP/JSON.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8600)
+    parser.add_argument("--window-ms", type=float, default=DEFAULT_WINDOW_MS,
+                        help="How long to wait for more requests before calling predict")
+    parser.add_argument("--max-batch", type=int, default=DEFAULT_MAX_BATCH)
+    parser.add_argument("--model", default=None, help="Path to the trained pipeline (default: model_pickle/)")
+    parser.add_argument("--cache", action="store_true", help="Serve repeated inputs from a prediction cache")
+    parser.add_argument("--cache-db", default=None, help="SQLite file to persist the prediction cache (implies --cache)")
+    parser.add_argument("--compiled", action="store_true",
+                        help="Predict with the pipeline flattened to NumPy (see compiled_model.py)")
+    args = parser.parse_args(argv)
+
+    from data_loader import MODEL_PATH, load_compiled_model, load_model
+
+    if args.compiled:
+        model = load_compiled_model(args.model or MODEL_PATH)
+    elif args.cache or args.cache_db:
+        from prediction_cache import PredictionCache
+
+        model = PredictionCache(args.model or MODEL_PATH, db_path=args.cache_db)
+    else:
+        model = load_model(args.model or MODEL_PATH)
+    asyncio.run(serve(model, args.host, args.port, args.window_ms, args.max_batch))
+
+
+if __name__ == "__main__":
+    main()
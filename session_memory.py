@@ -0,0 +1,171 @@
+"""Per-session memory accounting and eviction for multi-user deployments.
+
+The datasets, indexes and model live once per process (data_loader's cache;
+pages get copy-on-write views), so a session should only hold the page inputs
+(scalars), small tuples and row indices. Each page calls ``track_session`` at
+the end of a rerun, which
+
+- measures the session's st.session_state and records it in a process-wide
+  registry (shown in the developer panel, see instrumentation.render_dev_panel);
+- enforces a per-session budget (CO2_SESSION_MAX_MB, default 5 MB): the largest
+  keys that are not page inputs are dropped until the session fits; pages
+  recompute what they need from the shared caches;
+- forgets registry entries of sessions idle for more than
+  CO2_SESSION_IDLE_SECONDS (default 30 min). The state of sessions whose
+  browser disconnected is released by Streamlit after
+  server.disconnectedSessionTTL (see .streamlit/config.toml).
+
+``python load_test.py`` measures the RSS growth per simulated session.
+"""
+
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+MAX_SESSION_BYTES = int(float(os.environ.get("CO2_SESSION_MAX_MB", 5)) * 1e6)
+IDLE_SESSION_SECONDS = float(os.environ.get("CO2_SESSION_IDLE_SECONDS", 1800))
+
+# Page inputs shared between pages; never evicted
+PROTECTED_KEYS = frozenset({
+    "co2_prediction", "co2_interval", "co2_interval_held_out", "Gen", "FuComElGen", "ToFuCom", "FuCod", "PriMov",
+    "selected_plant", "range_percent_emiss", "match_mode",
+})
+
+_sessions = {}   # session id -> {"page", "last_seen", "bytes", "keys", "evicted"}
+_sessions_lock = threading.Lock()
+
+
+def estimate_bytes(obj, _seen=None):
+    """Approximate memory held by ``obj`` (deep for frames, arrays and containers)."""
+    if _seen is None:
+        _seen = set()
+    if id(obj) in _seen:
+        return 0
+    _seen.add(id(obj))
+
+    if isinstance(obj, (pd.DataFrame, pd.Series, pd.Index)):
+        usage = obj.memory_usage(deep=True)
+        return int(usage.sum() if isinstance(obj, pd.DataFrame) else usage)
+    if isinstance(obj, np.ndarray):
+        # A view only holds its own header; the buffer belongs to the base array
+        return obj.nbytes if obj.base is None else sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        return sys.getsizeof(obj) + sum(estimate_bytes(k, _seen) + estimate_bytes(v, _seen)
+                                        for k, v in obj.items())
+    if isinstance(obj, (list, tuple, set, frozenset)):
+        return sys.getsizeof(obj) + sum(estimate_bytes(item, _seen) for item in obj)
+    if hasattr(obj, "to_plotly_json"):
+        # Plotly figures: the trace data dominates
+        return sys.getsizeof(obj) + estimate_bytes(obj.to_plotly_json(), _seen)
+    return sys.getsizeof(obj)
+
+
+def session_report(state):
+    """[(key, type name, bytes)] for a session state, largest first."""
+    rows = [(key, type(state[key]).__name__, estimate_bytes(state[key])) for key in list(state.keys())]
+    return sorted(rows, key=lambda row: row[2], reverse=True)
+
+
+def enforce_budget(state, budget=MAX_SESSION_BYTES, report=None):
+    """Drop the largest non-protected keys until ``state`` fits ``budget``; returns the dropped keys."""
+    report = session_report(state) if report is None else report
+    total = sum(row[2] for row in report)
+    evicted = []
+    for key, _, size in report:
+        if total <= budget:
+            break
+        if key in PROTECTED_KEYS:
+            continue
+        del state[key]
+        total -= size
+        evicted.append(key)
+    return evicted
+
+
+def process_rss():
+    """Resident set size of this process in bytes (None where it cannot be read)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        import resource
+
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+    except ImportError:
+        return None
+
+
+def _session_id():
+    from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+    ctx = get_script_run_ctx()
+    return None if ctx is None else ctx.session_id
+
+
+def track_session(page):
+    """Measure and bound the current session at the end of a rerun of ``page``."""
+    import streamlit as st
+
+    session_id = _session_id()
+    if session_id is None:
+        return
+
+    report = session_report(st.session_state)
+    evicted = enforce_budget(st.session_state, report=report)
+    if evicted:
+        report = session_report(st.session_state)
+
+    now = time.time()
+    with _sessions_lock:
+        previous = _sessions.get(session_id, {})
+        _sessions[session_id] = {
+            "page": page,
+            "last_seen": now,
+            "bytes": sum(row[2] for row in report),
+            "keys": len(report),
+            "evicted": previous.get("evicted", 0) + len(evicted),
+        }
+        for sid in [sid for sid, entry in _sessions.items() if now - entry["last_seen"] > IDLE_SESSION_SECONDS]:
+            del _sessions[sid]
+
+
+def sessions_summary():
+    """Registry snapshot: {"sessions", "session_bytes", "rss_bytes", "per_session"}."""
+    with _sessions_lock:
+        per_session = {sid: dict(entry) for sid, entry in _sessions.items()}
+    return {
+        "sessions": len(per_session),
+        "session_bytes": sum(entry["bytes"] for entry in per_session.values()),
+        "rss_bytes": process_rss(),
+        "per_session": per_session,
+    }
+
+
+def render_session_report(st):
+    """Developer-panel section: this session's keys and the process-wide session totals."""
+    with st.sidebar.expander("🧠 Developer: session memory"):
+        report = session_report(st.session_state)
+        st.markdown(f"**This session**: {sum(row[2] for row in report) / 1e3:,.1f} kB "
+                    f"(budget {MAX_SESSION_BYTES / 1e6:,.0f} MB)")
+        for key, type_name, size in report[:10]:
+            st.markdown(f"- `{key}` ({type_name}): {size / 1e3:,.1f} kB")
+
+        summary = sessions_summary()
+        rss = summary["rss_bytes"]
+        st.markdown(f"**Process**: {summary['sessions']} active session(s), "
+                    f"{summary['session_bytes'] / 1e6:,.2f} MB of session state"
+                    + (f", RSS {rss / 1e6:,.0f} MB" if rss else ""))
+        from what_if import CACHED_SWEEP_BYTES, cached_sweep_bytes
+
+        st.markdown(f"What-if grids cached: {cached_sweep_bytes() / 1e6:,.1f} MB "
+                    f"(budget {CACHED_SWEEP_BYTES / 1e6:,.0f} MB)")
+        evicted = sum(entry["evicted"] for entry in summary["per_session"].values())
+        if evicted:
+            st.markdown(f"{evicted} key(s) evicted to keep sessions within budget")
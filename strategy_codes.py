@@ -0,0 +1,184 @@
+"""EIA code dictionaries for the emissions-strategy data and a column-wise decoder.
+
+Each strategy column holds a handful of distinct codes repeated over thousands of
+boilers, so decoding works on the categories of a column: every distinct code is
+looked up once and the labels are broadcast back through the category codes.
+"""
+
+import numpy as np
+import pandas as pd
+
+# Diccionarios ordenados alfabéticamente
+
+boiler_status = {
+    "CN": "Cancelled (previously reported as 'planned')",
+    "CO": "New unit under construction",
+    "OP": "Operating (in commercial service or out of service < 365 days)",
+    "OS": "Out of service (365 days or longer)",
+    "PL": "Planned (expected to go into service within 10 years)",
+    "RE": "Retired",
+    "SB": "Standby (inactive reserve)",
+    "SC": "Cold Standby (requires 3 to 6 months to reactivate)",
+    "TS": "Operating under test conditions"
+}
+
+type_boilers = {
+    "D":  "Standards of Performance for fossil-fuel fired steam boilers for which construction began after August 17, 1971.",
+    "Da": "Standards of Performance for fossil-fuel fired steam boilers for which construction began after September 18, 1978.",
+    "Db": "Standards of Performance for fossil-fuel fired steam boilers for which construction began after June 19, 1984.",
+    "Dc": "Standards of Performance for small industrial-commercial-institutional steam generating units.",
+    "N":  "Not covered under New Source Performance Standards."
+}
+
+regulation_sulfur_nitrogen_particulate = {"FD": "Federal",
+"ST" : "State level",
+"LO": "Local",
+'XX': "Unvavailable or Unknown"}
+
+so2_control_strategy_1 = {
+    "CF": "Fluidized Bed Combustor",
+    "IF": "Use flue gas desulfurization unit or other SO₂ control process",
+    "NA": "Not applicable",
+    "ND": "Not determined at this time",
+    "NP": "No plans to control",
+    "OT": "Other (specify in Schedule 7)",
+    "SE": "Seeking revision of government regulation",
+    "SS": "Switch to lower sulfur fuel",
+    "WA": "Allocated allowances and purchase allowances"
+}
+
+nox_control_strategy_1 = {
+    "AA": "Advanced overfire air",
+    "BF": "Biased firing (alternative burners)",
+    "BO": "Burner out of service",
+    "CF": "Fluidized bed combustor",
+    "FR": "Flue gas recirculation",
+    "FU": "Fuel reburning",
+    "H2O": "Water injection",
+    "LA": "Low excess air",
+    "LN": "Low NOx burner",
+    "MS": "Currently meeting standard",
+    "NA": "Not applicable",
+    "NC": "No change in historic operation of unit anticipated",
+    "ND": "Not determined at this time",
+    "NH3": "Ammonia injection",
+    "NP": "No plans to control",
+    "OT": "Other (unspecified or see Schedule 7)",
+    "OV": "Overfire air",
+    "RP": "Repower unit",
+    "SC": "Slagging",
+    "SE": "Seeking revision of government regulation",
+    "SN": "Selective noncatalytic reduction (SNCR)",
+    "SR": "Selective catalytic reduction (SCR)",
+    "STM": "Steam injection",
+    "UE": "Decrease utilization – rely on energy conservation and/or improved efficiency"
+}
+
+mercury_control_strategy_1 = {
+    "ACI": "Activated carbon injection system",
+    "BP": "Baghouse (fabric filter), pulse",
+    "BR": "Baghouse (fabric filter), reverse air",
+    "BS": "Baghouse (fabric filter), shake and deflate",
+    "CD": "Circulating dry scrubber",
+    "DSI": "Dry sorbent (powder) injection type",
+    "EC": "Electrostatic precipitator, cold side, with flue gas conditioning",
+    "EH": "Electrostatic precipitator, hot side, with flue gas conditioning",
+    "EK": "Electrostatic precipitator, cold side, without flue gas conditioning",
+    "EW": "Electrostatic precipitator, hot side, without flue gas conditioning",
+    "FP": "Fabric filter with powdered activated carbon",
+    "HGP": "High gradient magnetic separation",
+    "JB": "Jet bubbling reactor (wet) scrubber",
+    "LIJ": "Lime injection",
+    "MA": "Mechanically aided type (wet) scrubber",
+    "MS": "Currently meeting standard",
+    "MW": "Mercury wet scrubber",
+    "NA": "Not applicable",
+    "ND": "Not determined at this time",
+    "OT": "Other (specify in SCHEDULE 7)",
+    "PA": "Packed type (wet) scrubber",
+    "RA": "Regenerative activated coke technology",
+    "RB": "Rotating belt filter",
+    "SD": "Spray dryer type / dry FGD / semi-dry FGD",
+    "SP": "Spray type (wet) scrubber",
+    "TR": "Tray type (wet) scrubber",
+    "VE": "Venturi type (wet) scrubber"
+}
+
+steam_plant_type = {
+    1: "Plants with combustible-fueled steam-electric generators ≥ 100 MW capacity (including combined cycle steam-electric with duct firing).",
+    2: "Plants with combustible-fueled steam-electric generators ≥ 10 MW but < 100 MW capacity (including combined cycle steam-electric with duct firing).",
+    3: "Plants with nuclear fueled, combined cycle steam-electric without duct firing, solar thermal electric with steam cycle ≥ 100 MW.",
+    4: "Plants with non-steam fueled electric generators (wind, PV, geothermal, fuel cell, combustion turbines, IC engines, etc.)."
+}
+
+additional_info = {
+    "State": "United States of America states where the plant is located.",
+    "Boiler ID": "Unique identifier of boilers within a plant."
+}
+
+# Fields and dictionaries to decode
+decode_map = {
+    "Boiler Status": boiler_status,
+    "Type of Boiler": type_boilers,
+    "Regulation Sulfur": regulation_sulfur_nitrogen_particulate,
+    "Sulfur Dioxide Control Existing Strategy 1": so2_control_strategy_1,
+    "Sulfur Dioxide Control Proposed Strategy 1": so2_control_strategy_1,
+    "Regulation Nitrogen": regulation_sulfur_nitrogen_particulate,
+    "Nitrogen Oxide Control Existing Strategy 1": nox_control_strategy_1,
+    "Nitrogen Oxide Control Proposed Strategy 1": nox_control_strategy_1,
+    "Regulation Particulate": regulation_sulfur_nitrogen_particulate,
+    "Regulation Mercury": regulation_sulfur_nitrogen_particulate,
+    "Mercury Control Existing Strategy 1": mercury_control_strategy_1,
+    "Mercury Control Proposed Strategy 1": mercury_control_strategy_1,
+    "Steam Plant Type": steam_plant_type
+}
+
+# Columns carried over unchanged into the decoded frame
+ID_COLUMNS = ["Plant Code", "Plant Name", "State", "Boiler ID"]
+
+NOT_AVAILABLE = "NA – Not Available"
+
+
+def decode_column(values, mapping):
+    """Decode a column of codes into "<code> – <meaning>" labels.
+
+    Missing or empty values become "NA – Not Available" and codes that are not
+    in ``mapping`` "<code> – Unknown", as on the details page.
+    """
+    values = pd.Series(values)
+    categorical = values.astype("category") if values.dtype != "category" else values
+    categories = categorical.cat.categories
+
+    labels = np.array(
+        [NOT_AVAILABLE if code == "" else f"{code} – {mapping.get(code, 'Unknown')}" for code in categories]
+        + [NOT_AVAILABLE],
+        dtype=object,
+    )
+    # Missing values have category code -1, which picks the trailing NOT_AVAILABLE
+    decoded = labels[categorical.cat.codes.to_numpy()]
+    return pd.Series(pd.Categorical(decoded), index=values.index, name=values.name)
+
+
+def decode_frame(df):
+    """Decode every ``decode_map`` field of the strategy data at once.
+
+    Returns a frame with the identifying columns followed by one decoded
+    (categorical) column per field, aligned row for row with ``df``.
+    """
+    decoded = {col: df[col] for col in ID_COLUMNS if col in df.columns}
+    for field, mapping in decode_map.items():
+        if field in df.columns:
+            decoded[field] = decode_column(df[field], mapping)
+        else:
+            # Same fallback as before: a missing field reads as the code "NA"
+            decoded[field] = pd.Series(f"NA – {mapping.get('NA', 'Unknown')}", index=df.index, dtype="category")
+    return pd.DataFrame(decoded, index=df.index)
+
+
+def boiler_comparison(decoded_rows):
+    """Fields x boilers table ("Boiler ID: <id>" columns) for one plant's decoded rows."""
+    table = decoded_rows.drop_duplicates("Boiler ID", keep="last").set_index("Boiler ID")[list(decode_map)]
+    table = table.astype(str).T
+    table.columns = [f"Boiler ID: {boiler_id}" for boiler_id in table.columns]
+    table.index.name = "Emissions Standars & Strategy"
+    return table
@@ -0,0 +1,294 @@
+"""Export of the decoded standards & strategy data for many plants.
+
+The details page shows the decoded boilers of one plant; this writes them for
+any set of plants (the benchmarking window, whole states, the whole fleet) as
+one row per boiler: Plant Code, Plant Name, State, Boiler ID and every
+``decode_map`` field as "<code> – <meaning>".
+
+The rows come from the decoded lookup that data_loader caches once per process
+(strategy_codes.decode_frame), and are written CHUNK_PLANTS plants at a time to
+a file on disk, so memory is bounded by one chunk whatever the number of
+plants. CSV and Parquet are appended chunk by chunk; XLSX uses openpyxl's
+write-only mode, which streams rows to the file (writing XLSX needs openpyxl).
+
+In the app, ``start_export`` runs the export on a background thread and returns
+an ``ExportJob`` whose progress the page polls; only the job id is kept in the
+session. From the command line:
+
+    python strategy_export.py boilers_tx.csv --state TX
+    python strategy_export.py fleet.parquet            # all plants
+"""
+
+import argparse
+import os
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from strategy_codes import ID_COLUMNS, decode_map
+
+EXPORT_FORMATS = {"CSV": ".csv", "Excel": ".xlsx", "Parquet": ".parquet"}
+MIME_TYPES = {
+    "CSV": "text/csv",
+    "Excel": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    "Parquet": "application/octet-stream",
+}
+CHUNK_PLANTS = 200
+
+EXPORT_WORKERS = 2      # concurrent export jobs per process
+JOB_TTL_SECONDS = 3600  # finished jobs (and their files) are removed after this
+XLSX_MAX_ROWS = 1_048_575
+
+
+def available_formats():
+    """Export formats usable in this environment (Excel needs openpyxl)."""
+    try:
+        import openpyxl  # noqa: F401
+    except ImportError:
+        return [name for name in EXPORT_FORMATS if name != "Excel"]
+    return list(EXPORT_FORMATS)
+
+
+def plants_in_states(lookup, states):
+    """Sorted Plant Codes of the decoded lookup located in ``states``."""
+    frame = lookup.frame
+    return np.unique(frame.loc[frame["State"].isin(list(states)), "Plant Code"].to_numpy())
+
+
+def report_columns(lookup):
+    return [c for c in ID_COLUMNS + list(decode_map) if c in lookup.frame.columns]
+
+
+def iter_report_chunks(lookup, plant_codes, chunk_plants=CHUNK_PLANTS):
+    """Yield (plants done, decoded rows) for ``plant_codes`` in chunks of ``chunk_plants`` plants.
+
+    Plants without strategy data are skipped; rows keep the lookup's
+    Plant Code order.
+    """
+    plant_codes = np.unique(np.asarray(plant_codes, dtype=np.int64))
+    columns = report_columns(lookup)
+    for first in range(0, len(plant_codes), chunk_plants):
+        codes = plant_codes[first:first + chunk_plants]
+        i = np.searchsorted(lookup.codes, codes)
+        known = i < len(lookup.codes)
+        known[known] = lookup.codes[i[known]] == codes[known]
+        starts, stops = lookup.starts[i[known]], lookup.stops[i[known]]
+        positions = (np.concatenate([np.arange(a, b) for a, b in zip(starts, stops)]) if len(starts)
+                     else np.empty(0, dtype=np.int64))
+        # Plain strings: the categories differ between chunks, the file schema must not
+        rows = lookup.frame.iloc[positions][columns]
+        if len(rows):
+            rows = rows.astype({c: str for c in columns if isinstance(rows[c].dtype, pd.CategoricalDtype)})
+        yield first + len(codes), rows.reset_index(drop=True)
+
+
+def _parquet_schema(columns):
+    # Fixed up front: a column that is all null in the first chunk would otherwise be typed null
+    import pyarrow as pa
+
+    return pa.schema([(c, pa.int64() if c == "Plant Code" else pa.string()) for c in columns])
+
+
+class _ReportWriter:
+    # Appends chunks to a CSV, Parquet or XLSX file
+
+    def __init__(self, path, fmt, columns):
+        self.path = path
+        self.fmt = fmt
+        self.rows = 0
+        self._schema = _parquet_schema(columns) if fmt == "Parquet" else None
+        self._parquet_writer = None
+        self._workbook = None
+        self._sheet = None
+
+    def write(self, chunk):
+        if self.fmt == "Parquet":
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            table = pa.Table.from_pandas(chunk, schema=self._schema, preserve_index=False)
+            if self._parquet_writer is None:
+                self._parquet_writer = pq.ParquetWriter(self.path, self._schema)
+            self._parquet_writer.write_table(table)
+        elif self.fmt == "Excel":
+            if self._workbook is None:
+                from openpyxl import Workbook
+
+                self._workbook = Workbook(write_only=True)
+                self._sheet = self._workbook.create_sheet("Standards & Strategy")
+                self._sheet.append(list(chunk.columns))
+            if self.rows + len(chunk) > XLSX_MAX_ROWS:
+                raise ValueError(f"More than {XLSX_MAX_ROWS:,} rows do not fit in one Excel sheet; "
+                                 "export as CSV or Parquet instead.")
+            for row in chunk.itertuples(index=False):
+                self._sheet.append([value.item() if isinstance(value, np.generic) else value for value in row])
+        else:
+            with open(self.path, "w" if self.rows == 0 else "a", newline="", encoding="utf-8") as f:
+                f.write(chunk.to_csv(index=False, header=self.rows == 0))
+        self.rows += len(chunk)
+
+    def close(self):
+        if self._parquet_writer is not None:
+            self._parquet_writer.close()
+        if self._workbook is not None:
+            self._workbook.save(self.path)
+
+
+def export_report(lookup, plant_codes, path, fmt="CSV", chunk_plants=CHUNK_PLANTS, progress=None, cancel=None):
+    """Write the decoded rows of ``plant_codes`` to ``path``; returns {"plants", "rows", "seconds"}.
+
+    ``progress`` receives (plants done, rows written) after every chunk;
+    setting the ``cancel`` event stops the export after the current chunk.
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format {fmt!r}; use one of {list(EXPORT_FORMATS)}")
+    start = time.perf_counter()
+    columns = report_columns(lookup)
+    writer = _ReportWriter(path, fmt, columns)
+    done = 0
+    try:
+        for plants, rows in iter_report_chunks(lookup, plant_codes, chunk_plants):
+            if cancel is not None and cancel.is_set():
+                break
+            if len(rows):
+                writer.write(rows)
+            done = plants
+            if progress is not None:
+                progress(done, writer.rows)
+        if writer.rows == 0:
+            # No boilers found: still a valid file with the header
+            writer.write(pd.DataFrame({c: pd.Series(dtype=str) for c in columns}))
+    finally:
+        writer.close()
+    return {"plants": done, "rows": writer.rows, "seconds": time.perf_counter() - start}
+
+
+class ExportJob:
+    """State of one background export, shared between the worker thread and the page."""
+
+    def __init__(self, plant_codes, fmt, label, directory):
+        self.id = uuid.uuid4().hex[:12]
+        self.fmt = fmt
+        self.label = label
+        self.total = len(plant_codes)
+        self.file_name = f"strategy_{label}{EXPORT_FORMATS[fmt]}"
+        self.path = os.path.join(directory, f"{self.id}{EXPORT_FORMATS[fmt]}")
+        self.plants_done = 0
+        self.rows = 0
+        self.status = "running"
+        self.error = None
+        self.created = time.time()
+        self.finished = None
+        self.cancel_event = threading.Event()
+
+    @property
+    def fraction(self):
+        return self.plants_done / self.total if self.total else 1.0
+
+    def cancel(self):
+        self.cancel_event.set()
+
+    def _progress(self, plants_done, rows):
+        self.plants_done, self.rows = plants_done, rows
+
+    def run(self, lookup, plant_codes):
+        try:
+            export_report(lookup, plant_codes, self.path, self.fmt, progress=self._progress, cancel=self.cancel_event)
+            self.status = "cancelled" if self.cancel_event.is_set() else "done"
+        except Exception as e:
+            self.status, self.error = "failed", str(e)
+        finally:
+            self.finished = time.time()
+        if self.status != "done" and os.path.exists(self.path):
+            os.remove(self.path)
+
+
+_executor = None
+_jobs = {}   # job id -> ExportJob
+_jobs_lock = threading.Lock()
+_directory = None
+
+
+def _job_directory():
+    global _directory
+    if _directory is None:
+        _directory = tempfile.mkdtemp(prefix="co2_strategy_export_")
+    return _directory
+
+
+def _expire_jobs(now):
+    for job_id, job in list(_jobs.items()):
+        if job.finished is not None and now - job.finished > JOB_TTL_SECONDS:
+            del _jobs[job_id]
+            if os.path.exists(job.path):
+                os.remove(job.path)
+
+
+def start_export(lookup, plant_codes, fmt="CSV", label="plants"):
+    """Start exporting ``plant_codes`` in the background; returns the ExportJob."""
+    global _executor
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format {fmt!r}; use one of {list(EXPORT_FORMATS)}")
+    plant_codes = np.unique(np.asarray(plant_codes, dtype=np.int64))
+    with _jobs_lock:
+        _expire_jobs(time.time())
+        if _executor is None:
+            _executor = ThreadPoolExecutor(EXPORT_WORKERS, thread_name_prefix="strategy-export")
+        job = ExportJob(plant_codes, fmt, label, _job_directory())
+        _jobs[job.id] = job
+    _executor.submit(job.run, lookup, plant_codes)
+    return job
+
+
+def get_job(job_id):
+    """The ExportJob with ``job_id``, or None (unknown or expired)."""
+    with _jobs_lock:
+        return _jobs.get(job_id)
+
+
+def discard_job(job_id):
+    """Cancel a job and delete its file."""
+    with _jobs_lock:
+        job = _jobs.pop(job_id, None)
+    if job is not None:
+        job.cancel()
+        if job.finished is not None and os.path.exists(job.path):
+            os.remove(job.path)
+
+
+def main(argv=None):
+    import data_loader
+
+    parser = argparse.ArgumentParser(description="Export the decoded standards & strategy data of many plants.")
+    parser.add_argument("output", help="CSV, XLSX or Parquet file to write")
+    parser.add_argument("--state", action="append", default=None, help="Only plants in this state (repeatable)")
+    parser.add_argument("--plants", default=None, help="Comma-separated Plant Codes")
+    parser.add_argument("--chunk-plants", type=int, default=CHUNK_PLANTS)
+    args = parser.parse_args(argv)
+
+    extension = os.path.splitext(args.output)[1].lower()
+    formats = {ext: name for name, ext in EXPORT_FORMATS.items()}
+    if extension not in formats:
+        raise SystemExit(f"Error: unsupported output type {extension!r}; use {', '.join(formats)}")
+
+    lookup = data_loader.load_decoded_strategy_lookup()
+    if args.plants:
+        plant_codes = [int(code) for code in args.plants.split(",") if code.strip()]
+    elif args.state:
+        plant_codes = plants_in_states(lookup, args.state)
+    else:
+        plant_codes = lookup.codes
+
+    stats = export_report(lookup, plant_codes, args.output, formats[extension], args.chunk_plants,
+                          progress=lambda plants, rows: print(f"\r{plants:,}/{len(plant_codes):,} plants", end=""))
+    print(f"\nWrote {stats['rows']:,} boilers of {stats['plants']:,} plants to {args.output} "
+          f"in {stats['seconds']:.2f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,289 @@
+"""Reproducible training of the CO₂ pipeline (model_pickle/trained_pipe_co2.sav).
+
+Builds the five-feature frame the prediction page sends (model_inputs.FEATURE_COLUMNS)
+from the emissions data (the shipped snapshot plus the year partitions appended
+by ingest.py), searches the preprocessing + estimator grid and writes the
+refitted pipeline:
+
+    python train_model.py                      # search, write the model + report
+    python train_model.py --jobs 4 --folds 5   # cross-validation fits on 4 cores
+    python train_model.py --output /tmp/candidate.sav   # keep the shipped model
+
+- The prepared features are cached on disk (model_pickle/train_cache/), keyed
+  by the dataset files and their mtimes, so reruns skip the preparation until
+  new data is ingested. The fitted preprocessing of each fold is cached too
+  (Pipeline ``memory``): candidates that only differ in the estimator reuse it.
+- The search is successive halving (HalvingGridSearchCV): every candidate is
+  first scored on a small sample, only the best third moves on to three times
+  the rows, and so on until the last round uses all training rows, with the cross-validation fits run in ``--jobs``
+  processes. Rows of a plant stay in the same fold (GroupKFold on Plant Code)
+  and a share of the plants is held out for the final evaluation.
+- The grid holds linear estimators only, so the result still compiles to the
+  flat NumPy path (compiled_model.py) and keeps the prediction interval scheme.
+
+Next to the model it writes ``<name>.report.json`` (timings, the halving
+rounds, the best candidates and the held-out accuracy, also for the model it
+replaces), recalibrates the prediction intervals on the held-out plants
+(prediction_intervals.py) and saves the input profile of the training rows
+that drift monitoring compares with (drift_monitor.py). For a candidate
+(``--output`` other than the live model) these two files get the candidate's
+name as prefix (data_loader.model_side_path), so the live model keeps its own.
+If the model has been exported with model_registry.py, the export and its
+manifest are refreshed as well.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import pickle
+import time
+
+import numpy as np
+import pandas as pd
+
+from drift_monitor import REFERENCE_FILE, build_reference, write_profile
+from model_inputs import CATEGORICAL_FEATURES, FEATURE_COLUMNS, NUMERIC_FEATURES, invalid_code_mask
+from prediction_intervals import CALIBRATION_FILE, TARGET_COLUMN, calibrate
+
+CACHE_DIR_NAME = "train_cache"
+REPORT_SUFFIX = ".report.json"
+GROUP_COLUMN = "Plant Code"
+
+# Bump when prepare_features changes, to invalidate the cached feature files
+PREPARE_VERSION = 1
+
+DEFAULT_FOLDS = 5
+DEFAULT_TEST_SIZE = 0.2
+DEFAULT_FACTOR = 3
+DEFAULT_SEED = 0
+
+
+def prepare_features(emissions):
+    """Model features + target + Plant Code of the rows usable for training."""
+    frame = emissions[FEATURE_COLUMNS + [TARGET_COLUMN, GROUP_COLUMN]]
+    usable = frame[NUMERIC_FEATURES + [TARGET_COLUMN]].notna().all(axis=1) & ~invalid_code_mask(frame)
+    frame = frame[usable].reset_index(drop=True)
+    numeric = {column: frame[column].astype("float64") for column in NUMERIC_FEATURES + [TARGET_COLUMN]}
+    # Plain strings, as the page sends them (category dtypes differ between partitions)
+    codes = {column: frame[column].astype(str) for column in CATEGORICAL_FEATURES}
+    return frame.assign(**numeric, **codes)[FEATURE_COLUMNS + [TARGET_COLUMN, GROUP_COLUMN]]
+
+
+def _signature(paths):
+    digest = hashlib.sha256(f"v{PREPARE_VERSION}".encode())
+    for path in paths:
+        stat = os.stat(path)
+        digest.update(f"{os.path.abspath(path)}:{stat.st_size}:{stat.st_mtime_ns}".encode())
+    return digest.hexdigest()[:16]
+
+
+def load_training_frame(cache_dir, log=print):
+    """(prepared frame, cache hit) for the current emissions files, cached as Feather."""
+    import data_loader
+    from columnar_store import read_feather, write_feather
+
+    cache_file = os.path.join(cache_dir, f"features-{_signature(data_loader.dataset_paths(data_loader.EMISSIONS))}"
+                                         ".feather")
+    if os.path.exists(cache_file):
+        return read_feather(cache_file), True
+
+    frame = prepare_features(data_loader.load_emissions(FEATURE_COLUMNS + [TARGET_COLUMN, GROUP_COLUMN]))
+    os.makedirs(cache_dir, exist_ok=True)
+    for stale in os.listdir(cache_dir):
+        if stale.startswith("features-") and stale.endswith(".feather"):
+            os.remove(os.path.join(cache_dir, stale))
+    write_feather(frame, cache_file)
+    log(f"Prepared {len(frame):,} rows -> {os.path.relpath(cache_file, data_loader.BASE_DIR)}")
+    return frame, False
+
+
+def build_pipeline(memory=None):
+    """The shipped pipeline's layout: scaled numerics + one-hot codes, then the estimator."""
+    from sklearn.compose import ColumnTransformer
+    from sklearn.linear_model import LinearRegression
+    from sklearn.pipeline import Pipeline
+    from sklearn.preprocessing import OneHotEncoder, StandardScaler
+
+    preprocessor = ColumnTransformer([
+        ("num", StandardScaler(), NUMERIC_FEATURES),
+        ("cat", OneHotEncoder(handle_unknown="ignore"), CATEGORICAL_FEATURES),
+    ])
+    return Pipeline([("preprocessor", preprocessor), ("model", LinearRegression())], memory=memory)
+
+
+def param_grid():
+    from sklearn.linear_model import HuberRegressor, Lasso, LinearRegression, Ridge
+
+    return [
+        {"model": [LinearRegression()]},
+        {"model": [Ridge()], "model__alpha": [0.01, 0.1, 1.0, 10.0, 100.0]},
+        {"model": [Lasso(max_iter=20000)], "model__alpha": [1.0, 10.0, 100.0, 1000.0]},
+        # Less sensitive to the few very large plants
+        {"model": [HuberRegressor(max_iter=1000)], "model__epsilon": [1.35, 2.0, 3.0]},
+    ]
+
+
+def _describe(params):
+    params = dict(params)
+    estimator = params.pop("model")
+    return type(estimator).__name__ + "".join(f", {k.split('__', 1)[1]}={v}" for k, v in sorted(params.items()))
+
+
+def accuracy(model, frame):
+    """MAE, RMSE and R² of ``model`` on ``frame`` (features + target)."""
+    from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
+
+    actual = frame[TARGET_COLUMN].to_numpy()
+    predicted = model.predict(frame[FEATURE_COLUMNS])
+    return {"rows": len(frame), "mae": float(mean_absolute_error(actual, predicted)),
+            "rmse": float(np.sqrt(mean_squared_error(actual, predicted))), "r2": float(r2_score(actual, predicted))}
+
+
+def split_plants(frame, test_size=DEFAULT_TEST_SIZE, seed=DEFAULT_SEED):
+    """(train, test) with every plant on one side only."""
+    from sklearn.model_selection import GroupShuffleSplit
+
+    train, test = next(GroupShuffleSplit(n_splits=1, test_size=test_size, random_state=seed)
+                       .split(frame, groups=frame[GROUP_COLUMN]))
+    return frame.iloc[train].reset_index(drop=True), frame.iloc[test].reset_index(drop=True)
+
+
+def search(train, folds=DEFAULT_FOLDS, jobs=-1, factor=DEFAULT_FACTOR, seed=DEFAULT_SEED, cache_dir=None):
+    """Successive-halving grid search on ``train``; returns the fitted HalvingGridSearchCV."""
+    from sklearn.experimental import enable_halving_search_cv  # noqa: F401
+    from sklearn.model_selection import GroupKFold, HalvingGridSearchCV
+
+    memory = None
+    if cache_dir:
+        from joblib import Memory
+
+        memory = Memory(os.path.join(cache_dir, "transformers"), verbose=0)
+
+    halving = HalvingGridSearchCV(
+        # "exhaust": the first round is sized so that the last one uses all training rows
+        build_pipeline(memory), param_grid(), factor=factor, resource="n_samples", min_resources="exhaust",
+        cv=GroupKFold(n_splits=folds),
+        scoring="r2", n_jobs=jobs, random_state=seed, refit=True, error_score=np.nan,
+    )
+    halving.fit(train[FEATURE_COLUMNS], train[TARGET_COLUMN], groups=train[GROUP_COLUMN])
+    return halving
+
+
+def _rounds(halving):
+    return [{"round": int(i), "candidates": int(n), "rows": int(r)}
+            for i, (n, r) in enumerate(zip(halving.n_candidates_, halving.n_resources_))]
+
+
+def _leaderboard(halving, top=5):
+    results = pd.DataFrame(halving.cv_results_)
+    last = results[results["iter"] == results["iter"].max()].sort_values("mean_test_score", ascending=False)
+    return [{"candidate": _describe(row["params"]), "cv_r2": float(row["mean_test_score"]),
+             "cv_r2_std": float(row["std_test_score"]), "fit_seconds": float(row["mean_fit_time"])}
+            for _, row in last.head(top).iterrows()]
+
+
+def write_model(model, path):
+    """Pickle ``model`` to ``path`` atomically (the app may be reading the previous one)."""
+    model.set_params(memory=None)
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        pickle.dump(model, f)
+    os.replace(tmp, path)
+
+
+def train(output, jobs=-1, folds=DEFAULT_FOLDS, test_size=DEFAULT_TEST_SIZE, factor=DEFAULT_FACTOR,
+          seed=DEFAULT_SEED, cache_dir=None, log=print):
+    """Prepare, search, evaluate and write the model; returns the report."""
+    import data_loader
+    from model_registry import ModelError, export_model, manifest_path, model_hash, read_manifest
+
+    cache_dir = cache_dir or os.path.join(data_loader.MODEL_DIR, CACHE_DIR_NAME)
+    timings = {}
+
+    start = time.perf_counter()
+    frame, cache_hit = load_training_frame(cache_dir, log)
+    train_rows, test_rows = split_plants(frame, test_size, seed)
+    timings["prepare_seconds"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    halving = search(train_rows, folds, jobs, factor, seed, cache_dir)
+    timings["search_seconds"] = time.perf_counter() - start
+    model = halving.best_estimator_
+    log(f"Best: {_describe(halving.best_params_)} (CV R² {halving.best_score_:.4f}, "
+        f"{len(halving.cv_results_['params'])} candidate evaluations in {timings['search_seconds']:.1f} s)")
+
+    start = time.perf_counter()
+    held_out = accuracy(model, test_rows)
+    timings["evaluate_seconds"] = time.perf_counter() - start
+
+    # The model being replaced, on the same held-out plants (it may have seen them in training)
+    try:
+        previous = accuracy(data_loader.load_model(output), test_rows) if os.path.exists(output) else None
+    except ModelError:
+        previous = None
+
+    start = time.perf_counter()
+    write_model(model, output)
+    exported = None
+    if os.path.exists(manifest_path(output)):
+        manifest = read_manifest(output)
+        exported = export_model(model, output, manifest["format"], source=os.path.basename(output))["artifact"]
+    intervals = calibrate(model, test_rows, model_hash=model_hash(output), source="held-out plants (train_model.py)",
+                          held_out=True)
+    with open(data_loader.model_side_path(output, CALIBRATION_FILE), "w") as f:
+        json.dump(intervals.to_dict(), f, indent=2)
+    reference = build_reference(train_rows[FEATURE_COLUMNS], model.predict(train_rows[FEATURE_COLUMNS]),
+                                source="training rows (train_model.py)", model_hash=model_hash(output))
+    write_profile(reference, data_loader.model_side_path(output, REFERENCE_FILE))
+    timings["write_seconds"] = time.perf_counter() - start
+
+    report = {
+        "model": os.path.basename(output),
+        "exported": exported,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "data": {"rows": len(frame), "plants": int(frame[GROUP_COLUMN].nunique()), "train_rows": len(train_rows),
+                 "test_rows": len(test_rows), "feature_cache_hit": cache_hit,
+                 "files": [os.path.basename(p) for p in data_loader.dataset_paths(data_loader.EMISSIONS)]},
+        "search": {"folds": folds, "factor": factor, "jobs": jobs, "seed": seed, "rounds": _rounds(halving),
+                   "best": _describe(halving.best_params_), "best_cv_r2": float(halving.best_score_),
+                   "leaderboard": _leaderboard(halving)},
+        "held_out": held_out,
+        "previous_model_held_out": previous,
+        "intervals": intervals.to_dict(),
+        "timings": timings,
+    }
+    with open(os.path.splitext(output)[0] + REPORT_SUFFIX, "w") as f:
+        json.dump(report, f, indent=2)
+    return report
+
+
+def main(argv=None):
+    import data_loader
+
+    parser = argparse.ArgumentParser(description="Train the CO₂ pipeline with a successive-halving grid search.")
+    parser.add_argument("--output", default=data_loader.MODEL_PATH, help="Where to write the pickled pipeline")
+    parser.add_argument("--jobs", type=int, default=-1, help="Processes for the cross-validation fits (-1: all cores)")
+    parser.add_argument("--folds", type=int, default=DEFAULT_FOLDS)
+    parser.add_argument("--test-size", type=float, default=DEFAULT_TEST_SIZE, help="Share of plants held out")
+    parser.add_argument("--factor", type=int, default=DEFAULT_FACTOR, help="Halving factor between rounds")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED)
+    parser.add_argument("--cache-dir", default=None, help=f"Feature cache (default: model_pickle/{CACHE_DIR_NAME})")
+    args = parser.parse_args(argv)
+
+    report = train(args.output, args.jobs, args.folds, args.test_size, args.factor, args.seed, args.cache_dir)
+    held_out, timings = report["held_out"], report["timings"]
+    print(f"Held-out plants ({held_out['rows']:,} rows): MAE {held_out['mae']:,.0f} t, "
+          f"RMSE {held_out['rmse']:,.0f} t, R² {held_out['r2']:.4f}")
+    if report["previous_model_held_out"]:
+        previous = report["previous_model_held_out"]
+        print(f"Previous model on the same rows: MAE {previous['mae']:,.0f} t, R² {previous['r2']:.4f}")
+    print("Timings: " + ", ".join(f"{k.replace('_seconds', '')} {v:.1f} s" for k, v in timings.items()))
+    print(f"Wrote {report['model']}" + (f" (+ {report['exported']})" if report["exported"] else "")
+          + f", {os.path.splitext(report['model'])[0]}{REPORT_SUFFIX}, "
+          f"{os.path.basename(data_loader.model_side_path(args.output, CALIBRATION_FILE))} and "
+          f"{os.path.basename(data_loader.model_side_path(args.output, REFERENCE_FILE))}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+"""What-if sweeps: score the Cartesian grid of fuel codes x prime movers x numeric ranges.
+
+The grid is generated chunk by chunk straight from flat row numbers
+(``np.unravel_index``), so the one-hot encoding is only ever built for one
+chunk at a time; every chunk is one vectorized ``predict`` call. The scored
+chunks are then concatenated: the scored grid itself is held in memory, which
+is why the page limits the number of grid points per run.
+
+Results are kept in a small process-wide LRU (``cached_sweep``), bounded by the
+memory the grids take (CO2_WHAT_IF_CACHE_MB), so a page only needs to remember
+the axes of its last run, not the scored grid itself. The CSV
+export of a result is written to a file once, on request (``sweep_csv``).
+"""
+
+import collections
+import math
+import os
+import tempfile
+import threading
+
+import numpy as np
+import pandas as pd
+
+from model_inputs import FEATURE_COLUMNS, PREDICTION_COLUMN
+
+DEFAULT_CHUNKSIZE = 100_000
+# Memory of the scored grids kept per process; the latest grid is kept whatever its size
+CACHED_SWEEP_BYTES = int(float(os.environ.get("CO2_WHAT_IF_CACHE_MB", 400)) * 1e6)
+CACHED_CSV_FILES = 4   # CSV exports kept on disk per process
+
+_sweeps = collections.OrderedDict()   # (id(model), axes key) -> (model, result, bytes)
+_sweeps_lock = threading.Lock()
+_csv_files = collections.OrderedDict()   # (id(model), axes key) -> CSV path
+_csv_directory = None
+
+
+def _check_axes(axes):
+    missing = [col for col in FEATURE_COLUMNS if col not in axes]
+    if missing:
+        raise ValueError(f"No values given for: {missing}")
+    empty = [col for col in FEATURE_COLUMNS if len(axes[col]) == 0]
+    if empty:
+        raise ValueError(f"Empty value list for: {empty}")
+
+
+def grid_size(axes):
+    """Number of grid points for ``axes`` ({feature column: values})."""
+    return math.prod(len(axes[col]) for col in FEATURE_COLUMNS)
+
+
+def iter_grid(axes, chunksize=DEFAULT_CHUNKSIZE):
+    """Yield the grid over ``axes`` as model-input DataFrames of at most ``chunksize`` rows.
+
+    ``axes`` maps every feature column to the values to sweep; a single value
+    keeps that feature fixed. Rows are in C order (the last feature varies fastest).
+    """
+    _check_axes(axes)
+    values = [np.asarray(axes[col], dtype=object if col in ("Fuel Code", "Prime Mover") else float)
+              for col in FEATURE_COLUMNS]
+    shape = tuple(len(v) for v in values)
+    total = math.prod(shape)
+
+    for start in range(0, total, chunksize):
+        positions = np.unravel_index(np.arange(start, min(start + chunksize, total)), shape)
+        yield pd.DataFrame({col: v[i] for col, v, i in zip(FEATURE_COLUMNS, values, positions)})
+
+
+def sweep(model, axes, chunksize=DEFAULT_CHUNKSIZE):
+    """Score every grid point; returns the grid with a prediction column."""
+    chunks = []
+    for chunk in iter_grid(axes, chunksize):
+        chunk[PREDICTION_COLUMN] = model.predict(chunk)
+        chunks.append(chunk)
+    return pd.concat(chunks, ignore_index=True)
+
+
+def axes_key(axes):
+    """Hashable, session-state friendly form of ``axes``: a tuple of (column, values) pairs."""
+    return tuple((col, tuple(np.asarray(axes[col]).tolist())) for col in FEATURE_COLUMNS)
+
+
+def cached_sweep(model, axes):
+    """``sweep`` shared by all sessions: recent results are kept up to CACHED_SWEEP_BYTES per process."""
+    key = (id(model), axes_key(axes))
+    with _sweeps_lock:
+        entry = _sweeps.get(key)
+        if entry is not None and entry[0] is model:
+            _sweeps.move_to_end(key)
+            return entry[1]
+
+    result = sweep(model, axes)
+    size = int(result.memory_usage(deep=True).sum())
+    with _sweeps_lock:
+        _sweeps[key] = (model, result, size)
+        _sweeps.move_to_end(key)
+        while len(_sweeps) > 1 and sum(entry[2] for entry in _sweeps.values()) > CACHED_SWEEP_BYTES:
+            _sweeps.popitem(last=False)
+    return result
+
+
+def cached_sweep_bytes():
+    """Memory held by the cached what-if grids of this process."""
+    with _sweeps_lock:
+        return sum(entry[2] for entry in _sweeps.values())
+
+
+def sweep_csv(model, axes):
+    """Path of a CSV file with the scored grid of ``axes``; written once, the last CACHED_CSV_FILES are kept."""
+    global _csv_directory
+    key = (id(model), axes_key(axes))
+    with _sweeps_lock:
+        path = _csv_files.get(key)
+        if path is not None and os.path.exists(path):
+            _csv_files.move_to_end(key)
+            return path
+        if _csv_directory is None:
+            _csv_directory = tempfile.mkdtemp(prefix="co2_what_if_")
+
+    fd, tmp_path = tempfile.mkstemp(suffix=".csv.tmp", dir=_csv_directory)
+    os.close(fd)
+    cached_sweep(model, axes).to_csv(tmp_path, index=False, chunksize=DEFAULT_CHUNKSIZE)
+    path = tmp_path[:-len(".tmp")]
+    os.replace(tmp_path, path)
+    with _sweeps_lock:
+        _csv_files[key] = path
+        while len(_csv_files) > CACHED_CSV_FILES:
+            _, old_path = _csv_files.popitem(last=False)
+            if old_path != path and os.path.exists(old_path):
+                os.remove(old_path)
+    return path
+
+
+def top_rows(result, n=20):
+    """The ``n`` grid points with the highest prediction."""
+    return result.nlargest(n, PREDICTION_COLUMN).reset_index(drop=True)
+
+
+def value_range(low, high, steps):
+    """``steps`` evenly spaced values from ``low`` to ``high`` (just ``low`` if steps <= 1)."""
+    if steps <= 1:
+        return np.array([float(low)])
+    return np.linspace(low, high, int(steps))
+
+
+def code_matrix(result, values=PREDICTION_COLUMN, aggfunc="mean"):
+    """Fuel Code x Prime Mover table of ``values`` aggregated over the numeric sweep."""
+    return result.pivot_table(index="Fuel Code", columns="Prime Mover", values=values,
+                              aggfunc=aggfunc, observed=True)